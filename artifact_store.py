@@ -0,0 +1,105 @@
+import json
+import os
+import shutil
+import time
+import uuid
+from cache import file_digest
+
+# Files exchanged between farm nodes; point every node at the same shared directory
+ARTIFACT_DIR = os.path.join(".cache", "artifacts")
+
+class ArtifactStore:
+    """
+    Content-addressed file store on a directory all farm nodes can reach.
+
+    A file is stored under the SHA-256 of its contents, so tasks pass
+    artifacts around by digest, identical outputs are stored once, and a
+    digest always names the same bytes. Files are written to a scratch name
+    and renamed into place, so readers never see a partial artifact. Small
+    JSON records, stored under a key of the caller's choosing, note facts
+    tasks must not repeat, such as an upload that already happened.
+    """
+
+    def __init__(self, root=ARTIFACT_DIR):
+        self.root = root
+        os.makedirs(os.path.join(root, "tmp"), exist_ok=True)
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def exists(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def put(self, path):
+        """Copy a file into the store and return its digest."""
+        digest = file_digest(path)
+        target = self.path(digest)
+        if os.path.exists(target):
+            os.utime(target)
+            return digest
+        scratch = os.path.join(self.root, "tmp", uuid.uuid4().hex)
+        try:
+            shutil.copyfile(path, scratch)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(scratch, target)
+        finally:
+            if os.path.exists(scratch):
+                os.remove(scratch)
+        return digest
+
+    def get(self, digest, output_path):
+        """Copy an artifact out of the store to ``output_path``."""
+        source = self.path(digest)
+        if not os.path.exists(source):
+            raise FileNotFoundError(f"Artifact {digest} is not in {self.root}")
+        shutil.copyfile(source, output_path)
+        os.utime(source)
+        return output_path
+
+    def record_path(self, key):
+        return os.path.join(self.root, "records", f"{key}.json")
+
+    def put_record(self, key, data):
+        """Store a JSON record under ``key``, replacing any earlier one."""
+        target = self.record_path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        scratch = os.path.join(self.root, "tmp", uuid.uuid4().hex)
+        try:
+            with open(scratch, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(scratch, target)
+        finally:
+            if os.path.exists(scratch):
+                os.remove(scratch)
+
+    def get_record(self, key):
+        """The JSON record stored under ``key``, or None."""
+        try:
+            with open(self.record_path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def drop_record(self, key):
+        try:
+            os.remove(self.record_path(key))
+        except FileNotFoundError:
+            pass
+
+    def prune(self, max_age_days=7):
+        """Delete artifacts nobody stored or fetched in ``max_age_days``; returns the bytes freed."""
+        cutoff = time.time() - max_age_days * 86400
+        freed = 0
+        for shard in os.listdir(self.root):
+            shard_dir = os.path.join(self.root, shard)
+            if shard == "tmp" or not os.path.isdir(shard_dir):
+                continue
+            for entry in os.scandir(shard_dir):
+                try:
+                    stat = entry.stat()
+                    if stat.st_mtime < cutoff:
+                        os.remove(entry.path)
+                        freed += stat.st_size
+                except OSError:
+                    continue
+        return freed
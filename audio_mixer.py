@@ -0,0 +1,203 @@
+import wave
+from ffmpeg_tools import open_ffmpeg_reader, close_ffmpeg_reader, open_ffmpeg_writer, close_ffmpeg_writer
+from lazy import lazy_import
+from scroll_renderer import AUDIO_RATE, AUDIO_CHANNELS
+from tracing import traced, record_output
+
+np = lazy_import("numpy")
+
+# Background music level while nobody is speaking (the level it always had before ducking),
+# and its fade in/out length in seconds
+MUSIC_VOLUME = 0.05
+MUSIC_FADE = 2
+
+# Music level under the narration
+MUSIC_DUCKED_VOLUME = 0.025
+
+# Narration loudness is measured over windows of this many seconds
+DUCK_WINDOW = 0.05
+# Narration RMS (full scale) above which a window counts as speech
+DUCK_THRESHOLD = 0.02
+# Seconds over which the music dips before speech and recovers after it
+DUCK_SMOOTHING = 0.4
+
+# Frames mixed and written per block
+MIX_BLOCK = 1 << 16
+
+class AudioStream:
+    """
+    Audio of one or more files played back to back, decoded by ffmpeg and read in blocks.
+
+    The stream is exactly ``frames`` long: it is cut there, or padded with
+    silence once the files run out. Only one decoder runs at a time and
+    nothing is buffered beyond the block being read.
+    """
+
+    def __init__(self, paths, frames, rate=AUDIO_RATE, channels=AUDIO_CHANNELS):
+        self.paths = list(paths)
+        self.remaining = frames
+        self.rate = rate
+        self.channels = channels
+        self.process = None
+
+    def _decoder(self, path):
+        return open_ffmpeg_reader(["-i", path, "-vn", "-f", "f32le", "-ac", str(self.channels),
+                                   "-ar", str(self.rate), "pipe:1"])
+
+    def read(self, count):
+        """
+        The next ``count`` frames, fewer only at the end of the stream.
+
+        Returns:
+            np.ndarray: (frames, channels) float32 array
+        """
+        count = min(count, self.remaining)
+        samples = np.zeros((count, self.channels), dtype=np.float32)
+        frame_bytes = 4 * self.channels
+        filled = 0
+        while filled < count and (self.process is not None or self.paths):
+            if self.process is None:
+                self.process = self._decoder(self.paths.pop(0))
+            wanted = (count - filled) * frame_bytes
+            data = self.process.stdout.read(wanted)
+            if len(data) < wanted:
+                # A short read is the end of this file
+                close_ffmpeg_reader(self.process)
+                self.process = None
+            decoded = len(data) // frame_bytes
+            if decoded:
+                samples[filled:filled + decoded] = np.frombuffer(data, dtype=np.float32, count=decoded * self.channels
+                                                                 ).reshape(decoded, self.channels)
+                filled += decoded
+        self.remaining -= count
+        return samples
+
+    def close(self):
+        """Stop a decoder still running because its file is longer than the stream."""
+        if self.process is not None:
+            self.process.kill()
+            self.process.stdout.close()
+            self.process.stderr.close()
+            self.process.wait()
+            self.process = None
+
+def fade_gain(positions, frames, rate, fade_in=MUSIC_FADE, fade_out=MUSIC_FADE):
+    """Linear fade-in/fade-out gain at the given frame positions of a track ``frames`` long."""
+    gain = np.ones(len(positions), dtype=np.float32)
+    if fade_in > 0:
+        np.minimum(gain, positions / (fade_in * rate), out=gain)
+    if fade_out > 0:
+        np.minimum(gain, (frames - positions) / (fade_out * rate), out=gain)
+    return np.clip(gain, 0.0, 1.0, out=gain)
+
+def mix_stream(narration, music, frames, rate, fade=MUSIC_FADE, block=MIX_BLOCK, speech_gain=MUSIC_DUCKED_VOLUME,
+               gap_gain=MUSIC_VOLUME, window=DUCK_WINDOW, threshold=DUCK_THRESHOLD, smoothing=DUCK_SMOOTHING):
+    """
+    Mix a narration stream over a music stream, one block of frames at a time.
+
+    Narration windows of ``window`` seconds whose RMS exceeds ``threshold``
+    set the music to ``speech_gain``, the rest to ``gap_gain``. A moving
+    average over ``smoothing`` seconds turns the steps into ramps that start
+    slightly before speech does. Between window centres the gain is
+    interpolated, then multiplied by the fade. For the ramps, narration is
+    read about ``smoothing / 2`` seconds ahead of the block being mixed, so
+    memory stays at one block plus that lookahead whatever the length. The
+    sum is clipped to full scale.
+
+    Args:
+        narration (AudioStream): Narration, ``frames`` long
+        music (AudioStream): Background music, ``frames`` long
+
+    Yields:
+        np.ndarray: (frames, channels) float32 blocks
+    """
+    hop = max(1, int(window * rate))
+    block = max(hop, block // hop * hop)
+    width = max(1, int(round(smoothing / window)))
+    behind, ahead = width // 2, width - 1 - width // 2
+    windows = max(1, -(-frames // hop))
+
+    # Step gain of every window measured so far, and narration read but not mixed yet
+    steps = np.empty(windows, dtype=np.float32)
+    measured = 0
+    pending = np.zeros((0, narration.channels), dtype=np.float32)
+    for start in range(0, frames, block):
+        stop = min(frames, start + block)
+        # Frames of this block lie between the centres of windows first - 1 and last + 1
+        first, last = start // hop, (stop - 1) // hop
+        needed = min(windows, last + 2 + ahead)
+        if needed > measured:
+            voice = narration.read((needed - measured) * hop)
+            power = np.zeros((needed - measured) * hop, dtype=np.float32)
+            power[:len(voice)] = np.square(voice).mean(axis=1)
+            rms = np.sqrt(power.reshape(-1, hop).mean(axis=1))
+            steps[measured:needed] = np.where(rms > threshold, speech_gain, gap_gain)
+            pending = np.concatenate([pending, voice])
+            measured = needed
+
+        centres = np.arange(max(0, first - 1), min(windows, last + 2))
+        around = np.clip(centres[:, None] + np.arange(-behind, ahead + 1), 0, windows - 1)
+        curve = steps[around].mean(axis=1)
+        positions = np.arange(start, stop, dtype=np.float64)
+        gain = fade_gain(positions, frames, rate, fade, fade) * np.interp(positions, centres * hop + hop / 2, curve)
+
+        mixed = pending[:stop - start] + music.read(stop - start) * gain[:, None].astype(np.float32)
+        pending = pending[stop - start:]
+        yield np.clip(mixed, -1.0, 1.0, out=mixed)
+
+def write_audio(blocks, output_path, rate=AUDIO_RATE, channels=AUDIO_CHANNELS, bitrate="192k"):
+    """
+    Write float32 blocks to ``output_path``.
+
+    A .wav path is written as 16-bit PCM directly; anything else is encoded
+    to AAC by ffmpeg reading raw samples from stdin.
+    """
+    if output_path.endswith(".wav"):
+        with wave.open(output_path, "wb") as wav:
+            wav.setnchannels(channels)
+            wav.setsampwidth(2)
+            wav.setframerate(rate)
+            for samples in blocks:
+                wav.writeframes((samples * 32767).astype("<i2").tobytes())
+        return output_path
+
+    process = open_ffmpeg_writer(["-f", "f32le", "-ar", str(rate), "-ac", str(channels), "-i", "pipe:0",
+                                  "-c:a", "aac", "-b:a", bitrate, output_path])
+    try:
+        for samples in blocks:
+            process.stdin.write(np.ascontiguousarray(samples, dtype=np.float32).data)
+    except BrokenPipeError:
+        pass  # ffmpeg exited early; close_ffmpeg_writer reports why
+    close_ffmpeg_writer(process)
+    return output_path
+
+@traced("combine.mix")
+def mix_audio(narration_files, music_file, output_path, duration, rate=AUDIO_RATE, channels=AUDIO_CHANNELS,
+              fade=MUSIC_FADE, **ducking):
+    """
+    Build the final soundtrack: the narration of every part over faded, ducked background music.
+
+    Narration and music are decoded by ffmpeg as they are mixed (see
+    mix_stream), so memory does not grow with the length of the video. The
+    result is written to ``output_path`` (.wav, or AAC for .m4a) ready to be
+    muxed with the video.
+
+    Args:
+        narration_files (list): Files whose audio is played back to back (e.g. the video parts)
+        music_file (str): Background music, at least ``duration`` long
+        duration (float): Length of the soundtrack in seconds
+        **ducking: Overrides for mix_stream (speech_gain, gap_gain, threshold, ...)
+
+    Returns:
+        str: output_path
+    """
+    frames = int(round(duration * rate))
+    narration = AudioStream(narration_files, frames, rate, channels)
+    music = AudioStream([music_file], frames, rate, channels)
+    try:
+        write_audio(mix_stream(narration, music, frames, rate, fade, **ducking), output_path, rate, channels)
+    finally:
+        narration.close()
+        music.close()
+    record_output(output_path)
+    return output_path
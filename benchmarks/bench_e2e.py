@@ -0,0 +1,338 @@
+"""
+Run the whole trending-video pipeline offline and report per-stage throughput.
+
+Every external service is replaced by a local stand-in:
+
+* GitHub: a local HTTP server serves a generated trending page, repository
+  pages and the README API, so scraping and Selenium run against fixed pages.
+* edge-tts: ToneBackend writes a tone whose length depends only on the text,
+  with evenly spaced word timings so captions are rendered as usual.
+* Music: a synthetic library of tracks with varying loudness.
+* YouTube: the same server speaks the resumable upload protocol.
+
+Each repository count runs in a fresh child process with its own working
+directory, so caches, manifests and workspaces never carry over between
+scenarios. Headless Chrome, ffmpeg and the pipeline's Python dependencies
+must be installed; NLTK data is downloaded on first use.
+
+Usage:
+    python benchmarks/bench_e2e.py [--repos 3 10 25] [--output results.json]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_REPO_COUNTS = (3, 10, 25)
+LANGUAGE = "python"
+SINCE = "daily"
+
+# Stages shown in the summary, in pipeline order
+STAGES = ("trending", "screenshot", "screenshot.wait", "readme", "prep", "summarize", "script", "voice",
+          "voice.wait", "render", "music.index", "music.analyze", "music.clip", "combine", "upload")
+
+WORDS = ("fast", "async", "pipeline", "model", "server", "vector", "graph", "cache", "stream", "agent",
+         "compiler", "runtime", "plugin", "query", "tensor", "schema", "socket", "kernel", "parser", "index")
+
+def _text(seed, count):
+    """Deterministic filler text of ``count`` words."""
+    return " ".join(WORDS[(seed * 7 + i * 3) % len(WORDS)] for i in range(count))
+
+def repo_name(i):
+    return f"bench-org/project-{i:02d}"
+
+def trending_html(count):
+    rows = []
+    for i in range(count):
+        name = repo_name(i)
+        owner, repo = name.split("/")
+        rows.append(f"""
+<article class="Box-row">
+  <h2 class="h3 lh-condensed"><a href="/{name}">{owner} / {repo}</a></h2>
+  <p class="col-9 color-fg-muted my-1 pr-4">A {_text(i, 8)} toolkit.</p>
+  <div class="f6 color-fg-muted mt-2">
+    <span class="d-inline-block ml-0 mr-3"><span itemprop="programmingLanguage">Python</span></span>
+    <a href="/{name}/stargazers" class="Link--muted d-inline-block mr-3">{(count - i) * 1234:,}</a>
+    <a href="/{name}/forks" class="Link--muted d-inline-block mr-3">{(count - i) * 56:,}</a>
+    <span class="d-inline-block float-sm-right">{(count - i) * 89:,} stars today</span>
+  </div>
+</article>""")
+    return f"<html><body><div class=\"Box\">{''.join(rows)}</div></body></html>"
+
+def readme_markdown(i):
+    sections = []
+    for section in range(6):
+        sections.append(f"## {_text(i + section, 3).title()}\n\n{_text(i * 11 + section, 60)}.\n\n"
+                        f"```python\nimport {WORDS[(i + section) % len(WORDS)]}\n```\n")
+    return f"# {repo_name(i)}\n\n{_text(i, 40)}.\n\n" + "\n".join(sections)
+
+def repo_html(i):
+    paragraphs = "".join(f"<h2>{_text(i + n, 3).title()}</h2><p>{_text(i * 13 + n, 80)}.</p>"
+                         f"<pre><code>import {WORDS[n % len(WORDS)]}</code></pre>" for n in range(12))
+    return f"""<html><head><style>
+body {{ margin: 0; font: 16px sans-serif; background: #fff; }}
+header {{ height: 64px; background: #24292f; }}
+.container {{ width: 1280px; margin: 0 auto; display: flex; gap: 24px; }}
+.markdown-body {{ flex: 1; }}
+aside {{ width: 296px; }}
+</style></head><body>
+<header></header>
+<div class="container">
+  <article class="markdown-body"><h1>{repo_name(i)}</h1>{paragraphs}</article>
+  <aside><h2>About</h2><p>{_text(i, 20)}</p></aside>
+</div></body></html>"""
+
+def write_wav(path, samples, rate):
+    """Write 16-bit mono PCM; ``samples`` is a bytes object of little-endian int16."""
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(samples)
+
+def make_music_library(music_dir, seconds, tracks=2, rate=22050):
+    """Synthetic songs: a chord whose loudness swells and fades so the energy search has peaks to find."""
+    import numpy as np
+
+    os.makedirs(music_dir, exist_ok=True)
+    for n in range(tracks):
+        t = np.arange(int(seconds * rate)) / rate
+        tone = sum(np.sin(2 * math.pi * f * t) for f in (220 * (n + 1), 277, 330)) / 3
+        envelope = 0.3 + 0.7 * (0.5 + 0.5 * np.sin(2 * math.pi * t / (20 + 7 * n)))
+        write_wav(os.path.join(music_dir, f"track_{n}.wav"),
+                  (tone * envelope * 12000).astype("<i2").tobytes(), rate)
+
+class ToneBackend:
+    """
+    Stand-in for EdgeTTSBackend that writes a WAV tone instead of speech.
+
+    The duration depends only on the word count, so every run renders the
+    same amount of video. Words are spread evenly over the tone, like the
+    WordBoundary events edge-tts reports. There is no ``cache_key``, so
+    nothing is cached.
+    """
+
+    def __init__(self, seconds_per_word=0.25, min_seconds=3.0, max_seconds=12.0, rate=24000):
+        self.seconds_per_word = seconds_per_word
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self.rate = rate
+
+    def duration(self, text):
+        return min(self.max_seconds, max(self.min_seconds, len(text.split()) * self.seconds_per_word))
+
+    def _write(self, text, output_file):
+        # 200 Hz divides 24 kHz evenly, so one period can simply be repeated
+        period = self.rate // 200
+        cycle = b"".join(int(3000 * math.sin(2 * math.pi * k / period)).to_bytes(2, "little", signed=True)
+                         for k in range(period))
+        frames = int(self.duration(text) * self.rate)
+        write_wav(output_file, (cycle * (frames // period + 1))[:frames * 2], self.rate)
+
+    def words(self, text):
+        spoken = text.split()
+        step = self.duration(text) / max(1, len(spoken))
+        return [{"start": round(n * step, 3), "end": round((n + 0.8) * step, 3), "text": word}
+                for n, word in enumerate(spoken)]
+
+    async def synthesize(self, text, output_file):
+        await asyncio.to_thread(self._write, text, output_file)
+        return self.words(text)
+
+class BenchHandler(BaseHTTPRequestHandler):
+    """GitHub pages, the README API and the YouTube resumable upload protocol, all served locally."""
+
+    repo_count = 0
+    sessions = {}
+    session_ids = itertools.count(1)
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b"", content_type="text/html; charset=utf-8", headers=None):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/trending" or path.startswith("/trending/"):
+            return self._send(200, trending_html(self.repo_count))
+        readme = re.fullmatch(r"/api/repos/bench-org/project-(\d+)/readme", path)
+        if readme:
+            return self._send(200, readme_markdown(int(readme.group(1))), "text/plain; charset=utf-8")
+        page = re.fullmatch(r"/bench-org/project-(\d+)/?", path)
+        if page:
+            return self._send(200, repo_html(int(page.group(1))))
+        self._send(404, "not found")
+
+    def do_POST(self):
+        # Start of a resumable upload: hand out a session URI
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        if "/upload/" not in self.path:
+            return self._send(404, "not found")
+        total = int(self.headers.get("X-Upload-Content-Length") or 0)
+        with self.lock:
+            session = next(self.session_ids)
+            self.sessions[session] = {"received": 0, "total": total}
+        host = self.headers.get("Host")
+        self._send(200, "{}", "application/json", {"Location": f"http://{host}/upload-session/{session}"})
+
+    def do_PUT(self):
+        match = re.fullmatch(r"/upload-session/(\d+)", urlparse(self.path).path)
+        if not match or int(match.group(1)) not in self.sessions:
+            return self._send(404, "no such session")
+        state = self.sessions[int(match.group(1))]
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+
+        content_range = self.headers.get("Content-Range", "")
+        chunk = re.fullmatch(r"bytes (\d+)-(\d+)/(\d+|\*)", content_range)
+        if chunk:
+            state["received"] = int(chunk.group(2)) + 1
+            if chunk.group(3) != "*":
+                state["total"] = int(chunk.group(3))
+        # "bytes */total" is a status query after an interruption; just report progress
+
+        if state["total"] and state["received"] >= state["total"]:
+            body = json.dumps({"id": f"bench-{match.group(1)}", "kind": "youtube#video"})
+            return self._send(200, body, "application/json")
+        headers = {"Range": f"bytes=0-{state['received'] - 1}"} if state["received"] else {}
+        self._send(308, b"", "text/plain", headers)
+
+def start_server(repo_count):
+    BenchHandler.repo_count = repo_count
+    server = ThreadingHTTPServer(("127.0.0.1", 0), BenchHandler)
+    threading.Thread(target=server.serve_forever, name="bench-server", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def stage_summary(spans):
+    """
+    Totals per stage name.
+
+    ``elapsed`` runs from the first span's start to the last one's end, so
+    concurrent spans are not double counted; ``throughput`` is spans per
+    elapsed second.
+    """
+    summary = {}
+    for name in STAGES:
+        matching = [span for span in spans if span["name"] == name]
+        if not matching:
+            continue
+        start = min(span["start"] for span in matching)
+        end = max(span["start"] + span["wall"] for span in matching)
+        elapsed = end - start
+        summary[name] = {
+            "count": len(matching),
+            "elapsed": elapsed,
+            "busy": sum(span["wall"] for span in matching),
+            "cpu": sum(span["cpu"] + span["child_cpu"] for span in matching),
+            "bytes_written": sum(span["bytes_written"] for span in matching),
+            "retries": sum(span["retries"] for span in matching),
+            "throughput": len(matching) / elapsed if elapsed > 0 else None,
+        }
+    return summary
+
+def run_child(repo_count, workdir):
+    os.chdir(workdir)
+    backend = ToneBackend()
+    make_music_library("music", seconds=repo_count * backend.max_seconds + 30)
+    server, base_url = start_server(repo_count)
+
+    from google.oauth2.credentials import Credentials
+    from main import create_trending_video
+    from readme_fetcher import ReadmeFetcher
+    from tracing import get_tracer
+    from utils import get_trending
+    from youtube_uploader import YouTubeUploader
+
+    start = time.perf_counter()
+    repos = get_trending([LANGUAGE], [SINCE], repo_count, base_url=base_url)[(LANGUAGE, SINCE)]
+    uploader = YouTubeUploader(credentials=Credentials(token="bench"), api_endpoint=f"{base_url}/")
+    video_id = create_trending_video(repos, LANGUAGE, SINCE, base_url=base_url,
+                                     fetcher=ReadmeFetcher(api_url=f"{base_url}/api"),
+                                     voice_backend=backend, uploader=uploader, music_dir="music")
+    elapsed = time.perf_counter() - start
+    uploader.close()
+    server.shutdown()
+
+    print(json.dumps({
+        "repos": repo_count,
+        "fetched": len(repos),
+        "ok": video_id is not None,
+        "seconds": elapsed,
+        "stages": stage_summary(get_tracer().spans()),
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repos", type=int, nargs="+", default=list(DEFAULT_REPO_COUNTS),
+                        help="Repository counts to benchmark")
+    parser.add_argument("--output", help="Also write the results as JSON to this file")
+    parser.add_argument("--child", nargs=2, metavar=("REPOS", "WORKDIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(int(args.child[0]), args.child[1])
+        return
+
+    results = []
+    for repo_count in args.repos:
+        with tempfile.TemporaryDirectory(prefix=f"bench-e2e-{repo_count}-") as workdir:
+            # Workspaces go under TMPDIR, so point it into the scenario's directory too
+            env = dict(os.environ, TMPDIR=workdir)
+            process = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", str(repo_count), workdir],
+                                     capture_output=True, text=True, env=env)
+            if process.returncode != 0:
+                print(process.stdout[-2000:])
+                print(process.stderr[-4000:])
+                sys.exit(f"Scenario with {repo_count} repositories failed")
+            result = json.loads(process.stdout.strip().splitlines()[-1])
+        results.append(result)
+        status = "ok" if result["ok"] else "FAILED"
+        print(f"{repo_count} repos: {result['seconds']:.1f}s end to end [{status}]")
+
+    counts = [result["repos"] for result in results]
+    print()
+    print(f"{'stage':<16}" + "".join(f"{f'{n} repos (s, /s)':>22}" for n in counts))
+    for name in STAGES:
+        cells = []
+        for result in results:
+            stage = result["stages"].get(name)
+            if stage is None:
+                cells.append(f"{'-':>22}")
+            else:
+                throughput = f"{stage['throughput']:.2f}" if stage["throughput"] else "-"
+                cells.append(f"{stage['elapsed']:>14.2f}{throughput:>8}")
+        print(f"{name:<16}" + "".join(cells))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if not all(result["ok"] for result in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
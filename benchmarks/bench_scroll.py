@@ -0,0 +1,102 @@
+"""
+Compare the ffmpeg scroll renderer against the moviepy ImageClip/vfx.scroll path.
+
+Each renderer runs in its own child process on the same synthetic 1920px
+wide screenshot and narration, so wall time and peak RSS are measured
+independently. "ffmpeg-npy" renders from the memory-mapped array written by
+screenshot_prep instead of decoding the PNG.
+
+Usage:
+    python benchmarks/bench_scroll.py [--duration 30] [--height 8000]
+"""
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+RENDERERS = ("moviepy", "ffmpeg", "ffmpeg-npy")
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def make_fixtures(workdir, height, duration):
+    """Write screenshot_0.png and output_0.wav into workdir."""
+    import numpy as np
+    from PIL import Image
+
+    rows = np.arange(height)[:, None]
+    cols = np.arange(1920)[None, :]
+    # Text-like horizontal bands so the encoder has real detail to chew on
+    image = np.where(((rows // 18) % 3 == 0) & ((cols // 7) % 5 != 0), 40, 250).astype(np.uint8)
+    Image.fromarray(np.stack([image] * 3, axis=-1)).save(os.path.join(workdir, "screenshot_0.png"))
+
+    rate = 24000
+    with wave.open(os.path.join(workdir, "output_0.wav"), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        t = np.arange(int(duration * rate)) / rate
+        wav.writeframes((3000 * np.sin(2 * math.pi * 220 * t)).astype("<i2").tobytes())
+
+def run_child(renderer, workdir, duration):
+    from video_generator import create_video
+
+    os.chdir(workdir)
+    start = time.perf_counter()
+    # The moviepy path probes the narration itself, as it did before the ffmpeg renderer
+    known_duration = duration if renderer.startswith("ffmpeg") else None
+    create_video("", "output_0.wav", f"bench_{renderer}.mp4", 0, duration=known_duration,
+                 renderer=renderer.split("-")[0])
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"renderer": renderer, "seconds": elapsed, "peak_rss_mb": peak_rss_mb()}))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=30.0, help="Narration length in seconds")
+    parser.add_argument("--height", type=int, default=8000, help="Screenshot height in pixels")
+    parser.add_argument("--child", nargs=2, metavar=("RENDERER", "WORKDIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child[0], args.child[1], args.duration)
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        make_fixtures(workdir, args.height, args.duration)
+        results = {}
+        for renderer in RENDERERS:
+            if renderer == "ffmpeg-npy":
+                # create_video picks screenshot_0.npy up from here on
+                from screenshot_prep import preprocess_screenshot
+                preprocess_screenshot(os.path.join(workdir, "screenshot_0.png"),
+                                      os.path.join(workdir, "screenshot_0.npy"), crop=False)
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--duration", str(args.duration),
+                 "--child", renderer, workdir],
+                check=True, capture_output=True, text=True
+            ).stdout
+            results[renderer] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{'renderer':<12}{'seconds':>10}{'peak RSS (MB)':>16}")
+    for renderer in RENDERERS:
+        result = results[renderer]
+        rss = f"{result['peak_rss_mb']:.0f}" if result["peak_rss_mb"] is not None else "n/a"
+        print(f"{renderer:<12}{result['seconds']:>10.2f}{rss:>16}")
+    print(f"speedup: {results['moviepy']['seconds'] / results['ffmpeg']['seconds']:.1f}x")
+
+if __name__ == "__main__":
+    main()
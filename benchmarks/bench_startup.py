@@ -0,0 +1,79 @@
+"""
+Check process startup cost of common entry points against a time budget.
+
+Each scenario runs in a fresh interpreter under ``python -X importtime``; the
+cumulative import time of the scenario's modules and the wall time of the
+whole process are compared to the budget. Exits non-zero on a regression.
+
+Usage:
+    python benchmarks/bench_startup.py [--budget-ms 500] [--repeat 3] [--top 5]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Scenario -> code run at startup; none of these may trigger heavy imports
+SCENARIOS = {
+    "upload-only": "from utils import upload_to_youtube",
+    "scrape-only": "from utils import get_trending, fetch_repo_content",
+    "main": "import main",
+}
+
+DEFAULT_BUDGET_MS = 500
+
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+def run_scenario(code):
+    """
+    Run one scenario in a fresh interpreter.
+
+    Returns:
+        Tuple[float, float, List[Tuple[int, str]]]: (wall ms, total import ms,
+        top-level imports as (cumulative us, module) pairs)
+    """
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=ROOT, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise Exception(f"Scenario failed: {code}\n{result.stderr[-2000:]}")
+
+    top_level = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        # Top-level imports have exactly one space of indentation before the name
+        if match and len(match.group(3)) == 1:
+            top_level.append((int(match.group(2)), match.group(4)))
+    import_ms = sum(cumulative for cumulative, _ in top_level) / 1000
+    return wall_ms, import_ms, top_level
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="Maximum allowed import time per scenario")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario; the best is kept")
+    parser.add_argument("--top", type=int, default=5, help="Slowest top-level imports to show")
+    args = parser.parse_args()
+
+    failures = []
+    for name, code in SCENARIOS.items():
+        wall_ms, import_ms, top_level = min((run_scenario(code) for _ in range(args.repeat)),
+                                            key=lambda result: result[1])
+        status = "ok" if import_ms <= args.budget_ms else "OVER BUDGET"
+        print(f"{name:<12} imports {import_ms:8.1f} ms   process {wall_ms:8.1f} ms   [{status}]")
+        for cumulative, module in sorted(top_level, reverse=True)[:args.top]:
+            print(f"    {cumulative / 1000:8.1f} ms  {module}")
+        if import_ms > args.budget_ms:
+            failures.append(name)
+
+    if failures:
+        print(f"Startup budget of {args.budget_ms:.0f} ms exceeded by: {', '.join(failures)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
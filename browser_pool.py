@@ -0,0 +1,241 @@
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from lazy import lazy_import
+
+webdriver = lazy_import("selenium.webdriver")
+Service = lazy_import("selenium.webdriver.chrome.service", "Service")
+By = lazy_import("selenium.webdriver.common.by", "By")
+WebDriverWait = lazy_import("selenium.webdriver.support.ui", "WebDriverWait")
+EC = lazy_import("selenium.webdriver.support.expected_conditions")
+ChromeDriverManager = lazy_import("webdriver_manager.chrome", "ChromeDriverManager")
+
+# Resolved chromedriver path, reused so startup doesn't go through webdriver_manager
+DRIVER_CACHE_FILE = os.path.join(".cache", "chromedriver.json")
+
+# Chrome is restarted after this many pages, before its memory use creeps up
+MAX_DRIVER_USES = 50
+
+_driver_path_lock = threading.Lock()
+
+def default_chrome_options():
+    """Headless Chrome options used for repository screenshots."""
+    options = webdriver.ChromeOptions()
+    options.add_argument('--headless')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--window-size=1920,1080')
+    options.add_argument('--force-device-scale-factor=0.85')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    return options
+
+def resolve_driver_path(cache_file=DRIVER_CACHE_FILE):
+    """
+    Return the chromedriver binary path, asking webdriver_manager only on a cache miss.
+
+    Returns:
+        str: Path to the chromedriver executable
+    """
+    with _driver_path_lock:
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                path = json.load(f)["path"]
+            if os.path.exists(path):
+                return path
+        except (OSError, ValueError, KeyError):
+            pass
+
+        path = ChromeDriverManager().install()
+        os.makedirs(os.path.dirname(cache_file) or ".", exist_ok=True)
+        tmp_file = f"{cache_file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"path": path}, f)
+        os.replace(tmp_file, cache_file)
+        return path
+
+def wait_for_network_idle(driver, timeout=10, idle_time=0.5, poll=0.1):
+    """
+    Block until the page has stopped issuing resource requests for idle_time seconds.
+
+    Returns:
+        bool: True if the page went idle, False if the timeout expired first
+    """
+    deadline = time.monotonic() + timeout
+    last_count = -1
+    last_change = time.monotonic()
+    while time.monotonic() < deadline:
+        count = driver.execute_script(
+            "return document.readyState === 'complete' ? performance.getEntriesByType('resource').length : -1;"
+        )
+        now = time.monotonic()
+        if count != last_count:
+            last_count = count
+            last_change = now
+        elif count >= 0 and now - last_change >= idle_time:
+            return True
+        time.sleep(poll)
+    return False
+
+def wait_for_paint(driver, timeout=5):
+    """Wait until the browser has laid out and painted the current viewport."""
+    driver.set_script_timeout(timeout)
+    driver.execute_async_script(
+        "const done = arguments[arguments.length - 1];"
+        "requestAnimationFrame(() => requestAnimationFrame(() => done(true)));"
+    )
+
+def wait_until_ready(driver, selector_class="markdown-body", timeout=20):
+    """
+    Wait for a repository page to be ready for a screenshot.
+
+    Returns:
+        bool: Whether the README container appeared before the timeout
+    """
+    found = True
+    try:
+        WebDriverWait(driver, timeout).until(EC.presence_of_element_located((By.CLASS_NAME, selector_class)))
+    except Exception:
+        found = False
+    wait_for_network_idle(driver, timeout=timeout)
+    return found
+
+class BrowserPool:
+    """
+    A fixed set of headless Chrome drivers shared between capture jobs.
+
+    Drivers are started once and handed out through a queue, so several
+    repositories can be captured in parallel without paying Chrome startup
+    per page. A driver whose browser has died is replaced when it is next
+    handed out, and every driver is restarted after ``max_uses`` pages.
+    """
+
+    def __init__(self, size=3, options_factory=default_chrome_options, driver_path=None,
+                 max_uses=MAX_DRIVER_USES):
+        self.size = size
+        self.options_factory = options_factory
+        self.driver_path = driver_path
+        self.max_uses = max_uses
+        self._drivers = []
+        self._uses = {}
+        self._idle = queue.Queue()
+        # Guards _drivers and _uses, which acquire, _replace and close change from several threads
+        self._lock = threading.Lock()
+
+    def _start_driver(self):
+        service = Service(self.driver_path)
+        return webdriver.Chrome(service=service, options=self.options_factory())
+
+    def start(self):
+        """Launch all drivers concurrently."""
+        if self._drivers:
+            return self
+        if self.driver_path is None:
+            self.driver_path = resolve_driver_path()
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            futures = [executor.submit(self._start_driver) for _ in range(self.size)]
+            for future in futures:
+                try:
+                    driver = future.result()
+                except Exception as e:
+                    print(f"Failed to start browser: {e}")
+                    continue
+                with self._lock:
+                    self._drivers.append(driver)
+                    self._uses[driver] = 0
+                self._idle.put(driver)
+        if not self._drivers:
+            raise Exception("Could not start any browser for the pool")
+        return self
+
+    @staticmethod
+    def _alive(driver):
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def _replace(self, driver):
+        """Quit a dead or worn-out driver and start a new one in its place."""
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        try:
+            new_driver = self._start_driver()
+        except Exception:
+            # Keep the slot; the next acquire tries again
+            self._release(driver)
+            raise
+        with self._lock:
+            slot = next((n for n, pooled in enumerate(self._drivers) if pooled is driver), None)
+            if slot is not None:
+                self._drivers[slot] = new_driver
+                self._uses.pop(driver, None)
+                self._uses[new_driver] = 0
+        if slot is None:
+            # close() ran while the new browser was starting
+            new_driver.quit()
+            raise Exception("Browser pool was closed")
+        return new_driver
+
+    def _release(self, driver):
+        """Hand a driver back, unless the pool was closed while it was out."""
+        with self._lock:
+            pooled = any(pooled is driver for pooled in self._drivers)
+        if pooled:
+            self._idle.put(driver)
+
+    @contextmanager
+    def acquire(self):
+        """Borrow a live driver for the duration of a with-block."""
+        driver = self._idle.get()
+        with self._lock:
+            uses = self._uses.get(driver, 0)
+        if uses >= self.max_uses:
+            print(f"Restarting browser after {uses} pages")
+            driver = self._replace(driver)
+        elif not self._alive(driver):
+            print("Browser stopped responding, starting a new one")
+            driver = self._replace(driver)
+        with self._lock:
+            if driver in self._uses:
+                self._uses[driver] += 1
+        try:
+            yield driver
+        finally:
+            self._release(driver)
+
+    def map(self, fn, items):
+        """
+        Run fn(driver, item) for every item, spread across the pool.
+
+        Returns:
+            list: Results in the order of items; the first failure is re-raised
+        """
+        def run(item):
+            with self.acquire() as driver:
+                return fn(driver, item)
+
+        with ThreadPoolExecutor(max_workers=len(self._drivers) or 1) as executor:
+            return list(executor.map(run, items))
+
+    def close(self):
+        with self._lock:
+            drivers, self._drivers, self._uses = self._drivers, [], {}
+            self._idle = queue.Queue()
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+def hash_key(*parts) -> str:
+    """Build a stable cache key from JSON-serialisable parts."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class DiskCache:
+    """
+    Size-bounded on-disk store of small file bundles.
+
+    Every entry is a directory ``<root>/<key[:2]>/<key>/`` holding the cached
+    files plus a ``meta.json``. Entries are assembled in a scratch directory and
+    renamed into place, so readers never see a half-written entry, even across
+    processes. The mtime of ``meta.json`` is bumped on every hit and the least
+    recently used entries are evicted once the store grows past ``max_bytes``.
+    """
+
+    META_FILE = "meta.json"
+
+    def __init__(self, root: str, max_bytes: int = 512 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root, "tmp"), exist_ok=True)
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def path(self, key: str, name: str) -> str:
+        """Path of a file inside an entry (whether or not it exists yet)."""
+        return os.path.join(self._entry_dir(key), name)
+
+    def get(self, key: str):
+        """
+        Look up an entry and mark it as recently used.
+
+        Returns:
+            dict: The entry metadata, or None on a miss
+        """
+        meta_path = self.path(key, self.META_FILE)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            return None
+        for name in meta.get("files", {}):
+            if not os.path.exists(self.path(key, name)):
+                return None
+        return meta
+
+    def put(self, key: str, files: dict, meta: dict = None) -> dict:
+        """
+        Store a bundle of files atomically.
+
+        Args:
+            key (str): Entry key, usually from hash_key()
+            files (dict): Mapping of entry file name -> source path to copy in,
+                or -> bytes to write directly
+            meta (dict): Extra JSON-serialisable metadata kept with the entry
+
+        Returns:
+            dict: The stored metadata
+        """
+        scratch = os.path.join(self.root, "tmp", uuid.uuid4().hex)
+        os.makedirs(scratch)
+        try:
+            sizes = {}
+            for name, src in files.items():
+                dst = os.path.join(scratch, name)
+                if isinstance(src, bytes):
+                    with open(dst, "wb") as f:
+                        f.write(src)
+                else:
+                    shutil.copyfile(src, dst)
+                sizes[name] = os.path.getsize(dst)
+            entry_meta = dict(meta or {})
+            entry_meta["files"] = sizes
+            entry_meta["created"] = time.time()
+            with open(os.path.join(scratch, self.META_FILE), "w", encoding="utf-8") as f:
+                json.dump(entry_meta, f)
+
+            target = self._entry_dir(key)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            try:
+                os.rename(scratch, target)
+            except OSError:
+                if self.get(key) is not None:
+                    # Another writer stored the same key first; keep theirs
+                    shutil.rmtree(scratch, ignore_errors=True)
+                else:
+                    # An incomplete entry (e.g. from a crash) would block this key forever; replace it
+                    self._move_aside(target)
+                    try:
+                        os.rename(scratch, target)
+                    except OSError:
+                        shutil.rmtree(scratch, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(scratch, ignore_errors=True)
+            raise
+
+        self.evict()
+        return entry_meta
+
+    def _move_aside(self, entry_dir: str):
+        """Rename an entry into the scratch area, so readers stop seeing it at once, and delete it there."""
+        trash = os.path.join(self.root, "tmp", uuid.uuid4().hex)
+        try:
+            os.rename(entry_dir, trash)
+        except OSError:
+            return
+        shutil.rmtree(trash, ignore_errors=True)
+
+    def discard(self, key: str):
+        """Remove one entry if present."""
+        shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+
+    def entries(self):
+        """Yield (key, last_used, size_bytes) for every complete entry."""
+        for shard in os.listdir(self.root):
+            shard_dir = os.path.join(self.root, shard)
+            if shard == "tmp" or not os.path.isdir(shard_dir):
+                continue
+            for key in os.listdir(shard_dir):
+                entry_dir = os.path.join(shard_dir, key)
+                try:
+                    last_used = os.path.getmtime(os.path.join(entry_dir, self.META_FILE))
+                    size = sum(e.stat().st_size for e in os.scandir(entry_dir) if e.is_file())
+                except OSError:
+                    continue
+                yield key, last_used, size
+
+    def evict(self):
+        """Drop least recently used entries until the store fits in max_bytes."""
+        with self._lock:
+            entries = sorted(self.entries(), key=lambda entry: entry[1])
+            total = sum(size for _, _, size in entries)
+            for key, _, size in entries:
+                if total <= self.max_bytes:
+                    break
+                self.discard(key)
+                total -= size
@@ -0,0 +1,255 @@
+import json
+import os
+from cache import hash_key
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+ImageDraw = lazy_import("PIL.ImageDraw")
+ImageFont = lazy_import("PIL.ImageFont")
+
+# TrueType font for burned-in captions, by path or by a name on the font path
+CAPTION_FONT = os.environ.get("CAPTION_FONT", "DejaVuSans-Bold.ttf")
+
+# Caption text height as a share of the frame height
+CAPTION_FONT_SCALE = 0.05
+
+# Text colour, colour of the word being spoken, and the translucent box behind the line
+CAPTION_COLOR = (255, 255, 255)
+CAPTION_HIGHLIGHT = (255, 214, 10)
+CAPTION_BOX = (24, 24, 24)
+CAPTION_BOX_ALPHA = 0.65
+
+# A line holds at most this many words and this share of the frame width
+CAPTION_MAX_WORDS = 7
+CAPTION_MAX_WIDTH = 0.8
+
+# A silence this long (seconds) between two words starts a new line
+CAPTION_PAUSE = 0.6
+
+# A line stays up this long after its last word when nothing follows right away
+CAPTION_HOLD = 0.5
+
+# Gap between the bottom of the box and the bottom of the frame, as a share of the frame height
+CAPTION_MARGIN = 0.06
+
+def word_timings_path(audio_file):
+    """Sidecar file holding the word timings of a narration."""
+    return os.path.splitext(audio_file)[0] + ".words.json"
+
+def save_word_timings(words, audio_file):
+    """Write word timings next to ``audio_file``; an empty list removes a stale sidecar."""
+    path = word_timings_path(audio_file)
+    if not words:
+        if os.path.exists(path):
+            os.remove(path)
+        return None
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(words, f, ensure_ascii=False)
+    return path
+
+def load_word_timings(audio_file):
+    """
+    Word timings written next to a narration by the voice stage.
+
+    Returns:
+        List[dict]: ``{"start", "end", "text"}`` per spoken word, times in
+        seconds from the start of the audio, or None if there are none
+    """
+    path = word_timings_path(audio_file)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f) or None
+
+def caption_style_key():
+    """Key of everything that changes how captions look, for caches of rendered video."""
+    return hash_key("captions", CAPTION_FONT, CAPTION_FONT_SCALE, CAPTION_COLOR, CAPTION_HIGHLIGHT, CAPTION_BOX,
+                    CAPTION_BOX_ALPHA, CAPTION_MAX_WORDS, CAPTION_MAX_WIDTH, CAPTION_PAUSE, CAPTION_HOLD,
+                    CAPTION_MARGIN)
+
+def load_font(size, font=CAPTION_FONT):
+    try:
+        return ImageFont.truetype(font, size)
+    except OSError:
+        print(f"Caption font {font} not found, using Pillow's default font")
+        try:
+            return ImageFont.load_default(size)
+        except TypeError:
+            # Pillow before 10.1 only has the fixed-size bitmap font
+            return ImageFont.load_default()
+
+class GlyphAtlas:
+    """
+    Every glyph a caption track needs, rasterized once into one coverage array.
+
+    Text is then drawn by copying glyph cells out of ``alpha`` with NumPy,
+    without calling into Pillow per line or per frame. Glyphs are placed by
+    their advance width without kerning, which is indistinguishable at
+    caption sizes. Cells are padded on both sides so glyphs that overhang
+    their advance are not clipped; overlapping cells are merged with max.
+    """
+
+    def __init__(self, chars, size, font=CAPTION_FONT):
+        font = load_font(size, font)
+        ascent, descent = font.getmetrics()
+        self.height = ascent + descent
+        self.pad = max(1, size // 8)
+        chars = sorted(set(chars) | {" "})
+        self.advance = {ch: font.getlength(ch) for ch in chars}
+
+        self.cells = {}
+        x = 0
+        for ch in chars:
+            width = int(np.ceil(self.advance[ch])) + 2 * self.pad
+            self.cells[ch] = (x, width)
+            x += width
+        sheet = Image.new("L", (max(1, x), self.height), 0)
+        draw = ImageDraw.Draw(sheet)
+        for ch, (x, _) in self.cells.items():
+            draw.text((x + self.pad, 0), ch, fill=255, font=font)
+        self.alpha = np.asarray(sheet, dtype=np.uint8)
+
+    def measure(self, text):
+        """Advance width of ``text`` in pixels."""
+        return sum(self.advance.get(ch, 0) for ch in text)
+
+    def draw(self, text):
+        """
+        Coverage mask of one line of text.
+
+        Returns:
+            np.ndarray: (height, width) uint8 array; the text starts ``pad`` pixels in
+        """
+        mask = np.zeros((self.height, int(np.ceil(self.measure(text))) + 2 * self.pad), dtype=np.uint8)
+        pen = 0.0
+        for ch in text:
+            if ch not in self.cells:
+                continue
+            x, width = self.cells[ch]
+            left = int(round(pen))
+            target = mask[:, left:left + width]
+            np.maximum(target, self.alpha[:, x:x + target.shape[1]], out=target)
+            pen += self.advance[ch]
+        return mask
+
+class CaptionTrack:
+    """
+    Word-synchronized captions for one narration, composited onto raw RGB frames.
+
+    Words are grouped into short lines (split at pauses, after CAPTION_MAX_WORDS
+    words, or when a line would get too wide). While a line is up, the word
+    being spoken is drawn in CAPTION_HIGHLIGHT. Only the rows of the caption
+    band are copied and blended per frame; the blend weights of a line are
+    computed once when it (or its highlighted word) changes, so each frame
+    costs one integer multiply-add over the box.
+    """
+
+    def __init__(self, words, size, fps):
+        width, height = size
+        self.width = width
+        self.fps = fps
+        self.words = [word for word in words if word["text"].strip()]
+        font_size = max(8, round(height * CAPTION_FONT_SCALE))
+        self.atlas = GlyphAtlas("".join(word["text"] for word in self.words), font_size)
+
+        self.pad_x = self.atlas.height // 2
+        self.pad_y = self.atlas.height // 6
+        self.box_height = self.atlas.height + 2 * self.pad_y
+        self.bottom = height - int(height * CAPTION_MARGIN)
+        self.top = self.bottom - self.box_height
+
+        self.lines = self._layout(CAPTION_MAX_WIDTH * width - 2 * self.pad_x)
+        self.starts = np.array([word["start"] for word in self.words], dtype=np.float64)
+        self.word_line = np.zeros(len(self.words), dtype=np.int64)
+        self.line_ends = []
+        for n, (first, last) in enumerate(self.lines):
+            self.word_line[first:last] = n
+            end = self.words[last - 1]["end"] + CAPTION_HOLD
+            if n + 1 < len(self.lines):
+                end = min(end, self.words[last]["start"])
+            self.line_ends.append(end)
+
+        self._state = None
+        self._blend = None
+
+    def _layout(self, max_width):
+        """Split the words into lines; returns (first, last) word index ranges, last exclusive."""
+        lines = []
+        first = 0
+        for n in range(1, len(self.words) + 1):
+            if n < len(self.words):
+                text = " ".join(word["text"] for word in self.words[first:n + 1])
+                if (n - first < CAPTION_MAX_WORDS and self.atlas.measure(text) <= max_width
+                        and self.words[n]["start"] - self.words[n - 1]["end"] < CAPTION_PAUSE):
+                    continue
+            lines.append((first, n))
+            first = n
+        return lines
+
+    def state(self, frame_index):
+        """(line, highlighted word) shown on a frame, or None if no caption is up."""
+        if not self.words:
+            return None
+        t = frame_index / self.fps
+        word = int(np.searchsorted(self.starts, t, side="right")) - 1
+        if word < 0:
+            return None
+        line = int(self.word_line[word])
+        if t >= self.line_ends[line]:
+            return None
+        return line, word
+
+    def _weights(self, line, word):
+        """
+        Blend weights of a caption state, scaled by 256.
+
+        Returns:
+            Tuple[int, np.ndarray, np.ndarray]: Left column of the box, the weight
+            kept from the frame ((h, w, 1) uint16) and the premultiplied caption
+            colour ((h, w, 3) uint16)
+        """
+        first, last = self.lines[line]
+        texts = [w["text"] for w in self.words[first:last]]
+        mask = self.atlas.draw(" ".join(texts))
+        box_width = min(self.width, mask.shape[1] - 2 * self.atlas.pad + 2 * self.pad_x)
+        left = (self.width - box_width) // 2
+
+        text_alpha = np.zeros((self.box_height, box_width), dtype=np.float32)
+        x = self.pad_x - self.atlas.pad
+        visible = mask[:, max(0, -x):box_width - x]
+        text_alpha[self.pad_y:self.pad_y + mask.shape[0], max(0, x):max(0, x) + visible.shape[1]] = visible / 255.0
+
+        color = np.empty((self.box_height, box_width, 3), dtype=np.float32)
+        color[:] = CAPTION_COLOR
+        start = self.pad_x + self.atlas.measure(" ".join(texts[:word - first]) + (" " if word > first else ""))
+        end = start + self.atlas.measure(texts[word - first])
+        color[:, max(0, int(start) - 1):int(np.ceil(end)) + 1] = CAPTION_HIGHLIGHT
+
+        text_alpha = text_alpha[..., None]
+        keep = (1 - CAPTION_BOX_ALPHA) * (1 - text_alpha)
+        box_color = np.array(CAPTION_BOX, dtype=np.float32) * CAPTION_BOX_ALPHA
+        premultiplied = box_color * (1 - text_alpha) + color * text_alpha
+        return left, (keep * 256).astype(np.uint16), (premultiplied * 256).astype(np.uint16)
+
+    def band(self, frame, frame_index):
+        """
+        The caption band of ``frame`` with the caption blended in.
+
+        Returns:
+            np.ndarray: Rows ``top:bottom`` of the frame as a new (h, width, 3)
+            uint8 array, or None if no caption is shown on this frame
+        """
+        state = self.state(frame_index)
+        if state is None:
+            return None
+        if state != self._state:
+            self._state, self._blend = state, self._weights(*state)
+        left, keep, premultiplied = self._blend
+        band = np.array(frame[self.top:self.bottom])
+        box = band[:, left:left + keep.shape[1]]
+        blended = box * keep
+        blended += premultiplied
+        blended >>= 8
+        box[:] = blended
+        return band
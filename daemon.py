@@ -0,0 +1,381 @@
+import argparse
+import json
+import os
+import signal
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from browser_pool import BrowserPool
+from cache import hash_key
+from ffmpeg_tools import ffmpeg_binary
+from job_queue import JobQueue, UPLOAD_YOUTUBE, UPLOAD_NONE
+from main import create_trending_video, resume_or_fetch_trending, run_id
+from readme_fetcher import ReadmeFetcher
+from resource_limits import ResourceLimits, DEFAULT_LIMITS
+from run_state import RunManifest, RUNS_DIR
+from scheduler import CronSchedule, PUBLISH_SCHEDULE, SCHEDULE_TIMEZONE
+from summarizer import get_summarizer
+from tracing import get_tracer, span, tags
+from utils import language_label, DEFAULT_TOP_N, SCREENSHOT_WORKERS, TIME_RANGES
+from voice_generator import get_event_loop
+from youtube_uploader import get_uploader
+
+DAEMON_CONFIG_FILE = "daemon.json"
+
+# Local HTTP API for submitting and inspecting jobs; only bound to loopback
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = 8765
+
+# Seconds between looks at an empty job queue
+POLL_INTERVAL = 5
+
+# Used for any key missing from the config file: the Python daily video, built
+# at noon and published at 6 PM IST, with one job per resource at a time
+DEFAULT_CONFIG = {
+    "timezone": SCHEDULE_TIMEZONE,
+    "publish": PUBLISH_SCHEDULE,
+    "schedules": [
+        {"cron": "0 12 * * *", "language": "python", "since": "daily", "top": DEFAULT_TOP_N,
+         "upload": UPLOAD_YOUTUBE},
+    ],
+    "limits": DEFAULT_LIMITS,
+    "workers": 2,
+}
+
+def job_variant(top, upload):
+    """
+    Run-id suffix of a job that differs from the default video of its trending page.
+
+    The default (DEFAULT_TOP_N repositories, uploaded to YouTube) shares its
+    run with ``python main.py``, so the two never upload the same page twice.
+
+    Returns:
+        str: e.g. ``top5-local``, or None for the default video
+    """
+    parts = []
+    if int(top) != DEFAULT_TOP_N:
+        parts.append(f"top{int(top)}")
+    if upload == UPLOAD_NONE:
+        parts.append("local")
+    elif upload != UPLOAD_YOUTUBE:
+        parts.append(f"api{hash_key('upload', upload)[:8]}")
+    return "-".join(parts) or None
+
+def parse_publish_at(value):
+    """
+    Check a job's publish time, which must name its timezone.
+
+    Returns:
+        str: The time in ISO-8601, or None if not given
+    """
+    if value is None or value == "":
+        return None
+    if not isinstance(value, str):
+        raise ValueError("publish_at must be an ISO-8601 string")
+    publish_at = datetime.fromisoformat(value)
+    if publish_at.tzinfo is None or publish_at.utcoffset() is None:
+        raise ValueError("publish_at must include a UTC offset, e.g. 2024-01-01T18:00:00+05:30")
+    return publish_at.isoformat()
+
+def parse_run_at(value):
+    """
+    Epoch seconds of a job's start time, given as epoch seconds or an ISO-8601 time with a UTC offset.
+
+    Returns:
+        float: The start time, or None to start as soon as possible
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        raise ValueError("run_at must be epoch seconds or an ISO-8601 time")
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        raise ValueError("run_at must be epoch seconds or an ISO-8601 time")
+    run_at = datetime.fromisoformat(value)
+    if run_at.tzinfo is None or run_at.utcoffset() is None:
+        raise ValueError("run_at must include a UTC offset, e.g. 2024-01-01T12:00:00+00:00")
+    return run_at.timestamp()
+
+def load_config(path=DAEMON_CONFIG_FILE):
+    """Daemon settings from a JSON file, on top of DEFAULT_CONFIG."""
+    config = dict(DEFAULT_CONFIG)
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            config.update(json.load(f))
+    return config
+
+class Daemon:
+    """
+    Long-running video builder.
+
+    Chrome, the summarizer, the voice event loop, the ffmpeg lookup and the
+    YouTube client are set up once in ``warm_up`` and shared by every job.
+    Jobs come from a JobQueue, fed by the cron-like ``schedules`` of the config,
+    the local HTTP API and ``python daemon.py submit``. ``workers`` jobs run at
+    once, and ResourceLimits keeps them from piling onto the same resource:
+    with the defaults one job captures while another renders and a third
+    uploads.
+    """
+
+    def __init__(self, config=None, queue=None, host=DAEMON_HOST, port=DAEMON_PORT, tmpfs=False):
+        self.config = config or load_config()
+        self.queue = queue or JobQueue()
+        self.limits = ResourceLimits(self.config["limits"])
+        self.host = host
+        self.port = port
+        self.tmpfs = tmpfs
+        timezone = self.config["timezone"]
+        self.schedules = [(CronSchedule(entry["cron"], entry.get("timezone", timezone)), entry)
+                          for entry in self.config["schedules"]]
+        self.publish_schedule = CronSchedule(self.config["publish"], timezone)
+        self.browser_pool = None
+        self.fetcher = None
+        self._stop = threading.Event()
+        self._threads = []
+        self._server = None
+        self._active = 0
+        self._active_lock = threading.Lock()
+
+    def warm_up(self):
+        """Start the resources every job shares."""
+        with span("warmup"):
+            ffmpeg_binary()
+            get_summarizer()
+            get_event_loop()
+            self.fetcher = ReadmeFetcher()
+            self.browser_pool = BrowserPool(size=SCREENSHOT_WORKERS).start()
+            if any(entry.get("upload", UPLOAD_YOUTUBE) == UPLOAD_YOUTUBE for _, entry in self.schedules):
+                try:
+                    get_uploader().start()
+                except Exception as e:
+                    # Jobs retry the sign-in when they get to their upload
+                    print(f"YouTube client not ready: {e}")
+
+    def enqueue(self, entry):
+        """Queue the job of a schedule entry unless the same job is already waiting."""
+        language, since = entry.get("language", "python"), entry.get("since", "daily")
+        top, upload = entry.get("top", DEFAULT_TOP_N), entry.get("upload", UPLOAD_YOUTUBE)
+        if self.queue.pending(language, since, top, upload):
+            print(f"{since} {language_label(language)} video already queued, not adding another")
+            return None
+        job_id = self.queue.submit(language, since, top, upload)
+        print(f"Queued job {job_id}: {since} {language_label(language)} video")
+        return job_id
+
+    def run_job(self, job):
+        """
+        Build (and upload) the video of one job.
+
+        Returns:
+            dict: ``video_id`` of the upload, or ``video`` path when the job does not upload
+        """
+        language, since, top = job["language"], job["since"], job["top"]
+        # Jobs for the same page with other settings get their own manifest, workspace and video
+        variant = job_variant(top, job["upload"])
+        manifest = RunManifest.for_run(run_id(language, since, variant=variant))
+        upload = job["upload"] != UPLOAD_NONE
+        if upload and manifest.completed("upload"):
+            print(f"{since} video for {language_label(language)} already uploaded today, skipping.")
+            return {"video_id": manifest.result("upload"), "skipped": True}
+
+        repos = resume_or_fetch_trending({(language, since): manifest}, top)[(language, since)]
+        if not repos:
+            raise Exception(f"Failed to fetch trending repositories for {language or 'all languages'} ({since})")
+
+        uploader = get_uploader(job["upload"]) if job["upload"] not in (UPLOAD_YOUTUBE, UPLOAD_NONE) else None
+        publish_at = (datetime.fromisoformat(job["publish_at"]) if job["publish_at"]
+                      else self.publish_schedule.next_after())
+        with tags(language=language, since=since, job=job["id"]), span("video"):
+            result = create_trending_video(repos, language, since, manifest=manifest, tmpfs=self.tmpfs,
+                                           fetcher=self.fetcher, uploader=uploader,
+                                           browser_pool=self.browser_pool, limits=self.limits,
+                                           publish_at=publish_at, upload=upload, variant=variant)
+        if result is None:
+            raise Exception(f"Building the {since} {language_label(language)} video failed; see {manifest.path}")
+        return {"video_id": result} if upload else {"video": result}
+
+    def _job_finished(self):
+        with self._active_lock:
+            self._active -= 1
+            if self._active == 0:
+                # Only between jobs, so a report never cuts a job's spans in half
+                tracer = get_tracer()
+                path = os.path.join(RUNS_DIR, f"report_{datetime.now().strftime('%Y-%m-%d_%H%M%S')}.json")
+                tracer.write_report(path)
+                tracer.drain()
+                print(f"Run report written to {path}")
+
+    def _work(self):
+        while not self._stop.is_set():
+            job = self.queue.claim()
+            if job is None:
+                self._stop.wait(POLL_INTERVAL)
+                continue
+            with self._active_lock:
+                self._active += 1
+            print(f"Starting job {job['id']}: {job['since']} {language_label(job['language'])} video")
+            try:
+                result = self.run_job(job)
+                self.queue.finish(job["id"], result)
+                print(f"Job {job['id']} done: {result}")
+            except Exception as e:
+                print(f"Job {job['id']} failed: {e}")
+                self.queue.fail(job["id"], e)
+            finally:
+                self._job_finished()
+
+    def _schedule(self):
+        upcoming = [[schedule.next_after(), schedule, entry] for schedule, entry in self.schedules]
+        for due, schedule, entry in upcoming:
+            print(f"Next {entry.get('since', 'daily')} {language_label(entry.get('language', 'python'))} "
+                  f"video at {due.strftime('%Y-%m-%d %H:%M %Z')}")
+        while upcoming and not self._stop.is_set():
+            slot = min(upcoming, key=lambda item: item[0])
+            due, schedule, entry = slot
+            delay = (due - datetime.now(due.tzinfo)).total_seconds()
+            if delay > 0:
+                # Wake up at least once a minute so clock changes are noticed
+                self._stop.wait(min(delay, 60))
+                continue
+            self.enqueue(entry)
+            slot[0] = schedule.next_after(due)
+
+    def _start_thread(self, target, name):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def start(self):
+        """Warm up, then run the scheduler, the job workers and the HTTP API in background threads."""
+        requeued = self.queue.requeue_running()
+        if requeued:
+            print(f"Requeued {requeued} job(s) interrupted by the last shutdown")
+        self.warm_up()
+        self._start_thread(self._schedule, "scheduler")
+        for n in range(max(1, self.config["workers"])):
+            self._start_thread(self._work, f"job-worker-{n}")
+        if self.port is not None:
+            self._server = ThreadingHTTPServer((self.host, self.port), DaemonRequestHandler)
+            self._server.owner = self
+            self._start_thread(self._server.serve_forever, "daemon-api")
+            print(f"Accepting jobs at http://{self.host}:{self._server.server_address[1]}/jobs")
+        return self
+
+    def status(self):
+        return {"active": self._active, "workers": self.config["workers"], "limits": self.limits.limits}
+
+    def stop(self):
+        """Stop taking jobs, wait for the running ones to finish and release the warm resources."""
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+        if self._active:
+            print(f"Waiting for {self._active} running job(s) to finish...")
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self.browser_pool is not None:
+            self.browser_pool.close()
+            self.browser_pool = None
+
+    def serve_forever(self):
+        """Run until SIGINT or SIGTERM."""
+        signal.signal(signal.SIGTERM, lambda *_: self._stop.set())
+        self.start()
+        try:
+            while not self._stop.wait(1):
+                pass
+        except KeyboardInterrupt:
+            pass
+        self.stop()
+
+class DaemonRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON API of a running Daemon.
+
+    GET /health, GET /jobs[?status=queued], GET /jobs/<id>, and POST /jobs with
+    {"language", "since", "top", "upload", "publish_at", "run_at"} to queue a job.
+    ``publish_at`` is an ISO-8601 time with a UTC offset; ``run_at`` is one too,
+    or epoch seconds. Anything else is answered with 400.
+    """
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, data):
+        body = json.dumps(data, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        daemon = self.server.owner
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        if parts == ["health"]:
+            return self._send(200, {"status": "ok", **daemon.status()})
+        if parts == ["jobs"]:
+            status = parse_qs(url.query).get("status", [None])[0]
+            return self._send(200, daemon.queue.jobs(status))
+        if len(parts) == 2 and parts[0] == "jobs" and parts[1].isdigit():
+            job = daemon.queue.get(int(parts[1]))
+            return self._send(200, job) if job else self._send(404, {"error": "no such job"})
+        self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        if urlparse(self.path).path.rstrip("/") != "/jobs":
+            return self._send(404, {"error": "not found"})
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            since = request.get("since", "daily")
+            if since not in TIME_RANGES:
+                raise ValueError(f"since must be one of {', '.join(TIME_RANGES)}")
+            top = int(request.get("top", DEFAULT_TOP_N))
+            if top < 1:
+                raise ValueError("top must be at least 1")
+            job_id = self.server.owner.queue.submit(
+                request.get("language", "python"), since, top, request.get("upload", UPLOAD_YOUTUBE),
+                parse_publish_at(request.get("publish_at")), parse_run_at(request.get("run_at")))
+        except (ValueError, TypeError) as e:
+            return self._send(400, {"error": str(e)})
+        self._send(201, {"id": job_id})
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build trending videos from a long-running daemon")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="Run the daemon")
+    serve.add_argument("--config", default=DAEMON_CONFIG_FILE, help="JSON file with schedules, limits and workers")
+    serve.add_argument("--port", type=int, default=DAEMON_PORT, help="Port of the local job API")
+    serve.add_argument("--tmpfs", action="store_true", help="Keep intermediate files in shared memory (/dev/shm)")
+
+    submit = commands.add_parser("submit", help="Queue a video job")
+    submit.add_argument("--language", default="python", help='Trending language slug; use "" for all languages')
+    submit.add_argument("--since", default="daily", choices=TIME_RANGES)
+    submit.add_argument("--top", type=int, default=DEFAULT_TOP_N, help="Repositories in the video")
+    submit.add_argument("--upload", default=UPLOAD_YOUTUBE,
+                        help=f'"{UPLOAD_YOUTUBE}", "{UPLOAD_NONE}" to keep the file, or the URL of another API')
+    submit.add_argument("--publish-at", type=parse_publish_at,
+                        help="ISO time with UTC offset the video goes public (default: next publish slot)")
+
+    jobs = commands.add_parser("jobs", help="List recent jobs")
+    jobs.add_argument("--status", choices=("queued", "running", "done", "failed"))
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "serve":
+        Daemon(load_config(args.config), port=args.port, tmpfs=args.tmpfs).serve_forever()
+    elif args.command == "submit":
+        # Straight into the queue file, so this works whether or not the daemon is up
+        job_id = JobQueue().submit(args.language, args.since, args.top, args.upload, args.publish_at)
+        print(f"Queued job {job_id}")
+    else:
+        for job in JobQueue().jobs(args.status):
+            print(f"{job['id']:>5}  {job['status']:<8}  {job['since']:<8}  {language_label(job['language']):<16}  "
+                  f"{job['error'] or job['result'] or ''}")
@@ -0,0 +1,80 @@
+import os
+
+class EncoderProfile:
+    """
+    libx264 settings for rendering repository parts.
+
+    ``threads`` is the encoder thread count of one ffmpeg process and
+    ``segments`` the number of processes a single part is split across
+    (see scroll_renderer.render_scroll); their product is the cores one
+    part may use.
+    """
+
+    def __init__(self, name, preset, crf, tune="stillimage", keyint=60, threads=0, segments=1):
+        self.name = name
+        self.preset = preset
+        self.crf = crf
+        self.tune = tune
+        self.keyint = keyint
+        self.threads = threads
+        self.segments = segments
+
+    def with_resources(self, threads, segments=1):
+        """Copy of this profile sized for the given threads and segment processes."""
+        return EncoderProfile(self.name, self.preset, self.crf, self.tune, self.keyint, threads, segments)
+
+    def ffmpeg_args(self):
+        """Video encoder options for an ffmpeg command line."""
+        args = ["-c:v", "libx264", "-preset", self.preset, "-crf", str(self.crf),
+                "-g", str(self.keyint), "-pix_fmt", "yuv420p"]
+        if self.tune:
+            args += ["-tune", self.tune]
+        if self.threads:
+            args += ["-threads", str(self.threads)]
+        return args
+
+    def moviepy_kwargs(self, extra_params=()):
+        """Keyword arguments for moviepy's write_videofile."""
+        params = ["-crf", str(self.crf), "-g", str(self.keyint)]
+        if self.tune:
+            params += ["-tune", self.tune]
+        return {"codec": "libx264", "preset": self.preset, "threads": self.threads or None,
+                "ffmpeg_params": params + list(extra_params)}
+
+    def __repr__(self):
+        return (f"EncoderProfile({self.name!r}, preset={self.preset!r}, crf={self.crf}, "
+                f"threads={self.threads}, segments={self.segments})")
+
+# Named profiles; scrolling screenshots compress well, so even "fast" keeps text sharp
+PROFILES = {
+    "fast": EncoderProfile("fast", preset="veryfast", crf=23),
+    "balanced": EncoderProfile("balanced", preset="medium", crf=21),
+    "quality": EncoderProfile("quality", preset="slow", crf=18),
+}
+
+# A part is only split into segments when each segment still gets this many cores
+MIN_CORES_PER_SEGMENT = 2
+
+def select_profile(workers=1, cores=None, name=None, allow_segments=True):
+    """
+    Choose an encoder profile for ``workers`` parts rendered at the same time.
+
+    The ENCODER_PROFILE environment variable or ``name`` picks the profile
+    explicitly; otherwise slower presets are used the more cores there are
+    per part. Spare cores per part are spent on parallel segments first and
+    encoder threads second.
+
+    Returns:
+        EncoderProfile: Profile sized to the host
+    """
+    cores = cores or os.cpu_count() or 1
+    per_part = max(1, cores // max(1, workers))
+    name = name or os.environ.get("ENCODER_PROFILE")
+    if not name:
+        name = "fast" if per_part <= 2 else "balanced" if per_part <= 8 else "quality"
+    if name not in PROFILES:
+        raise ValueError(f"Unknown encoder profile {name!r}; choose from {', '.join(PROFILES)}")
+
+    segments = per_part // MIN_CORES_PER_SEGMENT if allow_segments else 1
+    segments = max(1, segments)
+    return PROFILES[name].with_resources(threads=max(1, per_part // segments), segments=segments)
@@ -0,0 +1,376 @@
+import argparse
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from artifact_store import ArtifactStore, ARTIFACT_DIR
+from browser_pool import BrowserPool
+from cache import hash_key
+from captions import load_word_timings, save_word_timings
+from encoder_profiles import select_profile
+from main import (
+    intro_script, body_script, read_readme, output_video_name, rendered_duration, upload_video, SEGMENTS,
+    SEGMENT_SCROLL
+)
+from screenshot_prep import preprocess_screenshot
+from summarizer import get_summarizer
+from task_queue import open_task_queue, TASK_QUEUE_FILE, LEASE_SECONDS
+from run_state import RUNS_DIR
+from tracing import get_tracer, span, tags
+from utils import fetch_repo_content, get_trending, language_label, DEFAULT_TOP_N, TIME_RANGES
+from video_generator import create_video, combine_videos
+from voice_generator import submit_voice
+from workspace import Workspace
+
+# Farm stages in pipeline order
+STAGES = ("capture", "voice", "render", "assemble")
+
+# Tasks of each stage one worker runs at the same time unless told otherwise
+DEFAULT_SLOTS = {"capture": 1, "voice": 4, "render": 1, "assemble": 1}
+
+# Seconds between lease renewals; well inside LEASE_SECONDS so one missed beat is harmless
+HEARTBEAT_INTERVAL = 30
+
+# Seconds between looks at the queue when there is nothing to do
+POLL_INTERVAL = 2
+
+def capture_task(payload, store, workdir, worker):
+    """Screenshot and README of one repository, with the screenshot already cropped for rendering."""
+    index = payload["index"]
+    fetch_repo_content([payload["repo"]], pool=worker.browser_pool(), indices=[index], workdir=workdir,
+                       base_url=payload.get("base_url", "https://github.com"))
+    prepared = preprocess_screenshot(os.path.join(workdir, f"screenshot_{index}.png"),
+                                     os.path.join(workdir, f"screenshot_{index}.npy"))
+    readme = os.path.join(workdir, f"readme_{index}.txt")
+    return {"screenshot": store.put(prepared), "readme": store.put(readme) if os.path.exists(readme) else None}
+
+def voice_task(payload, store, workdir, worker):
+    """Narration of one script segment, with its word timings for captions."""
+    audio_file = os.path.join(workdir, "voice.mp3")
+    _, duration = submit_voice(payload["text"], audio_file).result()
+    return {"audio": store.put(audio_file), "duration": duration, "words": load_word_timings(audio_file)}
+
+def render_task(payload, store, workdir, worker):
+    """Video of one segment, rendered with the encoder profile the coordinator picked for the whole video."""
+    index = payload["index"]
+    store.get(payload["screenshot"], os.path.join(workdir, f"screenshot_{index}.npy"))
+    audio_file = store.get(payload["audio"], os.path.join(workdir, "voice.mp3"))
+    save_word_timings(payload.get("words"), audio_file)
+    video_file = os.path.join(workdir, "segment.mp4")
+    profile = select_profile(workers=worker.slots.get("render", 1), name=payload["profile"])
+    create_video(payload["text"], audio_file, video_file, index, duration=payload["duration"], workdir=workdir,
+                 profile=profile, scroll_fraction=SEGMENT_SCROLL[payload["segment"]])
+    return {"video": store.put(video_file), "duration": rendered_duration(video_file, payload["duration"])}
+
+def assemble_task(payload, store, workdir, worker):
+    """
+    Join the segments with music into the final video and upload it if asked to.
+
+    For an upload, the joined video is stored and noted in a record keyed on
+    the segments and the trending page before the upload starts, and the
+    resumable session is kept in the store next to it. A redelivered task
+    (its worker died or lost its lease) uploads that same file through that
+    same session, so an upload that was cut off resumes and one that had
+    finished returns its video id instead of being sent again.
+    """
+    upload_key = hash_key("upload", payload["parts"], payload["language"], payload["since"])
+    final_video = os.path.join(workdir, output_video_name(payload["language"], payload["since"]))
+    record = store.get_record(upload_key) if payload.get("upload") else None
+    if record and record.get("video_id"):
+        print(f"Video already uploaded as {record['video_id']}, not uploading again")
+        return record
+    if record:
+        # Combining again could pick other music, and a resumed session must get the same bytes
+        store.get(record["video"], final_video)
+        result = record
+    else:
+        parts = [store.get(digest, os.path.join(workdir, f"part_{n}.mp4"))
+                 for n, digest in enumerate(payload["parts"])]
+        combine_videos(parts, final_video, payload["duration"], workdir=workdir)
+        result = {"video": store.put(final_video), "video_id": None}
+    if payload.get("upload"):
+        store.put_record(upload_key, result)
+        publish_at = datetime.fromisoformat(payload["publish_at"]) if payload.get("publish_at") else None
+        result["video_id"] = upload_video(final_video, payload["language"], payload["since"], publish_at=publish_at,
+                                          session_path=store.record_path(f"{upload_key}-session"))
+        store.put_record(upload_key, result)
+        store.drop_record(f"{upload_key}-session")
+    return result
+
+TASK_HANDLERS = {"capture": capture_task, "voice": voice_task, "render": render_task, "assemble": assemble_task}
+
+class FarmWorker:
+    """
+    Worker process of the render farm.
+
+    Runs ``slots[stage]`` tasks of each stage at once, each in its own
+    workspace, fetching inputs from and storing outputs in the shared
+    ArtifactStore. A heartbeat thread renews the leases of running tasks, so
+    tasks of a worker that dies are delivered to another one.
+    """
+
+    def __init__(self, queue, store, slots=None, worker_id=None, lease_seconds=LEASE_SECONDS,
+                 heartbeat_interval=HEARTBEAT_INTERVAL, tmpfs=False):
+        self.queue = queue
+        self.store = store
+        self.slots = {stage: count for stage, count in (slots or DEFAULT_SLOTS).items() if count > 0}
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.lease_seconds = lease_seconds
+        self.heartbeat_interval = heartbeat_interval
+        self.tmpfs = tmpfs
+        self._held = set()
+        self._held_lock = threading.Lock()
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def browser_pool(self):
+        """Browsers for capture tasks, started with the first one and kept warm."""
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = BrowserPool(size=self.slots.get("capture", 1)).start()
+            return self._pool
+
+    def run_task(self, task):
+        workspace = Workspace(f"task-{task['id']}-{task['attempts']}", tmpfs=self.tmpfs)
+        try:
+            return TASK_HANDLERS[task["stage"]](task["payload"], self.store, workspace.dir, self)
+        finally:
+            workspace.cleanup()
+
+    def _slot(self, stage):
+        while not self._stop.is_set():
+            task = self.queue.lease(self.worker_id, [stage], self.lease_seconds)
+            if task is None:
+                self._stop.wait(POLL_INTERVAL)
+                continue
+            with self._held_lock:
+                self._held.add(task["id"])
+            print(f"Task {task['id']} ({stage}, attempt {task['attempts']}) started")
+            try:
+                result = self.run_task(task)
+            except Exception as e:
+                print(f"Task {task['id']} ({stage}) failed: {e}")
+                self.queue.fail(task["id"], self.worker_id, e)
+            else:
+                if self.queue.complete(task["id"], self.worker_id, result):
+                    print(f"Task {task['id']} ({stage}) done")
+                else:
+                    print(f"Task {task['id']} ({stage}) finished after its lease was lost; result dropped")
+            finally:
+                with self._held_lock:
+                    self._held.discard(task["id"])
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.heartbeat_interval):
+            with self._held_lock:
+                held = set(self._held)
+            try:
+                kept = set(self.queue.heartbeat(self.worker_id, held, self.lease_seconds))
+            except Exception as e:
+                print(f"Heartbeat failed: {e}")
+                continue
+            for task_id in held - kept:
+                print(f"Lost the lease on task {task_id}; it will be delivered to another worker")
+
+    def _start_thread(self, target, name, *args):
+        thread = threading.Thread(target=target, args=args, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def start(self):
+        self.queue.register_worker(self.worker_id, list(self.slots))
+        self._start_thread(self._heartbeat, "farm-heartbeat")
+        for stage, count in self.slots.items():
+            for n in range(count):
+                self._start_thread(self._slot, f"farm-{stage}-{n}", stage)
+        print(f"Worker {self.worker_id} running {', '.join(f'{n} {stage}' for stage, n in self.slots.items())}")
+        return self
+
+    def stop(self):
+        """Stop leasing and wait for the tasks in progress."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    def serve_forever(self):
+        self.start()
+        try:
+            while not self._stop.wait(1):
+                pass
+        except KeyboardInterrupt:
+            pass
+        self.stop()
+
+def cancel_tasks(queue, task_ids):
+    """Withdraw tasks whose video can no longer be built; a failure here only gets logged."""
+    try:
+        cancelled = queue.cancel(task_ids)
+    except Exception as e:
+        print(f"Could not cancel tasks {sorted(task_ids)}: {e}")
+        return
+    if cancelled:
+        print(f"Cancelled {cancelled} task(s) of the failed video")
+
+def wait_for(queue, task_ids, poll=POLL_INTERVAL):
+    """
+    Block until every task is done; if one fails, the others are cancelled.
+
+    Returns:
+        dict: Task id -> result
+    """
+    task_ids = list(task_ids)
+    while True:
+        tasks = queue.statuses(task_ids)
+        failed = [task for task in tasks.values() if task["status"] in ("failed", "cancelled")]
+        if failed:
+            cancel_tasks(queue, task_ids)
+            raise Exception(f"{failed[0]['stage']} task {failed[0]['id']} {failed[0]['status']}: "
+                            f"{failed[0]['error']}")
+        if all(task["status"] == "done" for task in tasks.values()):
+            return {task_id: task["result"] for task_id, task in tasks.items()}
+        time.sleep(poll)
+
+def build_on_farm(queue, store, repos, language="python", since="daily", base_url="https://github.com",
+                  profile=None, upload=True, publish_at=None, poll=POLL_INTERVAL):
+    """
+    Coordinate one trending video as farm tasks and copy the result to the current directory.
+
+    Captures run first, one task per repository. Scripts are written here from
+    the captured READMEs, then every segment is voiced, and each segment's
+    render is queued as soon as its narration is ready. The assemble task
+    joins the segments, adds music and uploads.
+
+    Returns:
+        dict: ``video`` path of the final video and ``video_id`` of the upload (None without upload)
+    """
+    profile = profile or select_profile().name
+    with span("farm.capture", repos=len(repos)):
+        capture_ids = [queue.submit("capture", {"repo": repo, "index": i, "base_url": base_url})
+                       for i, repo in enumerate(repos)]
+        captures = wait_for(queue, capture_ids, poll)
+    captures = [captures[task_id] for task_id in capture_ids]
+
+    workspace = Workspace(f"farm-{language or 'all'}-{since}-{os.getpid()}")
+    try:
+        for i, capture in enumerate(captures):
+            if capture["readme"]:
+                store.get(capture["readme"], os.path.join(workspace.dir, f"readme_{i}.txt"))
+        with span("summarize"):
+            # One batch for every README; body_script then hits the memo
+            readmes = [text for text in (read_readme(i, workspace.dir) for i in range(len(repos))) if text]
+            get_summarizer().summarize_many(readmes, 2)
+            scripts = {(i, "intro"): intro_script(repo, i) for i, repo in enumerate(repos)}
+            scripts.update({(i, "body"): body_script(repo, i, workspace.dir) for i, repo in enumerate(repos)})
+    finally:
+        workspace.cleanup()
+
+    with span("farm.render", segments=len(scripts)):
+        voices = {queue.submit("voice", {"text": text}): key for key, text in scripts.items()}
+        renders = {}
+        while voices:
+            for task_id, task in queue.statuses(voices).items():
+                if task["status"] in ("failed", "cancelled"):
+                    cancel_tasks(queue, [*voices, *renders])
+                    raise Exception(f"voice task {task_id} {task['status']}: {task['error']}")
+                if task["status"] == "done":
+                    i, segment = voices.pop(task_id)
+                    renders[queue.submit("render", {
+                        "index": i, "segment": segment, "text": scripts[(i, segment)],
+                        "screenshot": captures[i]["screenshot"], "audio": task["result"]["audio"],
+                        "duration": task["result"]["duration"], "words": task["result"].get("words"),
+                        "profile": profile,
+                    })] = (i, segment)
+            if voices:
+                time.sleep(poll)
+        rendered = wait_for(queue, renders, poll)
+
+    order = sorted(renders, key=lambda task_id: (renders[task_id][0], SEGMENTS.index(renders[task_id][1])))
+    with span("farm.assemble"):
+        (assembled,) = wait_for(queue, [queue.submit("assemble", {
+            "parts": [rendered[task_id]["video"] for task_id in order],
+            "duration": sum(rendered[task_id]["duration"] for task_id in order),
+            "language": language, "since": since, "upload": upload,
+            "publish_at": publish_at.isoformat() if publish_at else None,
+        })], poll).values()
+
+    final_video = store.get(assembled["video"], output_video_name(language, since))
+    return {"video": final_video, "video_id": assembled["video_id"]}
+
+def parse_slots(specs):
+    """``["render=2", "voice=4"]`` -> {"render": 2, "voice": 4}, starting from DEFAULT_SLOTS."""
+    slots = dict(DEFAULT_SLOTS)
+    for spec in specs or ():
+        stage, _, count = spec.partition("=")
+        if stage not in STAGES or not count.isdigit():
+            raise ValueError(f"Slots are given as stage=count with a stage from {', '.join(STAGES)}: {spec!r}")
+        slots[stage] = int(count)
+    return slots
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Spread trending video builds over several machines")
+    parser.add_argument("--queue", default=TASK_QUEUE_FILE, help="Task queue location (path or sqlite:///path)")
+    parser.add_argument("--store", default=ARTIFACT_DIR, help="Artifact directory shared by all nodes")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    worker = commands.add_parser("worker", help="Run tasks from the queue")
+    worker.add_argument("--slots", nargs="*", metavar="STAGE=N",
+                        help="Tasks per stage run at once (default: " +
+                             " ".join(f"{stage}={n}" for stage, n in DEFAULT_SLOTS.items()) + ")")
+    worker.add_argument("--tmpfs", action="store_true", help="Keep task files in shared memory (/dev/shm)")
+
+    run = commands.add_parser("run", help="Build videos on the farm")
+    run.add_argument("--languages", nargs="+", default=["python"], help='Trending language slugs; "" for all')
+    run.add_argument("--since", nargs="+", default=["daily"], choices=TIME_RANGES)
+    run.add_argument("--top", type=int, default=DEFAULT_TOP_N, help="Repositories per video")
+    run.add_argument("--no-upload", action="store_true", help="Keep the videos instead of uploading them")
+
+    limit = commands.add_parser("limit", help="Cap the tasks of a stage running at once across the farm")
+    limit.add_argument("stage", choices=STAGES)
+    limit.add_argument("max_leased", type=int, nargs="?", help="Omit to remove the cap")
+
+    commands.add_parser("status", help="Show live workers and task counts")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    queue = open_task_queue(args.queue)
+    if args.command == "worker":
+        FarmWorker(queue, ArtifactStore(args.store), parse_slots(args.slots), tmpfs=args.tmpfs).serve_forever()
+    elif args.command == "run":
+        store = ArtifactStore(args.store)
+        trending = get_trending(args.languages, args.since, args.top)
+
+        def build(job):
+            language, since = job
+            if not trending.get(job):
+                print(f"Failed to fetch trending repositories for {language or 'all languages'} ({since}).")
+                return
+            try:
+                with tags(language=language, since=since):
+                    result = build_on_farm(queue, store, trending[job], language, since, upload=not args.no_upload)
+            except Exception as e:
+                print(f"Error building the {since} {language_label(language)} video: {e}")
+                return
+            print(f"{since} {language_label(language)} video: {result['video']} {result['video_id'] or ''}")
+
+        # Coordinators only wait on the queue, so every video is in flight at once
+        with ThreadPoolExecutor(max_workers=max(1, len(trending))) as executor:
+            list(executor.map(build, trending))
+        report = os.path.join(RUNS_DIR, f"report_{datetime.now().strftime('%Y-%m-%d_%H%M%S')}.json")
+        print(f"Run report written to {get_tracer().write_report(report)}")
+    elif args.command == "limit":
+        queue.set_limit(args.stage, args.max_leased)
+    else:
+        for worker in queue.workers():
+            print(f"{worker['id']:<32} {worker['host']:<20} {', '.join(worker['stages'])}")
+        for (stage, status), count in sorted(queue.counts().items()):
+            print(f"{stage:<10} {status:<8} {count:>6}")
@@ -0,0 +1,99 @@
+import os
+import re
+import shutil
+import subprocess
+
+_ffmpeg_binary = None
+
+def ffmpeg_binary():
+    """
+    Locate the ffmpeg executable once per process.
+
+    Prefers the FFMPEG_BINARY environment variable, then the imageio-ffmpeg
+    build that moviepy installs, then whatever ffmpeg is on PATH.
+    """
+    global _ffmpeg_binary
+    if _ffmpeg_binary is None:
+        binary = os.environ.get("FFMPEG_BINARY")
+        if not binary or binary == "ffmpeg-imageio":
+            try:
+                import imageio_ffmpeg
+                binary = imageio_ffmpeg.get_ffmpeg_exe()
+            except Exception:
+                binary = shutil.which("ffmpeg")
+        if not binary:
+            raise FileNotFoundError("ffmpeg executable not found")
+        _ffmpeg_binary = binary
+    return _ffmpeg_binary
+
+def run_ffmpeg(args):
+    """Run ffmpeg with the given arguments and raise with its stderr on failure."""
+    cmd = [ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-y"] + list(args)
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise Exception(f"ffmpeg failed ({result.returncode}): {result.stderr.decode(errors='replace').strip()}")
+
+def open_ffmpeg_reader(args):
+    """Start ffmpeg writing raw output to stdout (``pipe:1``); the caller reads it until EOF."""
+    cmd = [ffmpeg_binary(), "-hide_banner", "-loglevel", "error"] + list(args)
+    return subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+def close_ffmpeg_reader(process):
+    """Finish a reader started with open_ffmpeg_reader whose output was read to the end; raise if ffmpeg failed."""
+    process.stdout.close()
+    stderr = process.stderr.read()
+    process.stderr.close()
+    if process.wait() != 0:
+        raise Exception(f"ffmpeg failed ({process.returncode}): {stderr.decode(errors='replace').strip()}")
+
+def open_ffmpeg_writer(args):
+    """Start ffmpeg reading raw input from stdin; the caller writes and closes stdin."""
+    cmd = [ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-y"] + list(args)
+    return subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+def close_ffmpeg_writer(process):
+    """Finish a writer started with open_ffmpeg_writer and raise if ffmpeg failed."""
+    process.stdin.close()
+    stderr = process.stderr.read()
+    if process.wait() != 0:
+        raise Exception(f"ffmpeg failed ({process.returncode}): {stderr.decode(errors='replace').strip()}")
+
+def write_concat_list(paths, list_file):
+    """Write an ffmpeg concat demuxer list; use with ``-f concat -safe 0``."""
+    with open(list_file, "w", encoding="utf-8") as f:
+        for path in paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    return list_file
+
+def _stream_signature(spec):
+    """Normalise an ffmpeg stream description, dropping bitrates and disposition flags."""
+    spec = re.sub(r"\s*\((default|attached pic|forced)\)", "", spec)
+    parts = [part.strip() for part in re.split(r",\s*(?![^()]*\))", spec)]
+    return ", ".join(part for part in parts if part and "kb/s" not in part)
+
+def probe_media(path):
+    """
+    Read a media file's duration and stream parameters from ffmpeg's input banner.
+
+    Returns:
+        dict: ``duration`` in seconds and normalised ``video``/``audio`` stream
+        signatures (None when the stream is absent). Files whose signatures are
+        equal can be concatenated without re-encoding.
+    """
+    result = subprocess.run([ffmpeg_binary(), "-hide_banner", "-i", path],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    text = result.stderr.decode(errors="replace")
+    if "Stream #" not in text:
+        raise Exception(f"Could not probe {path}: {text.strip()}")
+
+    info = {"duration": None, "video": None, "audio": None}
+    duration = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", text)
+    if duration:
+        hours, minutes, seconds = duration.groups()
+        info["duration"] = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    for line in text.splitlines():
+        stream = re.search(r"Stream #\S+: (Video|Audio): (.*)", line)
+        if stream and info[stream.group(1).lower()] is None:
+            info[stream.group(1).lower()] = _stream_signature(stream.group(2))
+    return info
@@ -0,0 +1,39 @@
+import os
+import threading
+from lazy import lazy_import
+
+requests = lazy_import("requests")
+HTTPAdapter = lazy_import("requests.adapters", "HTTPAdapter")
+Retry = lazy_import("urllib3.util.retry", "Retry")
+
+USER_AGENT = "Mozilla/5.0"
+
+_session = None
+_session_lock = threading.Lock()
+
+def create_session(pool_size=10, retries=3):
+    """
+    Create a keep-alive requests.Session with a connection pool and retry policy.
+
+    A GITHUB_TOKEN environment variable is sent as a bearer token when set,
+    which lifts the API rate limit.
+    """
+    session = requests.Session()
+    retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504),
+                  allowed_methods=frozenset(["GET", "HEAD"]))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    token = os.environ.get("GITHUB_TOKEN")
+    if token:
+        session.headers["Authorization"] = f"Bearer {token}"
+    return session
+
+def get_session():
+    """Return the process-wide shared session, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+        return _session
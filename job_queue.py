@@ -0,0 +1,128 @@
+import json
+import os
+import time
+from run_state import RUNS_DIR
+from sqlite_util import connect
+
+# Jobs submitted to the daemon, shared by every process on this machine
+JOB_QUEUE_FILE = os.path.join(RUNS_DIR, "jobs.sqlite")
+
+# Where a finished video goes: the YouTube API, nowhere (the file is kept), or
+# any other value is taken as the root URL of a YouTube-compatible API
+UPLOAD_YOUTUBE = "youtube"
+UPLOAD_NONE = "none"
+
+JOB_COLUMNS = ("id", "language", "since", "top", "upload", "publish_at", "status", "created", "run_at",
+               "started", "finished", "attempts", "result", "error")
+
+class JobQueue:
+    """
+    SQLite-backed queue of video jobs (language, time range, top-N, upload target).
+
+    Jobs go from ``queued`` to ``running`` when a worker claims them and end
+    as ``done`` or ``failed``. Claiming is a single write transaction, so any
+    number of threads and processes can take jobs from the same file without
+    running one twice. ``run_at`` holds a job back until that time.
+    """
+
+    def __init__(self, path=JOB_QUEUE_FILE):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with connect(self.path, autocommit=True) as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, language TEXT, since TEXT, top INTEGER,
+                upload TEXT, publish_at TEXT, status TEXT, created REAL, run_at REAL, started REAL,
+                finished REAL, attempts INTEGER DEFAULT 0, result TEXT, error TEXT)""")
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, run_at)")
+
+    @staticmethod
+    def _row(row):
+        job = dict(zip(JOB_COLUMNS, row))
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def submit(self, language="python", since="daily", top=3, upload=UPLOAD_YOUTUBE, publish_at=None,
+               run_at=None):
+        """
+        Queue a job.
+
+        Args:
+            publish_at (str): ISO time the upload goes public (default: next publish slot)
+            run_at (float): Epoch seconds before which the job is not started
+
+        Returns:
+            int: The job id
+        """
+        now = time.time()
+        with connect(self.path, autocommit=True) as db:
+            cursor = db.execute(
+                """INSERT INTO jobs (language, since, top, upload, publish_at, status, created, run_at)
+                   VALUES (?, ?, ?, ?, ?, 'queued', ?, ?)""",
+                (language, since, int(top), upload, publish_at, now, run_at or now))
+            return cursor.lastrowid
+
+    def claim(self):
+        """
+        Take the oldest due job and mark it running.
+
+        Returns:
+            dict: The job, or None if nothing is due
+        """
+        with connect(self.path, autocommit=True) as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute(f"""SELECT {', '.join(JOB_COLUMNS)} FROM jobs
+                                     WHERE status = 'queued' AND run_at <= ? ORDER BY run_at, id LIMIT 1""",
+                                 (time.time(),)).fetchone()
+                if row is None:
+                    db.execute("COMMIT")
+                    return None
+                job = self._row(row)
+                job["status"], job["started"], job["attempts"] = "running", time.time(), job["attempts"] + 1
+                db.execute("UPDATE jobs SET status = ?, started = ?, attempts = ? WHERE id = ?",
+                           (job["status"], job["started"], job["attempts"], job["id"]))
+                db.execute("COMMIT")
+                return job
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+
+    def finish(self, job_id, result=None):
+        with connect(self.path, autocommit=True) as db:
+            db.execute("UPDATE jobs SET status = 'done', finished = ?, result = ?, error = NULL WHERE id = ?",
+                       (time.time(), json.dumps(result), job_id))
+
+    def fail(self, job_id, error):
+        with connect(self.path, autocommit=True) as db:
+            db.execute("UPDATE jobs SET status = 'failed', finished = ?, error = ? WHERE id = ?",
+                       (time.time(), f"{type(error).__name__}: {error}", job_id))
+
+    def requeue_running(self):
+        """Put jobs left running by a process that died back in the queue; returns how many."""
+        with connect(self.path, autocommit=True) as db:
+            return db.execute("UPDATE jobs SET status = 'queued', run_at = ? WHERE status = 'running'",
+                              (time.time(),)).rowcount
+
+    def get(self, job_id):
+        with connect(self.path, autocommit=True) as db:
+            row = db.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def jobs(self, status=None, limit=100):
+        """Most recent jobs first, optionally only those with a given status."""
+        query = f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs"
+        params = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        with connect(self.path, autocommit=True) as db:
+            rows = db.execute(query + " ORDER BY id DESC LIMIT ?", params + [limit]).fetchall()
+        return [self._row(row) for row in rows]
+
+    def pending(self, language, since, top, upload):
+        """Whether the same job (trending page, top-N and upload target) is already queued or running."""
+        with connect(self.path, autocommit=True) as db:
+            row = db.execute("""SELECT 1 FROM jobs WHERE language = ? AND since = ? AND top = ? AND upload = ?
+                                AND status IN ('queued', 'running') LIMIT 1""",
+                             (language, since, int(top), upload)).fetchone()
+        return row is not None
@@ -0,0 +1,51 @@
+import importlib
+import threading
+
+_resolve_lock = threading.RLock()
+
+class _LazyObject:
+    """
+    Stand-in for a module, or an attribute of one, that is imported on first use.
+
+    Attribute access and calls are forwarded to the real object, so call sites
+    read exactly as they would with a normal import.
+    """
+
+    __slots__ = ("_module_name", "_attr", "_target")
+
+    def __init__(self, module_name, attr=None):
+        object.__setattr__(self, "_module_name", module_name)
+        object.__setattr__(self, "_attr", attr)
+        object.__setattr__(self, "_target", None)
+
+    def _resolve(self):
+        target = object.__getattribute__(self, "_target")
+        if target is None:
+            with _resolve_lock:
+                target = object.__getattribute__(self, "_target")
+                if target is None:
+                    target = importlib.import_module(self._module_name)
+                    if self._attr is not None:
+                        target = getattr(target, self._attr)
+                    object.__setattr__(self, "_target", target)
+        return target
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+    def __repr__(self):
+        name = self._module_name + (f".{self._attr}" if self._attr else "")
+        return f"<lazy {name}>"
+
+def lazy_import(module_name, attr=None):
+    """
+    Defer importing ``module_name`` (and picking ``attr`` from it) until first use.
+
+    Examples:
+        np = lazy_import("numpy")
+        WebDriverWait = lazy_import("selenium.webdriver.support.ui", "WebDriverWait")
+    """
+    return _LazyObject(module_name, attr)
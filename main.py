@@ -1,85 +1,516 @@
-import requests
-import asyncio
+import argparse
+import contextvars
 import os
-from video_generator import create_video, combine_videos, get_video_duration
-from voice_generator import generate_voice
-from utils import get_trending_repos, fetch_screenshot, cleanup_files, upload_to_youtube
-import time
-from sumy.parsers.plaintext import PlaintextParser
-from sumy.nlp.tokenizers import Tokenizer
-from sumy.summarizers.lsa import LsaSummarizer
-from sumy.nlp.stemmers import Stemmer
-from sumy.utils import get_stop_words
-import cv2
-
-def generate_script_for_repo(repo, index):
-    """Generate script for a single repository."""
-    summarizer = LsaSummarizer(Stemmer("english"))
-    summarizer.stop_words = get_stop_words("english")
-    
-    script = f"Repository number {index + 1}: {repo['name']}.\n"
-    script += f"This repository {repo['description']}."
-    
-    # Read README content
-    readme_path = f"readme_{index}.txt"
+import queue
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from video_generator import create_video, combine_videos
+from ffmpeg_tools import probe_media
+from music_algo import MUSIC_DIR
+from voice_generator import submit_voice, EdgeTTSBackend
+from utils import (
+    get_trending, fetch_repo_content, upload_to_youtube,
+    language_label, DEFAULT_TOP_N, TIME_RANGES
+)
+from summarizer import get_summarizer
+from cache import file_digest
+from run_state import RunManifest, RUNS_DIR
+from workspace import Workspace
+from segment_store import get_segment_store
+from encoder_profiles import select_profile
+from screenshot_prep import preprocess_screenshot, load_readme_box
+from resource_limits import hold
+from tracing import get_tracer, span, tags, current_tags
+
+# Sentinel passed down the stage queues once a producer has no more work
+_DONE = object()
+
+def read_readme(index, workdir="."):
+    """Return the README highlights of a repository if there is enough text to summarize."""
+    readme_path = os.path.join(workdir, f"readme_{index}.txt")
     if os.path.exists(readme_path):
         with open(readme_path, 'r', encoding='utf-8') as f:
             readme_content = f.read()
             if len(readme_content.split()) > 30:
-                parser = PlaintextParser.from_string(readme_content, Tokenizer("english"))
-                summary = " ".join([str(sentence) for sentence in summarizer(parser.document, 2)])
-                script += f" Here's a brief overview: {summary}"
-    
+                return readme_content
+    return None
+
+def intro_script(repo, index):
+    """The rank announcement opening a repository's part; the only text that changes with its position."""
+    return f"Repository number {index + 1}: {repo['name']}."
+
+def body_script(repo, index, workdir="."):
+    """Description and README overview of a repository, independent of its rank."""
+    script = f"This repository {repo['description']}."
+
+    # Read README content
+    readme_content = read_readme(index, workdir)
+    if readme_content:
+        summary = get_summarizer().summarize(readme_content, 2)
+        script += f" Here's a brief overview: {summary}"
+
     return script
 
-if __name__ == "__main__":
-    print("Fetching trending repositories...")
-    trending_repos = get_trending_repos()
-    print(f"Trending repositories fetched successfully!")
-    if trending_repos:
-        for i, repo in enumerate(trending_repos):
-            print(f"{i+1}. {repo['name']} - {repo['description']}")
+def generate_script_for_repo(repo, index, workdir="."):
+    """Generate script for a single repository."""
+    return f"{intro_script(repo, index)}\n{body_script(repo, index, workdir)}"
+
+# Every repository part is rendered as these segments, in this order. The intro
+# holds the top of the screenshot while the rank is read out, so when a repository
+# only moves on the trending list the body segment is reused as is.
+SEGMENTS = ("intro", "body")
+
+# Share of the scrollable height each segment scrolls through
+SEGMENT_SCROLL = {"intro": 0.0, "body": 0.4}
+
+def rendered_duration(video_file, audio_duration=None):
+    """Duration of a rendered segment as ffmpeg reports it, else the narration length it was rendered to"""
+    try:
+        duration = probe_media(video_file)["duration"]
+    except Exception as e:
+        print(f"Could not probe {video_file}: {e}")
+        duration = None
+    duration = duration or audio_duration
+    if not duration:
+        raise Exception(f"Could not tell the duration of {video_file}")
+    return duration
+
+def render_repo_video(script_text, audio_file, video_file, index, audio_duration=None, workdir=".", profile=None,
+                      trace_tags=None, segment="body"):
+    """Render one segment of a repository's part and return its duration and trace spans.
+
+    Runs inside a render worker process, so it only takes picklable arguments.
+    """
+    tracer = get_tracer()
+    # Forked workers inherit the parent's finished spans; only ship back our own
+    tracer.drain()
+    with tags(**(trace_tags or {})), tracer.span("render", index=int(index), segment=segment):
+        create_video(script_text, audio_file, video_file, int(index), duration=audio_duration, workdir=workdir,
+                     profile=profile, scroll_fraction=SEGMENT_SCROLL[segment])
+    return rendered_duration(video_file, audio_duration), tracer.drain()
 
+def completed_future(result):
+    """A future that is already resolved, used for stages restored from the run manifest"""
+    future = Future()
+    future.set_result(result)
+    return future
+
+def run_pipeline(repos, render_workers=None, queue_size=2, manifest=None, workspace=None, voice_backend=None,
+                 store=None):
+    """
+    Run script -> voice -> render for every repository as a staged pipeline.
+
+    Each stage runs in its own thread and hands results to the next one through
+    a bounded queue, so TTS for repo N+1 overlaps with the render of repo N.
+    Voice jobs share one event loop in voice_generator.
+    Renders are dispatched to a process pool with one worker per repository
+    (up to the core count); cores left over are given to each render through
+    its encoder profile.
+    Every repository part is made of the segments in SEGMENTS, each voiced and
+    rendered on its own.
+    With a RunManifest, voice and render stages that are still fresh from an
+    earlier attempt are skipped. With a SegmentStore, segments rendered on an
+    earlier day from the same README, script, voice and encoder profile are
+    copied from the store without voicing or rendering them again.
+
+    Args:
+        repos (list): Repository dicts as returned by get_trending_repos
+        render_workers (int): Render process count (defaults to one per repository, up to os.cpu_count())
+        queue_size (int): Capacity of each inter-stage queue
+        manifest (RunManifest): Optional checkpoint of the current run
+        workspace (Workspace): Directory for the run's files (defaults to a fresh one)
+        voice_backend: Synthesizer backend (defaults to edge-tts, see voice_generator)
+        store (SegmentStore): Optional store of segments from earlier runs
+
+    Returns:
+        Tuple[List[str], float]: Video segment paths in playback order and their total duration
+    """
+    workspace = workspace or Workspace(f"pipeline-{os.getpid()}-{threading.get_ident()}")
+    render_workers = render_workers or max(1, min(os.cpu_count() or 1, len(repos)))
+    profile = select_profile(workers=render_workers)
+    voice_backend = voice_backend or EdgeTTSBackend()
+    script_queue = queue.Queue(maxsize=queue_size)
+    voice_queue = queue.Queue(maxsize=queue_size)
+    errors = []
+    abort = threading.Event()
+
+    def put(q, item):
+        # Don't block forever on a full queue once a downstream stage has died
+        while not abort.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(q):
+        while not abort.is_set():
+            try:
+                return q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def screenshot_digest(i):
+        # The prepared array is what gets rendered, and it leaves out the page header that changes daily
+        prepared = os.path.join(workspace.dir, f"screenshot_{i}.npy")
+        return file_digest(prepared if os.path.exists(prepared) else workspace.path(f"screenshot_{i}.png"))
+
+    def readme_digest(i):
+        # Unlike the screenshot, the README text stays put while relative times on the page ("2 days ago") roll over
+        readme = workspace.path(f"readme_{i}.txt")
+        return file_digest(readme) if os.path.exists(readme) else None
+
+    def script_stage():
         try:
-            print("Fetching Screenshots and README content...")
-            fetch_screenshot(trending_repos)
-            
-            # List to store individual video paths
-            video_parts = []
-            total_video_length = 0
-            # Generate individual videos for each repo
-            for i, repo in enumerate(trending_repos):
+            # Summarize every README in one batch; body_script then hits the memo
+            readmes = [text for text in (read_readme(i, workspace.dir) for i in range(len(repos))) if text]
+            with span("summarize", texts=len(readmes)):
+                get_summarizer().summarize_many(readmes, 2)
+            for i, repo in enumerate(repos):
                 print(f"Processing repository {i+1}...")
-                
-                # Generate script for single repo
-                script_text = generate_script_for_repo(repo, i)
-                
-                # Generate voice for single repo
-                audio_file = f"output_{i}.mp3"
-                asyncio.run(generate_voice(script_text, audio_file))
-                
-                time.sleep(2)
-                
-                # Create video for single repo
-                video_file = f"repo_video_{i}.mp4"
-                create_video(script_text, audio_file, video_file, int(i))
-                video_length = get_video_duration(video_file)
-                total_video_length += video_length
-                video_parts.append(video_file)
+                with span("script", index=i):
+                    scripts = {"intro": intro_script(repo, i), "body": body_script(repo, i, workspace.dir)}
+                for segment in SEGMENTS:
+                    if not put(script_queue, (i, segment, scripts[segment])):
+                        return
+        except Exception as e:
+            errors.append(e)
+            abort.set()
+        finally:
+            put(script_queue, _DONE)
+
+    def voice_stage():
+        try:
+            digests = {}
+            readmes = {}
+            while True:
+                item = get(script_queue)
+                if item is _DONE:
+                    break
+                i, segment, script_text = item
+                name = f"{i}_{segment}"
+                audio_file = workspace.path(f"output_{name}.mp3")
+                video_file = workspace.path(f"repo_video_{name}.mp4")
+                if i not in digests:
+                    digests[i] = screenshot_digest(i)
+                    readmes[i] = readme_digest(i)
+
+                key = reused = None
+                if store is not None:
+                    voice = voice_backend.cache_key(script_text) if hasattr(voice_backend, "cache_key") else None
+                    key = store.segment_key(repos[i]["name"], readmes[i], script_text, profile.name, voice)
+                    if manifest is not None and manifest.is_fresh(f"render:{name}", {"segment": key}):
+                        reused = manifest.result(f"render:{name}")
+                    else:
+                        reused = store.restore(key, video_file)
+                if reused is not None:
+                    voice_future = None
+                elif manifest is not None and manifest.is_fresh(f"voice:{name}", {"script": script_text}):
+                    voice_future = completed_future((audio_file, manifest.result(f"voice:{name}")))
+                else:
+                    # Synthesis runs on the shared voice loop; the render stage waits on the future
+                    voice_future = submit_voice(script_text, audio_file, backend=voice_backend)
+                if not put(voice_queue, (i, segment, script_text, audio_file, video_file, voice_future, key,
+                                         digests[i], reused)):
+                    return
+        except Exception as e:
+            errors.append(e)
+            abort.set()
+        finally:
+            put(voice_queue, _DONE)
+
+    # Stage threads run in a copy of this context so their spans keep the run's trace tags
+    stages = [
+        threading.Thread(target=contextvars.copy_context().run, args=(script_stage,), name="script-stage",
+                         daemon=True),
+        threading.Thread(target=contextvars.copy_context().run, args=(voice_stage,), name="voice-stage",
+                         daemon=True),
+    ]
+    for stage in stages:
+        stage.start()
+
+    # (repo index, segment position) -> (video file, manifest inputs, store key to save under, future)
+    futures = {}
+    print(f"Rendering with {render_workers} workers, {profile}")
+    with ProcessPoolExecutor(max_workers=render_workers) as pool:
+        while True:
+            item = get(voice_queue)
+            if item is _DONE:
+                break
+            i, segment, script_text, audio_file, video_file, voice_future, key, screenshot, reused = item
+            name = f"{i}_{segment}"
+            position = (i, SEGMENTS.index(segment))
+            if reused is not None:
+                print(f"Reusing the {segment} of repository {i+1} from an earlier run")
+                futures[position] = (video_file, {"segment": key}, None, completed_future((reused, [])))
+                continue
+            try:
+                # Time spent here is the render stage starving on TTS
+                with span("voice.wait", index=i, segment=segment):
+                    _, audio_duration = voice_future.result()
+            except Exception as e:
+                if manifest is not None:
+                    manifest.fail(f"voice:{name}", e)
+                errors.append(e)
+                abort.set()
+                break
+            render_inputs = None
+            if manifest is not None:
+                manifest.record(f"voice:{name}", {"script": script_text}, [audio_file], audio_duration)
+                render_inputs = {
+                    "script": script_text,
+                    "audio": file_digest(audio_file),
+                    "screenshot": screenshot,
+                    "profile": profile.name,
+                }
+                if manifest.is_fresh(f"render:{name}", render_inputs):
+                    print(f"Skipping render of the {segment} of repository {i+1}: up to date")
+                    futures[position] = (video_file, render_inputs, None,
+                                         completed_future((manifest.result(f"render:{name}"), [])))
+                    continue
+            futures[position] = (video_file, render_inputs, key,
+                                 pool.submit(render_repo_video, script_text, audio_file, video_file, i,
+                                             audio_duration, workspace.dir, profile, current_tags(), segment))
+
+        video_parts = []
+        total_video_length = 0
+        for i, order in sorted(futures):
+            video_file, render_inputs, key, future = futures[(i, order)]
+            stage = f"render:{i}_{SEGMENTS[order]}"
+            try:
+                video_length, worker_spans = future.result()
+                get_tracer().merge(worker_spans)
+            except Exception as e:
+                if manifest is not None:
+                    manifest.fail(stage, e)
+                errors.append(e)
+                continue
+            if manifest is not None:
+                manifest.record(stage, render_inputs, [video_file], video_length)
+            if store is not None and key is not None:
+                try:
+                    store.save(key, video_file, video_length, repos[i]["name"])
+                except Exception as e:
+                    print(f"Could not keep {video_file} for later runs: {e}")
+            total_video_length += video_length
+            video_parts.append(video_file)
+
+    for stage in stages:
+        stage.join()
+    if errors:
+        raise errors[0]
+    expected = len(repos) * len(SEGMENTS)
+    if len(video_parts) != expected:
+        raise Exception(f"Only {len(video_parts)} of {expected} repository segments were rendered")
+    return video_parts, total_video_length
+
+def language_slug(language):
+    """File-name safe form of a trending language slug"""
+    return (language or 'all').replace('+', 'p').replace('#', 'sharp')
+
+def output_video_name(language, since, variant=None):
+    """Final video file name for one trending page; ``variant`` as in run_id"""
+    if variant:
+        return f"trending_{language_slug(language)}_{since}_{variant}_video.mp4"
+    if (language, since) == ("python", "daily"):
+        return "trending_repos_video.mp4"
+    return f"trending_{language_slug(language)}_{since}_video.mp4"
+
+def run_id(language, since, day=None, variant=None):
+    """Identifier of the run manifest for one trending page on one day
+
+    ``variant`` tells apart videos of the same page built with other settings
+    (see daemon.job_variant), so they get their own manifest and workspace.
+    """
+    day = day or datetime.now().strftime("%Y-%m-%d")
+    suffix = f"_{variant}" if variant else ""
+    return f"{day}_{language_slug(language)}_{since}{suffix}"
+
+def capture_repo_content(trending_repos, manifest, workspace, base_url="https://github.com", fetcher=None,
+                         browser_pool=None):
+    """Fetch screenshots and READMEs for the repositories not already captured in this run"""
+    stale = [i for i, repo in enumerate(trending_repos)
+             if not manifest.is_fresh(f"capture:{i}", {"repo": repo["name"]})]
+    if not stale:
+        print("Screenshots and README content already captured")
+        return
+    print("Fetching Screenshots and README content...")
+    with span("capture", repos=len(stale)):
+        fetch_repo_content([trending_repos[i] for i in stale], pool=browser_pool, indices=stale,
+                           workdir=workspace.dir, base_url=base_url, fetcher=fetcher)
+    for i in stale:
+        outputs = [path for path in (workspace.path(f"screenshot_{i}.png"), workspace.path(f"readme_{i}.txt"))
+                   if os.path.exists(path)]
+        manifest.record(f"capture:{i}", {"repo": trending_repos[i]["name"]}, outputs)
+
+def prepare_screenshots(count, manifest, workspace):
+    """Crop every capture to its README and fit it into the memory-mapped array the renderer reads"""
+    for i in range(count):
+        capture = workspace.path(f"screenshot_{i}.png")
+        prepared = workspace.path(f"screenshot_{i}.npy")
+        with span("prep", index=i) as prep_span:
+            prep_span.add_output(prepared)
+            inputs = {"screenshot": file_digest(capture), "box": load_readme_box(capture)}
+            manifest.run(f"prep:{i}", inputs, [prepared], lambda: preprocess_screenshot(capture, prepared))
+
+def upload_video(final_video, language, since, uploader=None, publish_at=None, session_path=None):
+    video_id = upload_to_youtube(final_video, language=language, since=since, uploader=uploader,
+                                 publish_at=publish_at, session_path=session_path)
+    if not video_id:
+        raise Exception("YouTube upload failed")
+    return video_id
+
+def resume_or_fetch_trending(manifests, top):
+    """Repository lists of several trending pages, reusing the ones already in their run manifests
+
+    Resumed runs get the same repositories every earlier stage saw; the pages
+    that were not fetched yet are fetched together and recorded.
+
+    Args:
+        manifests (dict): (language, since) -> RunManifest of that page's run
+        top (int): Repositories per page
+
+    Returns:
+        dict: (language, since) -> list of repository dicts, or None if the page could not be fetched
+    """
+    trending = {
+        job: manifest.result("trending") for job, manifest in manifests.items()
+        if manifest.is_fresh("trending", {"top": top})
+    }
+    to_fetch = [job for job in manifests if job not in trending]
+    if to_fetch:
+        print("Fetching trending repositories...")
+        fetched = get_trending(sorted({language for language, _ in to_fetch}),
+                               sorted({since for _, since in to_fetch}), top)
+        print("Trending repositories fetched successfully!")
+        for job in to_fetch:
+            trending[job] = fetched.get(job)
+            if trending[job]:
+                manifests[job].record("trending", {"top": top}, [], trending[job])
+    return trending
+
+def create_trending_video(trending_repos, language="python", since="daily", manifest=None, tmpfs=False,
+                          base_url="https://github.com", fetcher=None, voice_backend=None, uploader=None,
+                          music_dir=MUSIC_DIR, store=None, browser_pool=None, limits=None, publish_at=None,
+                          upload=True, variant=None):
+    """Build and upload the video for one trending page
+
+    Progress is checkpointed in a RunManifest, so running again after a failure
+    resumes from the first stage whose outputs are missing or stale. Intermediate
+    files live in the run's own Workspace (on tmpfs if requested) and are only
+    removed once the upload has succeeded.
+
+    Rendered segments are kept in a SegmentStore (the shared one by default),
+    so repositories still trending from an earlier day are not rendered again.
+
+    ``base_url``, ``fetcher``, ``voice_backend``, ``uploader`` and ``music_dir``
+    replace the external services, e.g. with the local stand-ins of
+    benchmarks/bench_e2e.py. A long-running caller (see daemon.py) passes its
+    warm ``browser_pool`` and the ResourceLimits its jobs share; ``publish_at``
+    sets when the upload goes public and ``upload=False`` keeps the video local.
+    ``variant`` keeps the run apart from the default one of the page (see run_id).
+
+    Returns:
+        str: The uploaded video ID (the video file if ``upload`` is False), or None if the run failed
+    """
+    manifest = manifest or RunManifest.for_run(run_id(language, since, variant=variant))
+    store = store or get_segment_store()
+    for i, repo in enumerate(trending_repos):
+        print(f"{i+1}. {repo['name']} - {repo['description']}")
+        previous = store.previous_rank(repo["name"], language, since)
+        if previous is not None and previous != i + 1:
+            print(f"   (number {previous} on the previous run)")
+    store.record_positions(trending_repos, language, since)
+
+    final_video = output_video_name(language, since, variant)
+    workspace = Workspace(run_id(language, since, variant=variant), tmpfs=tmpfs)
+    try:
+        with hold(limits, "browser"):
+            capture_repo_content(trending_repos, manifest, workspace, base_url, fetcher, browser_pool)
+        with hold(limits, "render"):
+            prepare_screenshots(len(trending_repos), manifest, workspace)
+
+            # Generate individual videos for each repo; TTS and rendering overlap
+            video_parts, total_video_length = run_pipeline(trending_repos, manifest=manifest, workspace=workspace,
+                                                           voice_backend=voice_backend, store=store)
             # Calculate total video length
             print(f"Total video length: {total_video_length} seconds")
             # Combine videos (implement this in create_video function)
             print("Combining videos...")
-            combine_videos(video_parts, "trending_repos_video.mp4", total_duration=total_video_length)
-            final_video = "trending_repos_video.mp4"
-            
-            # Cleanup temporary files
-            cleanup_files()
-            print("Cleanup complete")
-            upload_to_youtube("trending_repos_video.mp4")
-            
-        except Exception as e:
-            print(f"Error during video creation: {e}")
-            cleanup_files()
-    else:
-        print("Failed to fetch trending repositories.")
+            with span("combine") as combine_span:
+                combine_span.add_output(final_video)
+                manifest.run("combine", {"parts": [file_digest(part) for part in video_parts]}, [final_video],
+                             lambda: combine_videos(video_parts, final_video, total_duration=total_video_length,
+                                                    workdir=workspace.dir, music_dir=music_dir))
+
+        if upload:
+            with hold(limits, "upload"):
+                video_id = manifest.run("upload", {"video": file_digest(final_video)}, [],
+                                        lambda: upload_video(final_video, language, since, uploader, publish_at))
+        else:
+            video_id = final_video
+        
+        # Cleanup temporary files
+        with span("cleanup"):
+            workspace.cleanup()
+        print("Cleanup complete")
+        return video_id
+        
+    except Exception as e:
+        print(f"Error during video creation: {e}")
+        print(f"Intermediate files kept; run again to resume ({manifest.path})")
+        return None
+    finally:
+        workspace.release()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate GitHub trending videos")
+    parser.add_argument("--languages", nargs="+", default=["python"],
+                        help='Trending language slugs; use "" for all languages')
+    parser.add_argument("--since", nargs="+", default=["daily"], choices=TIME_RANGES,
+                        help="Trending time ranges to cover")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP_N,
+                        help="Repositories per video")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Videos built at the same time")
+    parser.add_argument("--tmpfs", action="store_true",
+                        help="Keep intermediate files in shared memory (/dev/shm)")
+    parser.add_argument("--trace", action="store_true",
+                        help="Also write a Chrome trace-event file next to the run report")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    manifests = {}
+    for language in args.languages:
+        for since in args.since:
+            manifest = RunManifest.for_run(run_id(language, since))
+            if manifest.completed("upload"):
+                print(f"{since} video for {language_label(language)} already uploaded today, skipping.")
+            else:
+                manifests[(language, since)] = manifest
+
+    trending = resume_or_fetch_trending(manifests, args.top)
+
+    def build(job):
+        language, since = job
+        trending_repos = trending[job]
+        if trending_repos:
+            print(f"Creating {since} video for {language_label(language)}...")
+            with tags(language=language, since=since), span("video"):
+                create_trending_video(trending_repos, language, since, manifest=manifests[job], tmpfs=args.tmpfs)
+        else:
+            print(f"Failed to fetch trending repositories for {language or 'all languages'} ({since}).")
+
+    # Pages are fetched concurrently; each video has its own workspace, so --jobs can build several at once
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        list(executor.map(build, manifests))
+
+    # One report per invocation, so stage timings can be compared from day to day
+    report_stem = os.path.join(RUNS_DIR, f"report_{datetime.now().strftime('%Y-%m-%d_%H%M%S')}")
+    print(f"Run report written to {get_tracer().write_report(f'{report_stem}.json')}")
+    if args.trace:
+        print(f"Chrome trace written to {get_tracer().write_chrome_trace(f'{report_stem}.trace.json')}")
@@ -1,52 +1,223 @@
-import soundfile as sf
-import numpy as np
-from typing import List, Tuple
+from __future__ import annotations
+from typing import List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
 import os
-import random
+import threading
+from lazy import lazy_import
+from sqlite_util import connect
+from tracing import traced, record_output
 
-def find_best_audio_clips(file_path: str, segment_length: float) -> List[Tuple[float, float]]:
+sf = lazy_import("soundfile")
+np = lazy_import("numpy")
+
+MUSIC_DIR = "music"
+MUSIC_EXTENSIONS = ('.mp3', '.wav')
+
+# Per-track duration and energy envelope, so selection never touches the audio
+MUSIC_INDEX_FILE = os.path.join(".cache", "music_index.sqlite")
+ENVELOPE_HOP_SECONDS = 0.1
+
+_music_indexes = {}
+_music_indexes_lock = threading.Lock()
+
+def block_energy(file_path: str, hop_seconds: float = 1.0, block_frames: int = 1 << 16) -> Tuple[np.ndarray, int, int]:
+    """
+    Stream an audio file and sum the squared mono signal over fixed hops.
+
+    Only one block of audio is held in memory at a time; the result holds one
+    value per hop.
+
+    Args:
+        file_path (str): Path to the audio file
+        hop_seconds (float): Hop length in seconds
+        block_frames (int): Approximate frames decoded per block
+
+    Returns:
+        Tuple[np.ndarray, int, int]: (energy per complete hop, hop size in frames, sample rate)
+    """
+    info = sf.info(file_path)
+    sr = info.samplerate
+    hop = max(1, int(round(hop_seconds * sr)))
+    # Blocks are a whole number of hops so no hop straddles two blocks
+    blocksize = hop * max(1, block_frames // hop)
+
+    energies = []
+    for block in sf.blocks(file_path, blocksize=blocksize, dtype="float32", always_2d=True):
+        mono = block.mean(axis=1, dtype=np.float64)
+        full_hops = len(mono) // hop
+        if full_hops:
+            energies.append(np.square(mono[:full_hops * hop]).reshape(full_hops, hop).sum(axis=1))
+    energy = np.concatenate(energies) if energies else np.zeros(0)
+    return energy, hop, sr
+
+def window_rms(energy: np.ndarray, hop: int, window_hops: int) -> np.ndarray:
+    """RMS of every window of window_hops consecutive hops, via a cumulative sum in O(n)."""
+    if len(energy) < window_hops:
+        return np.zeros(0)
+    cumulative = np.concatenate(([0.0], np.cumsum(energy)))
+    sums = cumulative[window_hops:] - cumulative[:-window_hops]
+    return np.sqrt(np.maximum(sums, 0) / (window_hops * hop))
+
+def top_windows(scores: np.ndarray, k: int, min_gap: int) -> List[int]:
+    """
+    Indices of the k highest scores that are at least min_gap apart.
+
+    Candidates come from np.argpartition, so only they are fully sorted.
+    """
+    if len(scores) == 0:
+        return []
+    m = min(len(scores), k * (min_gap + 1))
+    candidates = np.argpartition(scores, len(scores) - m)[len(scores) - m:]
+    candidates = candidates[np.argsort(scores[candidates])[::-1]]
+    chosen = []
+    for candidate in candidates:
+        if all(abs(int(candidate) - previous) >= min_gap for previous in chosen):
+            chosen.append(int(candidate))
+            if len(chosen) == k:
+                break
+    return chosen
+
+def _analyze_track(file_path: str, hop_seconds: float):
+    """Index record for one track: (duration, sample rate, hop, float32 envelope)."""
+    energy, hop, sr = block_energy(file_path, hop_seconds)
+    return sf.info(file_path).duration, sr, hop, energy.astype(np.float32)
+
+class MusicIndex:
+    """
+    SQLite index of the music library.
+
+    Stores each track's duration, sample rate and a downsampled energy
+    envelope (summed squares per ENVELOPE_HOP_SECONDS). Rows are keyed by path
+    and invalidated when a file's mtime or size changes; the directory is only
+    rescanned when its own mtime changes, i.e. when tracks are added or removed.
+    """
+
+    def __init__(self, music_dir: str = MUSIC_DIR, index_file: str = MUSIC_INDEX_FILE,
+                 hop_seconds: float = ENVELOPE_HOP_SECONDS):
+        self.music_dir = music_dir
+        self.index_file = index_file
+        self.hop_seconds = hop_seconds
+        os.makedirs(os.path.dirname(index_file) or ".", exist_ok=True)
+        with connect(self.index_file) as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS tracks (
+                path TEXT PRIMARY KEY, mtime REAL, size INTEGER, duration REAL,
+                samplerate INTEGER, hop INTEGER, envelope BLOB)""")
+            db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _store(self, db, path: str, stat, record):
+        duration, sr, hop, envelope = record
+        db.execute("INSERT OR REPLACE INTO tracks VALUES (?, ?, ?, ?, ?, ?, ?)",
+                   (path, stat.st_mtime, stat.st_size, duration, sr, hop, envelope.tobytes()))
+
+    @traced("music.index")
+    def refresh(self, force: bool = False, workers: Optional[int] = None):
+        """Bring the index in line with the music directory, analyzing only new or changed files."""
+        dir_mtime = str(os.stat(self.music_dir).st_mtime)
+        with connect(self.index_file) as db:
+            row = db.execute("SELECT value FROM meta WHERE key = 'dir_mtime'").fetchone()
+            if not force and row and row[0] == dir_mtime:
+                return
+
+            known = {path: (mtime, size) for path, mtime, size in db.execute("SELECT path, mtime, size FROM tracks")}
+            stats = {}
+            for name in os.listdir(self.music_dir):
+                if name.endswith(MUSIC_EXTENSIONS):
+                    path = os.path.join(self.music_dir, name)
+                    stats[path] = os.stat(path)
+            stale = [path for path, stat in stats.items() if known.get(path) != (stat.st_mtime, stat.st_size)]
+
+            if stale:
+                print(f"Indexing {len(stale)} music track(s)...")
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    records = executor.map(_analyze_track, stale, [self.hop_seconds] * len(stale))
+                    for path, record in zip(stale, records):
+                        self._store(db, path, stats[path], record)
+            for path in set(known) - set(stats):
+                db.execute("DELETE FROM tracks WHERE path = ?", (path,))
+            db.execute("INSERT OR REPLACE INTO meta VALUES ('dir_mtime', ?)", (dir_mtime,))
+
+    def tracks(self) -> List[str]:
+        self.refresh()
+        with connect(self.index_file) as db:
+            return [path for (path,) in db.execute("SELECT path FROM tracks ORDER BY path")]
+
+    def random_track(self) -> str:
+        self.refresh()
+        with connect(self.index_file) as db:
+            row = db.execute("SELECT path FROM tracks ORDER BY RANDOM() LIMIT 1").fetchone()
+        if row is None:
+            raise Exception(f"No music files found in {self.music_dir} directory")
+        return row[0]
+
+    def envelope(self, file_path: str) -> Tuple[np.ndarray, int, int]:
+        """
+        Energy envelope of a track, analyzing (and indexing) it first if needed.
+
+        Returns:
+            Tuple[np.ndarray, int, int]: (energy per hop, hop size in frames, sample rate)
+        """
+        stat = os.stat(file_path)
+        with connect(self.index_file) as db:
+            row = db.execute("SELECT mtime, size, samplerate, hop, envelope FROM tracks WHERE path = ?",
+                             (file_path,)).fetchone()
+            if row and (row[0], row[1]) == (stat.st_mtime, stat.st_size):
+                return np.frombuffer(row[4], dtype=np.float32).astype(np.float64), row[3], row[2]
+
+            record = _analyze_track(file_path, self.hop_seconds)
+            self._store(db, file_path, stat, record)
+            _, sr, hop, envelope = record
+            return envelope.astype(np.float64), hop, sr
+
+def get_music_index(music_dir: str = MUSIC_DIR) -> MusicIndex:
+    """Return the shared MusicIndex for a music directory."""
+    with _music_indexes_lock:
+        if music_dir not in _music_indexes:
+            _music_indexes[music_dir] = MusicIndex(music_dir)
+        return _music_indexes[music_dir]
+
+@traced("music.analyze")
+def find_best_audio_clips(file_path: str, segment_length: float, top_k: int = 5,
+                          hop_seconds: float = 1.0, index: Optional[MusicIndex] = None) -> List[Tuple[float, float]]:
     """
     Analyze audio file and find the best segments based on energy.
+
+    Windows may start at any multiple of hop_seconds; the top_k non-overlapping
+    windows by RMS energy are returned. With an ``index`` the answer comes from
+    the stored envelope (at the index's hop) without decoding the audio.
     
     Args:
         file_path (str): Path to the audio file
         segment_length (float): Length of each segment in seconds
+        top_k (int): Number of segments to return
+        hop_seconds (float): Spacing between candidate start offsets
+        index (MusicIndex): Music index to read the envelope from
         
     Returns:
         List[Tuple[float, float]]: List of (start_time, end_time) tuples for best segments
     """
     try:
-        # Load the audio file
-        data, sr = sf.read(file_path)
-        # Convert stereo to mono if necessary
-        if len(data.shape) > 1:
-            data = np.mean(data, axis=1)
-        
-        # Calculate the number of samples per segment
-        samples_per_segment = int(segment_length * sr)
-        
-        # Split audio into segments
-        segments = []
-        for i in range(0, len(data) - samples_per_segment, samples_per_segment):
-            segment = data[i:i + samples_per_segment]
-            # Calculate RMS energy of segment
-            energy = np.sqrt(np.mean(segment ** 2))
-            start_time = i / sr
-            end_time = (i + samples_per_segment) / sr
-            segments.append((start_time, end_time, energy))
-        
-        # Sort segments by energy
-        segments.sort(key=lambda x: x[2], reverse=True)
-        
-        # Return top 5 clips or all if less than 5
-        best_clips = [(clip[0], clip[1]) for clip in segments[:5]]
-        return best_clips
+        if index is not None:
+            energy, hop, sr = index.envelope(file_path)
+        else:
+            energy, hop, sr = block_energy(file_path, hop_seconds)
+        hop_length = hop / sr
+        window_hops = max(1, int(round(segment_length / hop_length)))
+        if len(energy) <= window_hops:
+            # Track is shorter than the segment: the whole track is the only option
+            return [(0.0, len(energy) * hop_length)]
+
+        scores = window_rms(energy, hop, window_hops)
+        starts = top_windows(scores, top_k, window_hops)
+        return [(start * hop_length, start * hop_length + segment_length) for start in starts]
     except Exception as e:
         raise Exception(f"Error processing audio: {str(e)}")
 
+@traced("music.clip")
 def create_random_clip(file_path: str, best_clips: List[Tuple[float, float]], output_path: str = "music.mp3"):
     """
     Select a random segment from the best clips and save it as an audio file.
+
+    Only the selected segment is decoded.
     
     Args:
         file_path (str): Path to the original audio file
@@ -54,8 +225,7 @@ def create_random_clip(file_path: str, best_clips: List[Tuple[float, float]], ou
         output_path (str): Path to save the output audio file
     """
     try:
-        # Load the audio file
-        data, sr = sf.read(file_path)
+        sr = sf.info(file_path).samplerate
         
         # Select random clip
         start_time, end_time = best_clips[np.random.randint(0, len(best_clips))]
@@ -65,30 +235,26 @@ def create_random_clip(file_path: str, best_clips: List[Tuple[float, float]], ou
         end_sample = int(end_time * sr)
         
         # Extract the segment
-        selected_segment = data[start_sample:end_sample]
+        selected_segment, sr = sf.read(file_path, start=start_sample, stop=end_sample)
         
         # Save the segment
         sf.write(output_path, selected_segment, sr)
+        record_output(output_path)
     except Exception as e:
         raise Exception(f"Error creating clip: {str(e)}")
 
-def random_songs() -> str:
+def random_songs(music_dir: str = MUSIC_DIR) -> str:
     """
     Select a random music file from the music directory in the current working directory.
+
+    The choice is made from the music index, which only rescans the directory
+    when tracks have been added or removed.
     
     Returns:
         str: Path to the randomly selected music file
     """
     try:
-        music_dir = "music"
-        # Get list of files from music directory
-        music_files = [f for f in os.listdir(music_dir) if f.endswith(('.mp3', '.wav'))]
-        if not music_files:
-            raise Exception("No music files found in music directory")
-        
-        # Select random file
-        random_file = random.choice(music_files)
-        return os.path.join(music_dir, random_file)
+        return get_music_index(music_dir).random_track()
     except Exception as e:
         raise Exception(f"Error selecting random song: {str(e)}")
 
@@ -96,6 +262,6 @@ def random_songs() -> str:
 if __name__=="__main__":
     file_path = random_songs()
     segment_length = 90
-    best_clips = find_best_audio_clips(file_path, segment_length)
+    best_clips = find_best_audio_clips(file_path, segment_length, index=get_music_index())
     print(f"Best clips: {best_clips}")
     create_random_clip(file_path, best_clips)
\ No newline at end of file
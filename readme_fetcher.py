@@ -0,0 +1,75 @@
+import os
+import re
+from cache import DiskCache, hash_key
+from http_client import get_session
+
+GITHUB_API_URL = "https://api.github.com"
+
+# Raw README responses are kept here together with their ETag
+README_CACHE_DIR = os.path.join(".cache", "readme")
+README_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+_CODE_BLOCK = re.compile(r"```.*?```|~~~.*?~~~", re.S)
+_HTML_COMMENT = re.compile(r"<!--.*?-->", re.S)
+_IMAGE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+_LINK = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_HTML_TAG = re.compile(r"<[^>]+>")
+_LINE_MARKUP = re.compile(r"^\s{0,3}(?:#{1,6}\s*|>\s?|[-*+]\s+|\d+\.\s+|\|)", re.M)
+_EMPHASIS = re.compile(r"[*_`]{1,3}")
+
+def markdown_to_text(markdown):
+    """Strip Markdown/HTML markup down to readable plain text."""
+    text = _CODE_BLOCK.sub(" ", markdown)
+    text = _HTML_COMMENT.sub(" ", text)
+    text = _IMAGE.sub(" ", text)
+    text = _LINK.sub(r"\1", text)
+    text = _HTML_TAG.sub(" ", text)
+    text = _LINE_MARKUP.sub("", text)
+    text = _EMPHASIS.sub("", text)
+    lines = [re.sub(r"[ \t]+", " ", line).strip() for line in text.splitlines()]
+    return "\n".join(line for line in lines if line and not set(line) <= set("-=|: "))
+
+class ReadmeFetcher:
+    """
+    Fetch repository READMEs through the GitHub contents API.
+
+    Requests go through a pooled keep-alive session and are revalidated with
+    If-None-Match against an on-disk cache, so an unchanged README costs a
+    304 with an empty body. Both the session and the API base URL can be
+    injected to run against a local fixture server.
+    """
+
+    def __init__(self, session=None, api_url=GITHUB_API_URL, cache_dir=README_CACHE_DIR, timeout=10):
+        self.session = session or get_session()
+        self.api_url = api_url.rstrip("/")
+        self.cache = DiskCache(cache_dir, README_CACHE_MAX_BYTES) if cache_dir else None
+        self.timeout = timeout
+
+    def fetch(self, repo_name):
+        """
+        Return the raw README Markdown of a repository.
+
+        Returns:
+            str: README text, or None if the repository has no README
+        """
+        url = f"{self.api_url}/repos/{repo_name}/readme"
+        key = hash_key("readme", url)
+        cached = self.cache.get(key) if self.cache else None
+
+        headers = {"Accept": "application/vnd.github.raw"}
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304 and cached:
+            with open(self.cache.path(key, "body"), "r", encoding="utf-8") as f:
+                return f.read()
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+
+        text = response.text
+        if self.cache and response.headers.get("ETag"):
+            self.cache.discard(key)
+            self.cache.put(key, {"body": text.encode("utf-8")}, {"etag": response.headers["ETag"]})
+        return text
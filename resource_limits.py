@@ -0,0 +1,45 @@
+import threading
+from contextlib import contextmanager
+from tracing import span
+
+# Jobs allowed to use each resource at once: headless Chrome captures, the
+# voice/render/combine pipeline (which already spreads over every core) and
+# YouTube uploads (which share one connection)
+DEFAULT_LIMITS = {"browser": 1, "render": 1, "upload": 1}
+
+class ResourceLimits:
+    """
+    Per-resource concurrency limits shared by the jobs of one process.
+
+    ``hold(resource)`` blocks until one of the resource's slots is free, so
+    several jobs can be in flight while, for example, only one of them renders
+    at a time. Resources without a limit are never waited on.
+    """
+
+    def __init__(self, limits=None):
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self._semaphores = {name: threading.BoundedSemaphore(max(1, count)) for name, count in self.limits.items()}
+
+    @contextmanager
+    def hold(self, resource):
+        """Occupy one slot of ``resource`` for the duration of a with-block."""
+        semaphore = self._semaphores.get(resource)
+        if semaphore is None:
+            yield
+            return
+        # Time spent here is the job queueing for the resource
+        with span(f"{resource}.wait", category="wait"):
+            semaphore.acquire()
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+@contextmanager
+def hold(limits, resource):
+    """``limits.hold(resource)``, or nothing when ``limits`` is None."""
+    if limits is None:
+        yield
+    else:
+        with limits.hold(resource):
+            yield
@@ -0,0 +1,101 @@
+import json
+import os
+import threading
+import time
+from cache import file_digest, hash_key
+
+# One manifest per run (date, language, time range) lives here
+RUNS_DIR = "runs"
+
+class RunManifest:
+    """
+    Checkpoint of a pipeline run, stored as JSON.
+
+    Every stage is recorded with a hash of its inputs, the content hash of each
+    output file and an optional JSON result. On a restart, a stage is skipped
+    when its inputs hash the same and all of its outputs still exist unchanged,
+    so the run resumes from the first stale or failed stage.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+        except (OSError, ValueError):
+            self.data = {"stages": {}}
+
+    @classmethod
+    def for_run(cls, run_id, runs_dir=RUNS_DIR):
+        os.makedirs(runs_dir, exist_ok=True)
+        manifest = cls(os.path.join(runs_dir, f"{run_id}.json"))
+        manifest.data.setdefault("run_id", run_id)
+        return manifest
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _entry(self, stage):
+        return self.data["stages"].get(stage)
+
+    def completed(self, stage):
+        """Whether a stage finished successfully at some point, regardless of its outputs now."""
+        entry = self._entry(stage)
+        return entry is not None and entry["status"] == "done"
+
+    def is_fresh(self, stage, inputs):
+        """Whether a stage can be skipped: same inputs and every output still intact."""
+        with self._lock:
+            entry = self._entry(stage)
+            if entry is None or entry["status"] != "done" or entry["inputs"] != hash_key(inputs):
+                return False
+            for path, digest in entry["outputs"].items():
+                if not os.path.exists(path) or file_digest(path) != digest:
+                    return False
+            return True
+
+    def result(self, stage):
+        """JSON result recorded for a stage, or None."""
+        entry = self._entry(stage)
+        return entry.get("result") if entry else None
+
+    def record(self, stage, inputs, outputs=(), result=None):
+        """Mark a stage as done, hashing its output files."""
+        digests = {path: file_digest(path) for path in outputs}
+        with self._lock:
+            self.data["stages"][stage] = {
+                "status": "done",
+                "inputs": hash_key(inputs),
+                "outputs": digests,
+                "result": result,
+                "updated": time.time(),
+            }
+            self._save()
+
+    def fail(self, stage, error):
+        with self._lock:
+            entry = self.data["stages"].setdefault(stage, {"inputs": None, "outputs": {}, "result": None})
+            entry.update({"status": "failed", "error": str(error), "updated": time.time()})
+            self._save()
+
+    def run(self, stage, inputs, outputs, fn):
+        """
+        Run fn() unless the stage is fresh, recording the outcome.
+
+        Returns:
+            The recorded result of the stage (fn's return value when it ran)
+        """
+        if self.is_fresh(stage, inputs):
+            print(f"Skipping {stage}: up to date")
+            return self.result(stage)
+        try:
+            result = fn()
+        except Exception as e:
+            self.fail(stage, e)
+            raise
+        self.record(stage, inputs, outputs, result)
+        return result
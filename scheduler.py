@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta
+from lazy import lazy_import
+
+pytz = lazy_import("pytz")
+
+# Timezone schedules are read in unless they name their own
+SCHEDULE_TIMEZONE = "Asia/Kolkata"
+
+# When uploaded videos go public: every day at 6 PM IST
+PUBLISH_SCHEDULE = "0 18 * * *"
+
+# Shorthands accepted in place of the five cron fields
+ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+    "@yearly": "0 0 1 1 *",
+}
+
+# (name, lowest value, highest value) of each cron field
+FIELDS = (("minute", 0, 59), ("hour", 0, 23), ("day", 1, 31), ("month", 1, 12), ("weekday", 0, 7))
+
+# A schedule that matches no time in this many days (e.g. "0 0 30 2 *") is rejected
+MAX_LOOKAHEAD_DAYS = 366 * 4
+
+def parse_field(text, low, high):
+    """
+    Values matched by one cron field: ``*``, ``n``, ``a-b``, ``*/step``, ``a-b/step`` and lists of those.
+
+    Returns:
+        frozenset: Matching values
+    """
+    values = set()
+    for part in text.split(","):
+        spec, _, step = part.partition("/")
+        step = int(step) if step else 1
+        if spec == "*":
+            start, end = low, high
+        elif "-" in spec:
+            start, end = (int(value) for value in spec.split("-", 1))
+        else:
+            start = int(spec)
+            end = high if step > 1 else start
+        if not low <= start <= end <= high or step < 1:
+            raise ValueError(f"Invalid cron field {text!r} (allowed {low}-{high})")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+class CronSchedule:
+    """
+    Five-field cron expression (minute hour day month weekday) in a timezone.
+
+    Weekdays run from 0 (Sunday) to 6, with 7 also meaning Sunday. As in cron,
+    when both day of month and weekday are restricted a day matching either
+    one matches.
+    """
+
+    def __init__(self, expression, timezone=SCHEDULE_TIMEZONE):
+        self.expression = expression
+        self.timezone = timezone
+        fields = ALIASES.get(expression.strip(), expression).split()
+        if len(fields) != len(FIELDS):
+            raise ValueError(f"Cron expression needs {len(FIELDS)} fields: {expression!r}")
+        parsed = [parse_field(text, low, high) for text, (_, low, high) in zip(fields, FIELDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = frozenset(day % 7 for day in weekdays)
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _day_matches(self, moment):
+        weekday = (moment.weekday() + 1) % 7  # cron counts from Sunday
+        if self._any_day or self._any_weekday:
+            return moment.day in self.days and weekday in self.weekdays
+        return moment.day in self.days or weekday in self.weekdays
+
+    def next_after(self, moment=None):
+        """
+        First matching minute strictly after ``moment`` (default now).
+
+        Returns:
+            datetime: Timezone-aware time in the schedule's timezone
+        """
+        tz = pytz.timezone(self.timezone)
+        moment = moment or datetime.now(tz)
+        if moment.tzinfo is None:
+            moment = tz.localize(moment)
+        # Walk local wall-clock time, skipping whole months, days and hours that cannot match
+        t = moment.astimezone(tz).replace(tzinfo=None, second=0, microsecond=0) + timedelta(minutes=1)
+        limit = t + timedelta(days=MAX_LOOKAHEAD_DAYS)
+        while t < limit:
+            if t.month not in self.months:
+                t = (t.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self._day_matches(t):
+                t = (t + timedelta(days=1)).replace(hour=0, minute=0)
+            elif t.hour not in self.hours:
+                t = (t + timedelta(hours=1)).replace(minute=0)
+            elif t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+            else:
+                return tz.normalize(tz.localize(t))
+        raise ValueError(f"Cron expression never matches: {self.expression!r}")
+
+    def __repr__(self):
+        return f"CronSchedule({self.expression!r}, timezone={self.timezone!r})"
+
+def next_publish_time(schedule=PUBLISH_SCHEDULE, timezone=SCHEDULE_TIMEZONE, moment=None):
+    """Next publish slot of a cron schedule, by default the next 6 PM IST."""
+    return CronSchedule(schedule, timezone).next_after(moment)
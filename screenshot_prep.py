@@ -0,0 +1,102 @@
+import json
+import os
+from lazy import lazy_import
+from scroll_renderer import BACKGROUND
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+
+# Fallback crop for captures without a recorded README box (see readme_box_path):
+# rows of GitHub chrome (global header, repository title, tab bar) at the top, in
+# screenshot pixels for a 1920 px wide window at device scale 0.85, and the share
+# of the centred content container taken by the About/Releases sidebar
+CHROME_HEADER_HEIGHT = int(os.environ.get("CHROME_HEADER_HEIGHT", 150))
+SIDEBAR_FRACTION = float(os.environ.get("SIDEBAR_FRACTION", 0.25))
+
+# Largest per-channel difference from BACKGROUND still treated as empty margin
+BACKGROUND_TOLERANCE = 8
+
+def content_columns(array, background=BACKGROUND, tolerance=BACKGROUND_TOLERANCE):
+    """
+    Leftmost and rightmost columns holding anything but page background.
+
+    Returns:
+        Tuple[int, int]: (left, right) bounds, right exclusive; the full width if the image is blank
+    """
+    # Every 8th row is plenty to find the container edges and keeps this cheap on tall pages
+    sample = array[::8].astype(np.int16)
+    differs = (np.abs(sample - np.array(background, dtype=np.int16)) > tolerance).any(axis=(0, 2))
+    columns = np.flatnonzero(differs)
+    if columns.size == 0:
+        return 0, array.shape[1]
+    return int(columns[0]), int(columns[-1]) + 1
+
+def readme_box_path(image_path):
+    """Sidecar file holding the README element's box in a capture, written by the capture stage."""
+    return os.path.splitext(image_path)[0] + ".readme.json"
+
+def load_readme_box(image_path):
+    """
+    The README element's box recorded for a capture.
+
+    Returns:
+        Tuple[int, int, int, int]: (left, top, right, bottom) in screenshot pixels, or None if none was recorded
+    """
+    try:
+        with open(readme_box_path(image_path), "r", encoding="utf-8") as f:
+            box = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return tuple(int(round(box[side])) for side in ("left", "top", "right", "bottom"))
+
+def crop_chrome(image, header_height=CHROME_HEADER_HEIGHT, sidebar_fraction=SIDEBAR_FRACTION):
+    """Crop the page header, the empty side margins and the right sidebar off a repository capture."""
+    top = header_height if image.height > header_height else 0
+    left, right = content_columns(np.asarray(image)[top:])
+    right = left + max(1, int((right - left) * (1 - sidebar_fraction)))
+    return image.crop((left, top, right, image.height))
+
+def crop_readme(image, box):
+    """Crop a capture to the README box, clamped to the image; None if the box is empty."""
+    left, top, right, bottom = max(0, box[0]), max(0, box[1]), min(image.width, box[2]), min(image.height, box[3])
+    if right - left < 1 or bottom - top < 1:
+        return None
+    return image.crop((left, top, right, bottom))
+
+def preprocess_screenshot(image_path, output_path, width=1280, crop=True, header_height=CHROME_HEADER_HEIGHT,
+                          sidebar_fraction=SIDEBAR_FRACTION):
+    """
+    Turn a browser capture into the array the scroll renderer reads.
+
+    The capture is cropped to the README, using the box the capture stage
+    measured on the page and falling back to cutting ``header_height`` rows
+    and the ``sidebar_fraction`` sidebar off. A crop wider than the output is
+    scaled down once to ``width``; a narrower one keeps its pixels and is
+    centred on the page background, since scaling it up would only blur the
+    text and grow the file. The result is written as an uncompressed .npy
+    file, which the renderer opens with ``np.load(..., mmap_mode="r")`` so
+    each frame only pages in the rows it shows.
+
+    Returns:
+        str: output_path
+    """
+    with Image.open(image_path) as image:
+        image = image.convert("RGB")
+        if crop:
+            box = load_readme_box(image_path)
+            cropped = crop_readme(image, box) if box is not None else None
+            image = cropped if cropped is not None else crop_chrome(image, header_height, sidebar_fraction)
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+
+        tmp_path = f"{output_path}.tmp"
+        array = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.uint8, shape=(image.height, width, 3))
+        left = (width - image.width) // 2
+        if image.width < width:
+            array[:] = BACKGROUND
+        array[:, left:left + image.width] = np.asarray(image)
+        array.flush()
+        del array
+    os.replace(tmp_path, output_path)
+    return output_path
@@ -0,0 +1,190 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from captions import CaptionTrack
+from encoder_profiles import PROFILES
+from ffmpeg_tools import open_ffmpeg_writer, close_ffmpeg_writer, run_ffmpeg, write_concat_list
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+
+# GitHub page background, used to pad screenshots shorter than one frame
+BACKGROUND = (255, 255, 255)
+
+# Every part gets the same audio layout so parts can be joined by stream copy
+AUDIO_RATE = 44100
+AUDIO_CHANNELS = 2
+
+# Parts shorter than this per segment are not worth splitting across processes
+MIN_SEGMENT_SECONDS = 5
+
+def _fit_width(image, width):
+    if image.width != width:
+        height = max(1, round(image.height * width / image.width))
+        image = image.resize((width, height), Image.LANCZOS)
+    return np.ascontiguousarray(np.asarray(image, dtype=np.uint8))
+
+def load_screenshot(image_path, width):
+    """
+    Decode a screenshot once and scale it to the output width.
+
+    A .npy file written by screenshot_prep at the output width is memory-mapped
+    instead, so only the rows a frame shows are ever read.
+
+    Returns:
+        np.ndarray: Contiguous (height, width, 3) uint8 RGB array
+    """
+    if image_path.endswith(".npy"):
+        array = np.load(image_path, mmap_mode="r")
+        if array.shape[1] == width:
+            return array
+        return _fit_width(Image.fromarray(np.asarray(array)), width)
+    with Image.open(image_path) as image:
+        return _fit_width(image.convert("RGB"), width)
+
+def scroll_offsets(image_height, frame_height, duration, fps, scroll_fraction=0.4):
+    """
+    Top row of the crop window for every frame.
+
+    The window moves at a constant speed that covers ``scroll_fraction`` of
+    the scrollable height over ``duration`` seconds.
+
+    Returns:
+        np.ndarray: One int64 row offset per frame
+    """
+    n_frames = max(1, int(round(duration * fps)))
+    scroll_height = max(0, image_height - frame_height)
+    speed = scroll_height / duration * scroll_fraction if duration > 0 else 0
+    t = np.arange(n_frames, dtype=np.float64) / fps
+    return np.minimum(t * speed, scroll_height).astype(np.int64)
+
+def prepare_frames(image_path, size):
+    """Load a screenshot at the output width, padded to at least one frame high."""
+    width, height = size
+    image = load_screenshot(image_path, width)
+    if image.shape[0] < height:
+        padded = np.empty((height, width, 3), dtype=np.uint8)
+        padded[:] = BACKGROUND
+        padded[:image.shape[0]] = image
+        image = padded
+    return image
+
+def write_frames(process, image, offsets, height, captions=None, first_frame=0):
+    """
+    Pipe the crop window at every offset to ffmpeg as raw frames.
+
+    With a CaptionTrack, only the caption band of a captioned frame is copied
+    and blended; the rows above and below it are still written straight from
+    the screenshot. ``first_frame`` is the index of the first offset within
+    the whole part, which places the captions in time.
+    """
+    try:
+        for n, offset in enumerate(offsets):
+            # Rows of a C-contiguous array are contiguous, so this writes without copying
+            frame = image[offset:offset + height]
+            band = captions.band(frame, first_frame + n) if captions is not None else None
+            if band is None:
+                process.stdin.write(frame.data)
+            else:
+                process.stdin.write(frame[:captions.top].data)
+                process.stdin.write(band.data)
+                process.stdin.write(frame[captions.bottom:].data)
+    except BrokenPipeError:
+        pass
+    close_ffmpeg_writer(process)
+
+def _raw_input_args(size, fps):
+    width, height = size
+    return ["-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(fps), "-i", "-"]
+
+def _audio_args(audio_codec):
+    return ["-c:a", audio_codec, "-ar", str(AUDIO_RATE), "-ac", str(AUDIO_CHANNELS)]
+
+def render_segment(image, size, fps, offsets, output_video, profile, words=None, first_frame=0):
+    """Encode the frames of ``image`` (from prepare_frames) at ``offsets`` into a video-only file."""
+    captions = CaptionTrack(words, size, fps) if words else None
+    process = open_ffmpeg_writer(_raw_input_args(size, fps) + profile.ffmpeg_args() + ["-an", output_video])
+    write_frames(process, image, offsets, size[1], captions, first_frame)
+    return output_video
+
+def render_scroll(image_path, audio_file, output_video, duration, size=(1280, 720), fps=30,
+                  scroll_fraction=0.4, audio_codec="aac", profile=None, words=None):
+    """
+    Render a vertically scrolling screenshot straight into an H.264 file.
+
+    The image is decoded and resized once; every frame is then a zero-copy row
+    slice of that array written to a single ffmpeg process, which also muxes
+    the narration. When ``profile.segments`` is above one, the frames are split
+    into that many time ranges encoded by parallel ffmpeg processes and joined by
+    stream copy (see render_segmented). ``words`` are the narration's word
+    timings (see captions.load_word_timings); when given, they are burned in
+    as captions.
+
+    Args:
+        image_path (str): Screenshot to scroll through
+        audio_file (str): Narration muxed into the output
+        output_video (str): Destination MP4
+        duration (float): Video length in seconds (normally the narration length)
+        size (Tuple[int, int]): Output (width, height)
+        fps (int): Output frame rate
+        scroll_fraction (float): Share of the scrollable height covered by the end
+        profile (EncoderProfile): Encoder settings (defaults to the "balanced" profile)
+        words (List[dict]): Word timings to caption, or None for no captions
+    """
+    profile = profile or PROFILES["balanced"]
+    width, height = size
+    image = prepare_frames(image_path, size)
+    offsets = scroll_offsets(image.shape[0], height, duration, fps, scroll_fraction)
+
+    segments = min(profile.segments, max(1, int(duration // MIN_SEGMENT_SECONDS)))
+    if segments > 1:
+        return render_segmented(image, audio_file, output_video, duration, offsets, size, fps,
+                                audio_codec, profile, segments, words)
+
+    process = open_ffmpeg_writer(
+        _raw_input_args(size, fps)
+        + ["-i", audio_file, "-map", "0:v:0", "-map", "1:a:0"]
+        + profile.ffmpeg_args() + _audio_args(audio_codec)
+        + ["-t", f"{duration:.3f}", output_video]
+    )
+    write_frames(process, image, offsets, height, CaptionTrack(words, size, fps) if words else None)
+    return output_video
+
+def render_segmented(image, audio_file, output_video, duration, offsets, size, fps, audio_codec,
+                     profile, segments, words=None):
+    """
+    Encode contiguous frame ranges with parallel ffmpeg processes and join them without re-encoding.
+
+    The segments are fed from threads of the calling process, which share the
+    decoded screenshot: the encoding happens in the ffmpeg subprocesses, so a
+    render worker adds ``segments`` encoders rather than a pool of Python
+    processes of its own. Every segment starts on a keyframe, so the concat
+    demuxer can copy the video streams back to back; only the narration is
+    encoded, once, while muxing.
+    """
+    segment_profile = profile.with_resources(threads=profile.threads, segments=1)
+    bounds = np.linspace(0, len(offsets), segments + 1).astype(np.int64)
+    segment_files = [f"{output_video}.seg{n}.mp4" for n in range(segments)]
+    list_file = f"{output_video}.segments.txt"
+    try:
+        with ThreadPoolExecutor(max_workers=segments) as executor:
+            list(executor.map(render_segment, [image] * segments, [size] * segments, [fps] * segments,
+                              [offsets[bounds[n]:bounds[n + 1]] for n in range(segments)],
+                              segment_files, [segment_profile] * segments, [words] * segments,
+                              bounds[:-1].tolist()))
+
+        write_concat_list(segment_files, list_file)
+        run_ffmpeg([
+            "-f", "concat", "-safe", "0", "-i", list_file,
+            "-i", audio_file,
+            "-map", "0:v:0", "-map", "1:a:0",
+            "-c:v", "copy",
+        ] + _audio_args(audio_codec) + [
+            "-t", f"{duration:.3f}",
+            output_video,
+        ])
+    finally:
+        for path in segment_files + [list_file]:
+            if os.path.exists(path):
+                os.remove(path)
+    return output_video
@@ -0,0 +1,108 @@
+import os
+import shutil
+import threading
+import time
+from cache import DiskCache, hash_key
+from captions import caption_style_key
+from sqlite_util import connect
+
+# Finished video segments, kept across runs so repositories that stay on trending are not rendered again
+SEGMENT_CACHE_DIR = os.path.join(".cache", "segments")
+SEGMENT_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+# Trending positions older than this are dropped from the history
+HISTORY_DAYS = 90
+
+_store = None
+_store_lock = threading.Lock()
+
+class SegmentStore:
+    """
+    Persistent store of rendered per-repository video segments.
+
+    Segments are DiskCache entries keyed on the repository, the content hash
+    of its README text, the narration script, the voice, the encoder profile
+    and the caption style, so a segment is reused for as long as none of
+    them change, and the least recently used ones are evicted once the store
+    grows past ``max_bytes``. The screenshot is deliberately not part of the
+    key: relative times on the page ("2 days ago") change its pixels every
+    day, so a reused segment may show an older capture of an unchanged
+    README. Next to it, an SQLite table records where each repository stood
+    on the trending pages day by day.
+    """
+
+    def __init__(self, root=SEGMENT_CACHE_DIR, max_bytes=SEGMENT_CACHE_MAX_BYTES):
+        self.root = root
+        self.cache = DiskCache(root, max_bytes)
+        self.history_file = os.path.join(root, "history.sqlite")
+        with connect(self.history_file) as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS positions (
+                repo TEXT, language TEXT, since TEXT, day TEXT, rank INTEGER,
+                PRIMARY KEY (repo, language, since, day))""")
+
+    @staticmethod
+    def segment_key(repo_name, readme_digest, script, profile, voice=None):
+        """Key of one rendered segment; ``readme_digest`` hashes the README text (None without one),
+        ``profile`` is the EncoderProfile name."""
+        return hash_key("segment", repo_name, readme_digest, script, profile, voice, caption_style_key())
+
+    def restore(self, key, output_path):
+        """
+        Copy a stored segment to ``output_path``.
+
+        Returns:
+            float: The segment duration, or None if it is not stored
+        """
+        meta = self.cache.get(key)
+        if meta is None:
+            return None
+        shutil.copyfile(self.cache.path(key, "video"), output_path)
+        return meta["duration"]
+
+    def save(self, key, video_path, duration, repo_name=None):
+        """Store a finished segment, evicting old ones if the store is over its size limit."""
+        self.cache.put(key, {"video": video_path}, {"duration": duration, "repo": repo_name})
+
+    def record_positions(self, repos, language, since, day=None):
+        """Record the rank of every repository on one trending page for ``day`` (default today)."""
+        day = day or time.strftime("%Y-%m-%d")
+        cutoff = time.strftime("%Y-%m-%d", time.localtime(time.time() - HISTORY_DAYS * 86400))
+        with connect(self.history_file) as db:
+            db.executemany("INSERT OR REPLACE INTO positions VALUES (?, ?, ?, ?, ?)",
+                           [(repo["name"], language, since, day, rank) for rank, repo in enumerate(repos, 1)])
+            db.execute("DELETE FROM positions WHERE day < ?", (cutoff,))
+
+    def history(self, repo_name, language=None, since=None):
+        """
+        Trending positions of a repository, oldest first.
+
+        Returns:
+            List[Tuple[str, str, str, int]]: (day, language, since, rank) rows
+        """
+        query = "SELECT day, language, since, rank FROM positions WHERE repo = ?"
+        params = [repo_name]
+        if language is not None:
+            query += " AND language = ?"
+            params.append(language)
+        if since is not None:
+            query += " AND since = ?"
+            params.append(since)
+        with connect(self.history_file) as db:
+            return db.execute(query + " ORDER BY day", params).fetchall()
+
+    def previous_rank(self, repo_name, language, since, before=None):
+        """Rank on the last day before ``before`` (default today) the repository was on this page, or None."""
+        before = before or time.strftime("%Y-%m-%d")
+        with connect(self.history_file) as db:
+            row = db.execute("""SELECT rank FROM positions WHERE repo = ? AND language = ? AND since = ?
+                                AND day < ? ORDER BY day DESC LIMIT 1""",
+                             (repo_name, language, since, before)).fetchone()
+        return row[0] if row else None
+
+def get_segment_store():
+    """Return the shared SegmentStore, creating it on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SegmentStore()
+        return _store
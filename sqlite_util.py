@@ -0,0 +1,27 @@
+import sqlite3
+from contextlib import contextmanager
+
+# Seconds a connection waits for another process to release its write lock
+BUSY_TIMEOUT = 30
+
+@contextmanager
+def connect(path, autocommit=False):
+    """
+    SQLite connection for one with-block, always closed at the end of it.
+
+    By default the block is one transaction, committed on success and rolled
+    back on error. With ``autocommit`` every statement commits on its own and
+    the caller opens longer transactions itself (``BEGIN IMMEDIATE``).
+    """
+    if autocommit:
+        db = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+    else:
+        db = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+    try:
+        if autocommit:
+            yield db
+        else:
+            with db:
+                yield db
+    finally:
+        db.close()
@@ -0,0 +1,137 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from cache import DiskCache, hash_key
+from lazy import lazy_import
+
+nltk = lazy_import("nltk")
+PlaintextParser = lazy_import("sumy.parsers.plaintext", "PlaintextParser")
+Tokenizer = lazy_import("sumy.nlp.tokenizers", "Tokenizer")
+LsaSummarizer = lazy_import("sumy.summarizers.lsa", "LsaSummarizer")
+Stemmer = lazy_import("sumy.nlp.stemmers", "Stemmer")
+get_stop_words = lazy_import("sumy.utils", "get_stop_words")
+
+# Summaries are memoized on disk by a hash of the README content
+SUMMARY_CACHE_DIR = os.path.join(".cache", "summaries")
+SUMMARY_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+# Below this many uncached texts a process pool costs more than it saves
+MIN_PARALLEL_TEXTS = 4
+
+# NLTK packages the tokenizer needs, with the path nltk.data.find() looks for
+NLTK_RESOURCES = {
+    "punkt": "tokenizers/punkt",
+    "punkt_tab": "tokenizers/punkt_tab",
+    "stopwords": "corpora/stopwords",
+}
+
+_nltk_checked = False
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+def ensure_nltk_data():
+    """Download NLTK data only if it is missing locally; checked once per process."""
+    global _nltk_checked
+    if _nltk_checked:
+        return
+    for package, resource in NLTK_RESOURCES.items():
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            print(f"Downloading NLTK resource {package}...")
+            nltk.download(package, quiet=True)
+    _nltk_checked = True
+
+class SummarizerEngine:
+    """
+    LSA summarizer whose tokenizer, stemmer and stop words are loaded once.
+
+    Results are memoized in memory and in an on-disk cache keyed on the text,
+    language and sentence count, so a README that stays on trending is only
+    summarized the first time it is seen.
+    """
+
+    def __init__(self, language="english", cache_dir=SUMMARY_CACHE_DIR):
+        ensure_nltk_data()
+        self.language = language
+        self.tokenizer = Tokenizer(language)
+        self.summarizer = LsaSummarizer(Stemmer(language))
+        self.summarizer.stop_words = get_stop_words(language)
+        self.cache = DiskCache(cache_dir, SUMMARY_CACHE_MAX_BYTES) if cache_dir else None
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    def _key(self, text, sentences_count):
+        return hash_key("lsa", self.language, sentences_count, text)
+
+    def _lookup(self, key):
+        if key in self._memo:
+            return self._memo[key]
+        if self.cache is not None:
+            meta = self.cache.get(key)
+            if meta is not None:
+                self._memo[key] = meta["summary"]
+                return meta["summary"]
+        return None
+
+    def _remember(self, key, summary):
+        self._memo[key] = summary
+        if self.cache is not None:
+            self.cache.put(key, {}, {"summary": summary})
+
+    def _compute(self, text, sentences_count):
+        parser = PlaintextParser.from_string(text, self.tokenizer)
+        with self._lock:
+            sentences = self.summarizer(parser.document, sentences_count)
+        return " ".join(str(sentence) for sentence in sentences)
+
+    def summarize(self, text, sentences_count=2):
+        """Summarize one text, served from the memo when seen before."""
+        key = self._key(text, sentences_count)
+        summary = self._lookup(key)
+        if summary is None:
+            summary = self._compute(text, sentences_count)
+            self._remember(key, summary)
+        return summary
+
+    def summarize_many(self, texts, sentences_count=2, workers=None):
+        """
+        Summarize a batch of texts, fanning uncached ones out across processes.
+
+        Returns:
+            List[str]: Summaries in the order of texts
+        """
+        keys = [self._key(text, sentences_count) for text in texts]
+        summaries = [self._lookup(key) for key in keys]
+        missing = [i for i, summary in enumerate(summaries) if summary is None]
+
+        if len(missing) >= MIN_PARALLEL_TEXTS and workers != 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(self.language,)) as executor:
+                computed = list(executor.map(_summarize_in_worker, [texts[i] for i in missing],
+                                             [sentences_count] * len(missing)))
+        else:
+            computed = [self._compute(texts[i], sentences_count) for i in missing]
+
+        for i, summary in zip(missing, computed):
+            summaries[i] = summary
+            self._remember(keys[i], summary)
+        return summaries
+
+def get_summarizer(language="english"):
+    """Return the process-wide SummarizerEngine for a language, loading it on first use."""
+    with _engines_lock:
+        if language not in _engines:
+            _engines[language] = SummarizerEngine(language)
+        return _engines[language]
+
+_worker_engine = None
+
+def _init_worker(language):
+    global _worker_engine
+    # Workers only compute; the parent process owns the caches
+    _worker_engine = SummarizerEngine(language, cache_dir=None)
+
+def _summarize_in_worker(text, sentences_count):
+    return _worker_engine._compute(text, sentences_count)
@@ -0,0 +1,263 @@
+import json
+import os
+import socket
+import time
+from abc import ABC, abstractmethod
+from run_state import RUNS_DIR
+from sqlite_util import connect
+
+# Default queue shared by the coordinator and the workers of a render farm
+TASK_QUEUE_FILE = os.path.join(RUNS_DIR, "tasks.sqlite")
+
+# A leased task goes back to the queue when its worker has not renewed the lease for this long
+LEASE_SECONDS = 120
+
+# Deliveries of one task before it is marked failed
+MAX_ATTEMPTS = 3
+
+TASK_COLUMNS = ("id", "stage", "payload", "status", "created", "attempts", "max_attempts", "lease_owner",
+                "lease_expires", "result", "error", "finished")
+
+class TaskQueue(ABC):
+    """
+    Queue of farm tasks, each belonging to a pipeline stage.
+
+    A worker ``lease``s a task for a limited time and keeps it by calling
+    ``heartbeat`` before the lease runs out. If the worker dies, the lease
+    expires and the task is delivered again, up to ``max_attempts`` times.
+    Only the current lease holder can ``complete`` or ``fail`` a task, so a
+    worker that lost its lease cannot overwrite the result of the next one.
+    ``set_limit`` caps how many tasks of a stage are leased across all
+    workers at once, and ``cancel`` withdraws tasks nobody needs any more.
+
+    Subclasses implement the storage; SQLiteTaskQueue keeps everything in one
+    SQLite file, which is enough for tests and for workers on one machine.
+    SQLite locking is not reliable on network file systems, so several hosts
+    need a server-backed subclass.
+    """
+
+    @abstractmethod
+    def submit(self, stage, payload, max_attempts=MAX_ATTEMPTS):
+        """Queue a task and return its id."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def lease(self, worker_id, stages, lease_seconds=LEASE_SECONDS):
+        """Lease the oldest available task of the first of ``stages`` that has one; None if there is none."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def heartbeat(self, worker_id, task_ids=(), lease_seconds=LEASE_SECONDS):
+        """Mark the worker alive and extend its leases; returns the ids it still holds."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def complete(self, task_id, worker_id, result=None):
+        """Store a task's result; returns False if the worker no longer held the lease."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def fail(self, task_id, worker_id, error):
+        """Give a task back for another attempt, or mark it failed once it has used them all."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def statuses(self, task_ids):
+        """Current state of several tasks, as {id: task dict}."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def register_worker(self, worker_id, stages, host=None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def workers(self, alive_within=LEASE_SECONDS):
+        """Workers that sent a heartbeat in the last ``alive_within`` seconds."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_limit(self, stage, max_leased):
+        """Cap the tasks of ``stage`` leased at once across the farm (None removes the cap)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def cancel(self, task_ids):
+        """Cancel the tasks that are still queued or leased; returns how many were cancelled."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def counts(self):
+        """Number of tasks per (stage, status)."""
+        raise NotImplementedError
+
+class SQLiteTaskQueue(TaskQueue):
+    """TaskQueue stored in one SQLite file; every state change is a single write transaction."""
+
+    def __init__(self, path=TASK_QUEUE_FILE):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with connect(self.path, autocommit=True) as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, stage TEXT, payload TEXT, status TEXT, created REAL,
+                attempts INTEGER DEFAULT 0, max_attempts INTEGER, lease_owner TEXT, lease_expires REAL,
+                result TEXT, error TEXT, finished REAL)""")
+            db.execute("CREATE INDEX IF NOT EXISTS tasks_stage ON tasks (stage, status, id)")
+            db.execute("""CREATE TABLE IF NOT EXISTS workers (
+                id TEXT PRIMARY KEY, host TEXT, stages TEXT, started REAL, last_seen REAL)""")
+            db.execute("CREATE TABLE IF NOT EXISTS limits (stage TEXT PRIMARY KEY, max_leased INTEGER)")
+
+    def _write(self, fn):
+        """Run fn(db) inside one IMMEDIATE transaction and return its result."""
+        with connect(self.path, autocommit=True) as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(db)
+                db.execute("COMMIT")
+                return result
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _task(row):
+        task = dict(zip(TASK_COLUMNS, row))
+        task["payload"] = json.loads(task["payload"])
+        task["result"] = json.loads(task["result"]) if task["result"] else None
+        return task
+
+    def submit(self, stage, payload, max_attempts=MAX_ATTEMPTS):
+        def insert(db):
+            return db.execute("""INSERT INTO tasks (stage, payload, status, created, max_attempts)
+                                 VALUES (?, ?, 'queued', ?, ?)""",
+                              (stage, json.dumps(payload), time.time(), max_attempts)).lastrowid
+        return self._write(insert)
+
+    @staticmethod
+    def _expire_leases(db, now):
+        # Tasks of workers that stopped renewing are delivered again, or fail once out of attempts
+        db.execute("""UPDATE tasks SET status = 'failed', finished = ?, lease_owner = NULL,
+                      error = 'Lease expired on the last attempt'
+                      WHERE status = 'leased' AND lease_expires < ? AND attempts >= max_attempts""", (now, now))
+        db.execute("""UPDATE tasks SET status = 'queued', lease_owner = NULL
+                      WHERE status = 'leased' AND lease_expires < ?""", (now,))
+
+    def lease(self, worker_id, stages, lease_seconds=LEASE_SECONDS):
+        def take(db):
+            now = time.time()
+            self._expire_leases(db, now)
+            limits = dict(db.execute("SELECT stage, max_leased FROM limits"))
+            for stage in stages:
+                if stage in limits:
+                    (leased,) = db.execute("SELECT COUNT(*) FROM tasks WHERE stage = ? AND status = 'leased'",
+                                           (stage,)).fetchone()
+                    if leased >= limits[stage]:
+                        continue
+                row = db.execute(f"""SELECT {', '.join(TASK_COLUMNS)} FROM tasks
+                                     WHERE stage = ? AND status = 'queued' ORDER BY id LIMIT 1""",
+                                 (stage,)).fetchone()
+                if row is None:
+                    continue
+                task = self._task(row)
+                task.update(status="leased", lease_owner=worker_id, lease_expires=now + lease_seconds,
+                            attempts=task["attempts"] + 1)
+                db.execute("""UPDATE tasks SET status = 'leased', lease_owner = ?, lease_expires = ?,
+                              attempts = ? WHERE id = ?""",
+                           (worker_id, task["lease_expires"], task["attempts"], task["id"]))
+                return task
+            return None
+        return self._write(take)
+
+    def heartbeat(self, worker_id, task_ids=(), lease_seconds=LEASE_SECONDS):
+        task_ids = list(task_ids)
+
+        def renew(db):
+            now = time.time()
+            db.execute("UPDATE workers SET last_seen = ? WHERE id = ?", (now, worker_id))
+            if not task_ids:
+                return []
+            marks = ", ".join("?" * len(task_ids))
+            db.execute(f"""UPDATE tasks SET lease_expires = ? WHERE id IN ({marks})
+                           AND lease_owner = ? AND status = 'leased'""", [now + lease_seconds, *task_ids, worker_id])
+            return [task_id for (task_id,) in db.execute(
+                f"SELECT id FROM tasks WHERE id IN ({marks}) AND lease_owner = ? AND status = 'leased'",
+                [*task_ids, worker_id])]
+        return self._write(renew)
+
+    def complete(self, task_id, worker_id, result=None):
+        def finish(db):
+            return db.execute("""UPDATE tasks SET status = 'done', finished = ?, result = ?, error = NULL,
+                                 lease_owner = NULL WHERE id = ? AND lease_owner = ? AND status = 'leased'""",
+                              (time.time(), json.dumps(result), task_id, worker_id)).rowcount == 1
+        return self._write(finish)
+
+    def fail(self, task_id, worker_id, error):
+        message = f"{type(error).__name__}: {error}" if isinstance(error, BaseException) else str(error)
+
+        def give_back(db):
+            return db.execute("""UPDATE tasks SET
+                                     status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+                                     finished = CASE WHEN attempts >= max_attempts THEN ? ELSE NULL END,
+                                     error = ?, lease_owner = NULL
+                                 WHERE id = ? AND lease_owner = ? AND status = 'leased'""",
+                              (time.time(), message, task_id, worker_id)).rowcount == 1
+        return self._write(give_back)
+
+    def statuses(self, task_ids):
+        task_ids = list(task_ids)
+        if not task_ids:
+            return {}
+        marks = ", ".join("?" * len(task_ids))
+        with connect(self.path, autocommit=True) as db:
+            rows = db.execute(f"SELECT {', '.join(TASK_COLUMNS)} FROM tasks WHERE id IN ({marks})", task_ids).fetchall()
+        return {row[0]: self._task(row) for row in rows}
+
+    def register_worker(self, worker_id, stages, host=None):
+        now = time.time()
+        self._write(lambda db: db.execute("INSERT OR REPLACE INTO workers VALUES (?, ?, ?, ?, ?)",
+                                          (worker_id, host or socket.gethostname(), json.dumps(list(stages)),
+                                           now, now)))
+
+    def workers(self, alive_within=LEASE_SECONDS):
+        with connect(self.path, autocommit=True) as db:
+            rows = db.execute("SELECT id, host, stages, started, last_seen FROM workers WHERE last_seen >= ?",
+                              (time.time() - alive_within,)).fetchall()
+        return [{"id": row[0], "host": row[1], "stages": json.loads(row[2]), "started": row[3], "last_seen": row[4]}
+                for row in rows]
+
+    def set_limit(self, stage, max_leased):
+        if max_leased is None:
+            self._write(lambda db: db.execute("DELETE FROM limits WHERE stage = ?", (stage,)))
+        else:
+            self._write(lambda db: db.execute("INSERT OR REPLACE INTO limits VALUES (?, ?)", (stage, max_leased)))
+
+    def cancel(self, task_ids):
+        task_ids = list(task_ids)
+        if not task_ids:
+            return 0
+        marks = ", ".join("?" * len(task_ids))
+        # A worker still running a cancelled task loses its lease, so its result is dropped
+        return self._write(lambda db: db.execute(
+            f"""UPDATE tasks SET status = 'cancelled', finished = ?, lease_owner = NULL
+                WHERE id IN ({marks}) AND status IN ('queued', 'leased')""", [time.time(), *task_ids]).rowcount)
+
+    def counts(self):
+        with connect(self.path, autocommit=True) as db:
+            return {(stage, status): count for stage, status, count in
+                    db.execute("SELECT stage, status, COUNT(*) FROM tasks GROUP BY stage, status")}
+
+def open_task_queue(location=TASK_QUEUE_FILE):
+    """
+    Open a TaskQueue from a location string.
+
+    ``sqlite:///path/to/tasks.sqlite`` or a plain file path opens a
+    SQLiteTaskQueue; other backends register their scheme in QUEUE_BACKENDS.
+    """
+    scheme, sep, rest = location.partition("://")
+    if not sep:
+        return SQLiteTaskQueue(location)
+    if scheme not in QUEUE_BACKENDS:
+        raise ValueError(f"Unknown task queue backend {scheme!r}; choose from {', '.join(QUEUE_BACKENDS)}")
+    # sqlite:///abs/path keeps its leading slash, sqlite://rel/path is relative
+    return QUEUE_BACKENDS[scheme](rest)
+
+QUEUE_BACKENDS = {"sqlite": SQLiteTaskQueue}
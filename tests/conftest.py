@@ -0,0 +1,30 @@
+import os
+import sys
+import pytest
+
+# The modules live at the top of the repository rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def segment_store(tmp_path):
+    """Empty SegmentStore under the test's temporary directory."""
+    from segment_store import SegmentStore
+    return SegmentStore(root=str(tmp_path / "segments"), max_bytes=1 << 20)
+
+@pytest.fixture
+def job_queue(tmp_path):
+    """Empty JobQueue in a file of its own."""
+    from job_queue import JobQueue
+    return JobQueue(str(tmp_path / "jobs.sqlite"))
+
+@pytest.fixture
+def task_queue(tmp_path):
+    """Empty SQLiteTaskQueue in a file of its own."""
+    from task_queue import SQLiteTaskQueue
+    return SQLiteTaskQueue(str(tmp_path / "tasks.sqlite"))
+
+@pytest.fixture
+def artifact_store(tmp_path):
+    """Empty ArtifactStore under the test's temporary directory."""
+    from artifact_store import ArtifactStore
+    return ArtifactStore(str(tmp_path / "artifacts"))
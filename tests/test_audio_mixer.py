@@ -0,0 +1,63 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from audio_mixer import fade_gain, mix_stream
+
+RATE = 1000
+
+class ArrayStream:
+    """Stands in for AudioStream, reading from an array instead of ffmpeg."""
+
+    def __init__(self, samples):
+        self.samples = np.asarray(samples, dtype=np.float32).reshape(-1, 1)
+        self.channels = 1
+        self.position = 0
+
+    def read(self, count):
+        block = self.samples[self.position:self.position + count]
+        self.position += len(block)
+        return block
+
+def mix(narration, music, **kwargs):
+    kwargs = {"fade": 0, "window": 0.01, "smoothing": 0.1, **kwargs}
+    blocks = mix_stream(ArrayStream(narration), ArrayStream(music), len(narration), RATE, **kwargs)
+    return np.concatenate(list(blocks))[:, 0]
+
+def test_fade_gain_ramps_in_and_out():
+    gain = fade_gain(np.arange(0, 10000, 1000, dtype=np.float64), 10000, RATE, fade_in=2, fade_out=2)
+    np.testing.assert_allclose(gain, [0, 0.5, 1, 1, 1, 1, 1, 1, 1, 0.5])
+
+def test_music_ducks_under_speech_and_recovers_after():
+    # One second of silence, one of speech, one of silence
+    narration = np.zeros(3 * RATE)
+    narration[RATE:2 * RATE] = 0.5
+    music = np.ones(3 * RATE)
+    mixed = mix(narration, music, speech_gain=0.2, gap_gain=0.6)
+
+    np.testing.assert_allclose(mixed[200:800], 0.6, rtol=1e-5)
+    np.testing.assert_allclose(mixed[1200:1800], 0.5 + 0.2, rtol=1e-5)
+    np.testing.assert_allclose(mixed[2200:2800], 0.6, rtol=1e-5)
+    # The dip starts before the first spoken frame
+    assert mixed[RATE - 20] < 0.6
+
+def test_output_does_not_depend_on_the_block_size():
+    rng = np.random.default_rng(1)
+    narration = np.where(rng.random(4321) > 0.5, 0.3, 0.0) * np.repeat(rng.random(44) > 0.5, 100)[:4321]
+    music = rng.uniform(-0.5, 0.5, 4321)
+    whole = mix(narration, music, block=1 << 16, fade=1)
+    for block in (10, 70, 1000):
+        np.testing.assert_allclose(mix(narration, music, block=block, fade=1), whole, rtol=1e-6, atol=1e-7)
+
+def test_fade_and_clipping():
+    narration = np.full(4 * RATE, 0.95)
+    music = np.ones(4 * RATE)
+    mixed = mix(narration, music, fade=1, speech_gain=0.5)
+    assert mixed[0] == pytest.approx(0.95)
+    assert mixed.max() == 1.0
+    assert mixed[-1] == pytest.approx(0.95, abs=1e-3)
+
+def test_silent_narration_keeps_the_music_at_its_gap_level():
+    mixed = mix(np.zeros(500), np.ones(500), gap_gain=0.4)
+    assert len(mixed) == 500
+    np.testing.assert_allclose(mixed, 0.4, rtol=1e-5)
@@ -0,0 +1,49 @@
+from browser_pool import BrowserPool
+
+class FakeDriver:
+    started = 0
+
+    def __init__(self):
+        FakeDriver.started += 1
+        self.dead = False
+        self.quit_called = False
+
+    @property
+    def current_url(self):
+        if self.dead:
+            raise ConnectionError("browser is gone")
+        return "about:blank"
+
+    def quit(self):
+        self.quit_called = True
+
+def make_pool(size=2, max_uses=50):
+    pool = BrowserPool(size=size, driver_path="chromedriver", max_uses=max_uses)
+    pool._start_driver = FakeDriver
+    return pool.start()
+
+def test_dead_driver_is_replaced_on_acquire():
+    pool = make_pool(size=1)
+    with pool.acquire() as driver:
+        driver.dead = True
+    with pool.acquire() as replacement:
+        assert replacement is not driver and not replacement.dead
+    assert driver.quit_called
+    assert pool._drivers == [replacement]
+
+def test_driver_is_recycled_after_max_uses():
+    pool = make_pool(size=1, max_uses=2)
+    seen = [pool.map(lambda driver, item: driver, [item])[0] for item in range(5)]
+    assert [len({id(driver) for driver in seen[i:i + 2]}) for i in (0, 2)] == [1, 1]
+    assert len({id(driver) for driver in seen}) == 3
+
+def test_map_keeps_every_driver_in_the_pool():
+    pool = make_pool(size=3, max_uses=2)
+    assert pool.map(lambda driver, item: item * 2, range(30)) == [item * 2 for item in range(30)]
+    assert len(pool._drivers) == 3 and pool._idle.qsize() == 3
+
+def test_driver_returned_after_close_is_not_pooled_again():
+    pool = make_pool(size=1)
+    with pool.acquire():
+        pool.close()
+    assert pool._drivers == [] and pool._idle.qsize() == 0
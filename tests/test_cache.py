@@ -0,0 +1,60 @@
+import os
+from cache import DiskCache, file_digest, hash_key
+
+def test_hash_key_is_stable_and_order_sensitive():
+    assert hash_key("voice", {"b": 1, "a": 2}) == hash_key("voice", {"a": 2, "b": 1})
+    assert hash_key("a", "b") != hash_key("b", "a")
+
+def test_file_digest_reads_in_chunks(tmp_path):
+    path = tmp_path / "data"
+    path.write_bytes(b"x" * 1000)
+    assert file_digest(str(path), chunk_size=7) == file_digest(str(path))
+
+def test_put_and_get(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    source = tmp_path / "voice.mp3"
+    source.write_bytes(b"audio")
+    meta = cache.put("ab12", {"audio": str(source), "words.json": b"[]"}, {"duration": 1.5})
+    assert meta["files"] == {"audio": 5, "words.json": 2}
+    assert cache.get("ab12")["duration"] == 1.5
+    with open(cache.path("ab12", "audio"), "rb") as f:
+        assert f.read() == b"audio"
+    assert os.listdir(tmp_path / "tmp") == []
+
+def test_missing_key_or_file_is_a_miss(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    assert cache.get("cd34") is None
+    cache.put("cd34", {"audio": b"audio"})
+    os.remove(cache.path("cd34", "audio"))
+    assert cache.get("cd34") is None
+
+def test_first_writer_wins(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    cache.put("ef56", {"audio": b"first"})
+    cache.put("ef56", {"audio": b"second"})
+    with open(cache.path("ef56", "audio"), "rb") as f:
+        assert f.read() == b"first"
+
+def test_incomplete_entry_is_replaced(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    # What a crash between creating the entry directory and writing meta.json leaves behind
+    os.makedirs(os.path.dirname(cache.path("0a0b", "audio")))
+    with open(cache.path("0a0b", "audio"), "wb") as f:
+        f.write(b"partial")
+    assert cache.get("0a0b") is None
+    cache.put("0a0b", {"audio": b"complete"})
+    assert cache.get("0a0b") is not None
+    with open(cache.path("0a0b", "audio"), "rb") as f:
+        assert f.read() == b"complete"
+    assert os.listdir(tmp_path / "tmp") == []
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=10 ** 9)
+    for n, key in enumerate(("aa01", "bb02", "cc03")):
+        cache.put(key, {"blob": b"x" * 1000})
+        os.utime(cache.path(key, DiskCache.META_FILE), (1000 + n, 1000 + n))
+    cache.get("aa01")
+    entry_size = dict((key, size) for key, _, size in cache.entries())["aa01"]
+    cache.max_bytes = 2 * entry_size
+    cache.evict()
+    assert sorted(key for key, _, _ in cache.entries()) == ["aa01", "cc03"]
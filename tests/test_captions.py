@@ -0,0 +1,60 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("PIL")
+
+from captions import CAPTION_HOLD, CAPTION_MAX_WORDS, CaptionTrack, load_word_timings, save_word_timings
+
+FPS = 10
+
+def words(*spans):
+    """Word dicts from (start, end) pairs, named w0, w1, ..."""
+    return [{"start": start, "end": end, "text": f"w{n}"} for n, (start, end) in enumerate(spans)]
+
+def steady(count, start=0.0):
+    return words(*[(start + 0.3 * n, start + 0.3 * n + 0.25) for n in range(count)])
+
+def test_word_timings_sidecar_round_trip(tmp_path):
+    audio = str(tmp_path / "voice.mp3")
+    assert save_word_timings(steady(2), audio).endswith("voice.words.json")
+    assert load_word_timings(audio) == steady(2)
+    save_word_timings([], audio)
+    assert load_word_timings(audio) is None
+
+def test_lines_split_at_pauses_and_word_limit():
+    track = CaptionTrack(steady(CAPTION_MAX_WORDS + 2) + steady(2, start=10), (1920, 1080), FPS)
+    assert track.lines == [(0, CAPTION_MAX_WORDS), (CAPTION_MAX_WORDS, CAPTION_MAX_WORDS + 2),
+                           (CAPTION_MAX_WORDS + 2, CAPTION_MAX_WORDS + 4)]
+
+def test_lines_split_when_too_wide():
+    long_words = [{"start": 0.3 * n, "end": 0.3 * n + 0.25, "text": "W" * 30} for n in range(3)]
+    track = CaptionTrack(long_words, (320, 180), FPS)
+    assert track.lines == [(0, 1), (1, 2), (2, 3)]
+
+def test_state_follows_the_spoken_word():
+    track = CaptionTrack(words((1.0, 1.4), (1.5, 2.0), (5.0, 5.5)), (640, 360), FPS)
+    assert track.state(5) is None
+    assert track.state(10) == (0, 0)
+    assert track.state(15) == (0, 1)
+    # The line stays up CAPTION_HOLD seconds after its last word, then clears until the next line
+    assert track.state(int((2.0 + CAPTION_HOLD) * FPS) - 1) == (0, 1)
+    assert track.state(int((2.0 + CAPTION_HOLD) * FPS) + 1) is None
+    assert track.state(50) == (1, 2)
+
+def test_blank_words_are_dropped():
+    track = CaptionTrack([{"start": 0, "end": 0.2, "text": " "}], (640, 360), FPS)
+    assert track.lines == [] and track.state(0) is None
+
+def test_band_blends_only_the_caption_box():
+    track = CaptionTrack(words((0.0, 0.5), (0.5, 1.0)), (640, 360), FPS)
+    frame = np.full((360, 640, 3), 200, dtype=np.uint8)
+    assert track.band(frame, 30) is None
+
+    band = track.band(frame, 2)
+    assert band.shape == (track.bottom - track.top, 640, 3)
+    assert (frame == 200).all(), "the source frame must not be modified"
+    left, keep, _ = track._blend
+    assert (band[:, :left] == 200).all() and (band[:, left + keep.shape[1]:] == 200).all()
+    box = band[:, left:left + keep.shape[1]]
+    assert box.min() < 200, "the box is darker than the page behind it"
+    assert box.max() > 200, "the text is brighter than the box"
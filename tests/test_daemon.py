@@ -0,0 +1,25 @@
+import pytest
+from daemon import job_variant, parse_publish_at, parse_run_at
+from job_queue import UPLOAD_NONE, UPLOAD_YOUTUBE
+from utils import DEFAULT_TOP_N
+
+def test_run_at_accepts_epoch_seconds_and_aware_iso_times():
+    assert parse_run_at(None) is None
+    assert parse_run_at(1700000000) == 1700000000.0
+    assert parse_run_at("2024-01-01T05:30:00+05:30") == 1704067200.0
+
+@pytest.mark.parametrize("value", ["tomorrow", "2024-01-01T00:00:00", True, [1], {"at": 1}])
+def test_run_at_rejects_anything_else(value):
+    with pytest.raises(ValueError):
+        parse_run_at(value)
+
+def test_publish_at_needs_a_utc_offset():
+    assert parse_publish_at("2024-01-01T18:00:00+05:30") == "2024-01-01T18:00:00+05:30"
+    for value in ("2024-01-01T18:00:00", "6 PM", 1700000000):
+        with pytest.raises(ValueError):
+            parse_publish_at(value)
+
+def test_only_non_default_jobs_get_a_variant():
+    assert job_variant(DEFAULT_TOP_N, UPLOAD_YOUTUBE) is None
+    assert job_variant(DEFAULT_TOP_N + 2, UPLOAD_NONE) == f"top{DEFAULT_TOP_N + 2}-local"
+    assert job_variant(DEFAULT_TOP_N, "http://a") != job_variant(DEFAULT_TOP_N, "http://b")
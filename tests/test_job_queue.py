@@ -0,0 +1,41 @@
+import time
+from job_queue import JobQueue, UPLOAD_NONE, UPLOAD_YOUTUBE
+
+def test_claim_takes_oldest_due_job_once(job_queue):
+    first = job_queue.submit("python", "daily", 3)
+    second = job_queue.submit("rust", "weekly", 5, UPLOAD_NONE)
+    job_queue.submit("go", "daily", 3, run_at=time.time() + 3600)
+
+    job = job_queue.claim()
+    assert (job["id"], job["status"], job["attempts"]) == (first, "running", 1)
+    assert job_queue.claim()["id"] == second
+    assert job_queue.claim() is None
+
+def test_finish_and_fail_record_the_outcome(job_queue):
+    done, failed = job_queue.submit(), job_queue.submit()
+    job_queue.claim(), job_queue.claim()
+    job_queue.finish(done, {"video_id": "abc"})
+    job_queue.fail(failed, ValueError("no repos"))
+
+    assert job_queue.get(done)["result"] == {"video_id": "abc"}
+    assert job_queue.get(failed)["error"] == "ValueError: no repos"
+    assert [job["id"] for job in job_queue.jobs("failed")] == [failed]
+
+def test_pending_compares_every_job_parameter(job_queue):
+    job_queue.submit("python", "daily", 3, UPLOAD_YOUTUBE)
+    assert job_queue.pending("python", "daily", 3, UPLOAD_YOUTUBE)
+    assert not job_queue.pending("python", "daily", 5, UPLOAD_YOUTUBE)
+    assert not job_queue.pending("python", "daily", 3, UPLOAD_NONE)
+    assert not job_queue.pending("python", "weekly", 3, UPLOAD_YOUTUBE)
+
+    job = job_queue.claim()
+    assert job_queue.pending("python", "daily", 3, UPLOAD_YOUTUBE)
+    job_queue.finish(job["id"])
+    assert not job_queue.pending("python", "daily", 3, UPLOAD_YOUTUBE)
+
+def test_requeue_running_after_a_crash(job_queue):
+    job_id = job_queue.submit()
+    job_queue.claim()
+    assert JobQueue(job_queue.path).requeue_running() == 1
+    job = job_queue.claim()
+    assert (job["id"], job["attempts"]) == (job_id, 2)
@@ -0,0 +1,70 @@
+import os
+import pytest
+
+np = pytest.importorskip("numpy")
+sf = pytest.importorskip("soundfile")
+
+import music_algo
+from music_algo import MusicIndex, block_energy, top_windows, window_rms
+
+RATE = 8000
+
+def write_tone(path, seconds, amplitude):
+    t = np.arange(int(seconds * RATE)) / RATE
+    sf.write(path, amplitude * np.sin(2 * np.pi * 440 * t), RATE)
+
+@pytest.fixture
+def library(tmp_path):
+    music_dir = tmp_path / "music"
+    music_dir.mkdir()
+    write_tone(str(music_dir / "a.wav"), 2, 0.5)
+    write_tone(str(music_dir / "b.wav"), 3, 0.1)
+    (music_dir / "notes.txt").write_text("not a track")
+    return str(music_dir), str(tmp_path / "index.sqlite")
+
+def test_tracks_lists_only_audio_files(library):
+    music_dir, index_file = library
+    index = MusicIndex(music_dir, index_file)
+    assert index.tracks() == [os.path.join(music_dir, "a.wav"), os.path.join(music_dir, "b.wav")]
+
+def test_removed_tracks_leave_the_index(library):
+    music_dir, index_file = library
+    index = MusicIndex(music_dir, index_file)
+    index.tracks()
+    os.remove(os.path.join(music_dir, "b.wav"))
+    os.utime(music_dir, (0, 12345))
+    assert index.tracks() == [os.path.join(music_dir, "a.wav")]
+
+def test_envelope_is_served_from_the_index(library, monkeypatch):
+    music_dir, index_file = library
+    track = os.path.join(music_dir, "a.wav")
+    index = MusicIndex(music_dir, index_file, hop_seconds=0.1)
+    energy, hop, sr = index.envelope(track)
+    expected, expected_hop, _ = block_energy(track, 0.1)
+    assert (hop, sr) == (expected_hop, RATE)
+    np.testing.assert_allclose(energy, expected, rtol=1e-5)
+
+    def analyze(*args):
+        raise AssertionError("track analyzed again")
+    monkeypatch.setattr(music_algo, "_analyze_track", analyze)
+    cached, _, _ = MusicIndex(music_dir, index_file, hop_seconds=0.1).envelope(track)
+    np.testing.assert_array_equal(cached, energy)
+
+def test_changed_track_is_analyzed_again(library):
+    music_dir, index_file = library
+    track = os.path.join(music_dir, "a.wav")
+    index = MusicIndex(music_dir, index_file)
+    before, _, _ = index.envelope(track)
+    write_tone(track, 4, 0.5)
+    after, _, _ = index.envelope(track)
+    assert len(after) > len(before)
+
+def test_window_rms_matches_direct_computation():
+    energy = np.array([1.0, 4.0, 9.0, 16.0])
+    np.testing.assert_allclose(window_rms(energy, hop=2, window_hops=2),
+                               np.sqrt(np.array([5.0, 13.0, 25.0]) / 4))
+    assert len(window_rms(energy, hop=2, window_hops=5)) == 0
+
+def test_top_windows_keeps_picks_apart():
+    scores = np.array([0, 9, 8, 0, 0, 7, 0, 6], dtype=float)
+    assert top_windows(scores, k=3, min_gap=2) == [1, 5, 7]
@@ -0,0 +1,69 @@
+import pytest
+import main
+from run_state import RunManifest
+
+@pytest.fixture
+def manifest(tmp_path):
+    return RunManifest.for_run("2024-01-01_python_daily", runs_dir=str(tmp_path / "runs"))
+
+def test_recorded_stage_is_fresh_until_inputs_or_outputs_change(manifest, tmp_path):
+    output = tmp_path / "voice.mp3"
+    output.write_bytes(b"audio")
+    manifest.record("voice:0", {"text": "hello"}, [str(output)], 1.5)
+
+    assert manifest.is_fresh("voice:0", {"text": "hello"})
+    assert manifest.result("voice:0") == 1.5
+    assert not manifest.is_fresh("voice:0", {"text": "hello again"})
+    output.write_bytes(b"other audio")
+    assert not manifest.is_fresh("voice:0", {"text": "hello"})
+    output.unlink()
+    assert not manifest.is_fresh("voice:0", {"text": "hello"})
+    assert manifest.completed("voice:0")
+
+def test_a_new_process_resumes_from_the_saved_file(manifest):
+    manifest.record("trending", {"top": 3}, [], [{"name": "a/one"}])
+    reopened = RunManifest(manifest.path)
+    assert reopened.data["run_id"] == "2024-01-01_python_daily"
+    assert reopened.is_fresh("trending", {"top": 3})
+    assert reopened.result("trending") == [{"name": "a/one"}]
+
+def test_run_skips_fresh_stages_and_records_failures(manifest):
+    calls = []
+
+    def build():
+        calls.append(1)
+        return "video-id"
+
+    assert manifest.run("upload", {"video": "abc"}, [], build) == "video-id"
+    assert manifest.run("upload", {"video": "abc"}, [], build) == "video-id"
+    assert len(calls) == 1
+
+    def broken():
+        raise RuntimeError("render crashed")
+
+    with pytest.raises(RuntimeError):
+        manifest.run("combine", {}, [], broken)
+    entry = RunManifest(manifest.path).data["stages"]["combine"]
+    assert (entry["status"], entry["error"]) == ("failed", "render crashed")
+    assert not manifest.completed("combine")
+
+def test_resume_or_fetch_trending_fetches_only_missing_pages(tmp_path, monkeypatch):
+    runs = str(tmp_path / "runs")
+    resumed = RunManifest.for_run("python_daily", runs_dir=runs)
+    resumed.record("trending", {"top": 3}, [], [{"name": "kept/repo"}])
+    manifests = {("python", "daily"): resumed, ("rust", "daily"): RunManifest.for_run("rust_daily", runs_dir=runs),
+                 ("go", "daily"): RunManifest.for_run("go_daily", runs_dir=runs)}
+    fetched = []
+
+    def get_trending(languages, time_ranges, top):
+        fetched.append((languages, time_ranges, top))
+        return {("rust", "daily"): [{"name": "new/repo"}], ("go", "daily"): []}
+
+    monkeypatch.setattr(main, "get_trending", get_trending)
+    trending = main.resume_or_fetch_trending(manifests, 3)
+
+    assert fetched == [(["go", "rust"], ["daily"], 3)]
+    assert trending == {("python", "daily"): [{"name": "kept/repo"}], ("rust", "daily"): [{"name": "new/repo"}],
+                        ("go", "daily"): []}
+    assert manifests[("rust", "daily")].is_fresh("trending", {"top": 3})
+    assert not manifests[("go", "daily")].completed("trending")
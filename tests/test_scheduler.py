@@ -0,0 +1,51 @@
+from datetime import datetime, timezone
+import pytest
+
+pytz = pytest.importorskip("pytz")
+
+from scheduler import CronSchedule, parse_field
+
+EASTERN = pytz.timezone("US/Eastern")
+
+def eastern(*args):
+    return EASTERN.localize(datetime(*args))
+
+def test_parse_field_forms():
+    assert parse_field("*/15", 0, 59) == {0, 15, 30, 45}
+    assert parse_field("1-3,10", 0, 23) == {1, 2, 3, 10}
+    assert parse_field("5/20", 0, 59) == {5, 25, 45}
+    with pytest.raises(ValueError):
+        parse_field("61", 0, 59)
+
+def test_next_after_is_strictly_later():
+    schedule = CronSchedule("0 12 * * *", "US/Eastern")
+    assert schedule.next_after(eastern(2024, 6, 1, 11, 59)) == eastern(2024, 6, 1, 12, 0)
+    assert schedule.next_after(eastern(2024, 6, 1, 12, 0)) == eastern(2024, 6, 2, 12, 0)
+
+def test_day_or_weekday_when_both_are_restricted():
+    # The 1st of the month or any Monday
+    schedule = CronSchedule("0 9 1 * 1", "US/Eastern")
+    assert schedule.next_after(eastern(2024, 6, 1, 10, 0)) == eastern(2024, 6, 3, 9, 0)
+
+def test_wall_clock_time_is_kept_across_spring_forward():
+    schedule = CronSchedule("0 12 * * *", "US/Eastern")
+    before = schedule.next_after(eastern(2024, 3, 9, 13, 0))
+    assert before.astimezone(timezone.utc) == datetime(2024, 3, 10, 16, 0, tzinfo=timezone.utc)
+    assert before.strftime("%H:%M %Z") == "12:00 EDT"
+
+def test_skipped_local_time_still_runs_once():
+    # 02:30 does not exist on 2024-03-10 in US/Eastern; the run happens an hour later
+    schedule = CronSchedule("30 2 * * *", "US/Eastern")
+    due = schedule.next_after(eastern(2024, 3, 9, 3, 0))
+    assert due.astimezone(timezone.utc) == datetime(2024, 3, 10, 7, 30, tzinfo=timezone.utc)
+    assert schedule.next_after(due).date() == datetime(2024, 3, 11).date()
+
+def test_repeated_local_time_runs_once_on_fall_back():
+    schedule = CronSchedule("30 1 * * *", "US/Eastern")
+    due = schedule.next_after(eastern(2024, 11, 2, 12, 0))
+    assert due.date() == datetime(2024, 11, 3).date()
+    assert schedule.next_after(due) == eastern(2024, 11, 4, 1, 30)
+
+def test_impossible_schedule_is_rejected():
+    with pytest.raises(ValueError):
+        CronSchedule("0 0 30 2 *", "UTC").next_after(datetime(2024, 1, 1, tzinfo=timezone.utc))
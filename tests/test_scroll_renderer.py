@@ -0,0 +1,79 @@
+import io
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from scroll_renderer import scroll_offsets, write_frames
+
+class FakeWriter:
+    """Stands in for the ffmpeg process that open_ffmpeg_writer starts."""
+
+    def __init__(self):
+        self.stdin = Recorder()
+        self.stderr = io.BytesIO()
+        self.returncode = 0
+
+    def wait(self):
+        return self.returncode
+
+class Recorder(io.BytesIO):
+    def close(self):
+        self.data = self.getvalue()
+        super().close()
+
+def test_scroll_offsets_one_per_frame_and_monotonic():
+    offsets = scroll_offsets(image_height=2000, frame_height=1000, duration=2, fps=10, scroll_fraction=0.5)
+    assert len(offsets) == 20
+    assert offsets[0] == 0
+    assert np.all(np.diff(offsets) >= 0)
+    # Half of the 1000 scrollable rows over the whole duration
+    assert offsets[-1] == int(1.9 * 250)
+
+def test_scroll_offsets_never_past_the_bottom():
+    offsets = scroll_offsets(image_height=1200, frame_height=1000, duration=1, fps=30, scroll_fraction=5)
+    assert offsets.max() <= 200
+
+def test_scroll_offsets_for_a_short_image():
+    offsets = scroll_offsets(image_height=500, frame_height=1000, duration=1, fps=25)
+    assert len(offsets) == 25
+    assert not offsets.any()
+
+def test_write_frames_pipes_each_crop_window():
+    image = np.arange(6 * 2 * 3, dtype=np.uint8).reshape(6, 2, 3)
+    process = FakeWriter()
+    write_frames(process, image, [0, 1, 3], height=3)
+    expected = b"".join(image[offset:offset + 3].tobytes() for offset in (0, 1, 3))
+    assert process.stdin.data == expected
+
+def test_write_frames_raises_when_ffmpeg_fails():
+    image = np.zeros((4, 2, 3), dtype=np.uint8)
+    process = FakeWriter()
+    process.returncode = 1
+    with pytest.raises(Exception, match="ffmpeg failed"):
+        write_frames(process, image, [0], height=4)
+
+def test_segments_cover_the_same_frames_as_one_pass(tmp_path, monkeypatch):
+    import scroll_renderer
+    from encoder_profiles import PROFILES
+
+    image = np.random.default_rng(0).integers(0, 255, (90, 8, 3), dtype=np.uint8)
+    image_path = str(tmp_path / "shot.npy")
+    np.save(image_path, image)
+    writers = {}
+
+    def open_writer(args):
+        writers[args[-1]] = FakeWriter()
+        return writers[args[-1]]
+
+    monkeypatch.setattr(scroll_renderer, "open_ffmpeg_writer", open_writer)
+    monkeypatch.setattr(scroll_renderer, "run_ffmpeg", lambda args: None)
+    monkeypatch.setattr(scroll_renderer, "MIN_SEGMENT_SECONDS", 1)
+    profile = PROFILES["fast"].with_resources(threads=1, segments=3)
+
+    scroll_renderer.render_scroll(image_path, "voice.mp3", str(tmp_path / "whole.mp4"), 4, size=(8, 30), fps=5,
+                                  profile=PROFILES["fast"])
+    scroll_renderer.render_scroll(image_path, "voice.mp3", str(tmp_path / "split.mp4"), 4, size=(8, 30), fps=5,
+                                  profile=profile)
+    segments = [writers[f"{tmp_path / 'split.mp4'}.seg{n}.mp4"].stdin.data for n in range(3)]
+    assert all(segments)
+    assert b"".join(segments) == writers[str(tmp_path / "whole.mp4")].stdin.data
@@ -0,0 +1,40 @@
+import os
+from segment_store import SegmentStore
+
+def test_saved_segment_is_restored(segment_store, tmp_path):
+    video = tmp_path / "segment.mp4"
+    video.write_bytes(b"video bytes")
+    key = SegmentStore.segment_key("owner/repo", "readme-digest", "script", "fast", "voice")
+    segment_store.save(key, str(video), 12.5, "owner/repo")
+
+    restored = tmp_path / "restored.mp4"
+    assert segment_store.restore(key, str(restored)) == 12.5
+    assert restored.read_bytes() == b"video bytes"
+
+def test_unknown_segment_is_a_miss(segment_store, tmp_path):
+    output = tmp_path / "restored.mp4"
+    assert segment_store.restore(SegmentStore.segment_key("owner/repo", None, "script", "fast"), str(output)) is None
+    assert not os.path.exists(output)
+
+def test_key_changes_with_readme_script_profile_and_voice():
+    base = ("owner/repo", "readme", "script", "fast", "voice")
+    keys = {SegmentStore.segment_key(*base)}
+    for i, other in enumerate(("other/repo", "edited", "new script", "quality", "other voice")):
+        changed = list(base)
+        changed[i] = other
+        keys.add(SegmentStore.segment_key(*changed))
+    assert len(keys) == 6
+    assert SegmentStore.segment_key(*base) == SegmentStore.segment_key(*base)
+
+def test_previous_rank_is_the_last_earlier_day(segment_store):
+    repos = [{"name": "a/one"}, {"name": "b/two"}]
+    segment_store.record_positions(repos, "python", "daily", day="2099-01-01")
+    segment_store.record_positions(list(reversed(repos)), "python", "daily", day="2099-01-02")
+    segment_store.record_positions(repos, "rust", "daily", day="2099-01-02")
+
+    assert segment_store.previous_rank("a/one", "python", "daily", before="2099-01-03") == 2
+    assert segment_store.previous_rank("a/one", "python", "daily", before="2099-01-02") == 1
+    assert segment_store.previous_rank("a/one", "python", "daily", before="2099-01-01") is None
+    assert segment_store.previous_rank("c/three", "python", "daily", before="2099-01-03") is None
+    assert segment_store.history("a/one", language="python") == [("2099-01-01", "python", "daily", 1),
+                                                         ("2099-01-02", "python", "daily", 2)]
@@ -0,0 +1,119 @@
+import pytest
+import farm
+from task_queue import SQLiteTaskQueue, TaskQueue, open_task_queue
+
+def test_task_queue_is_abstract():
+    with pytest.raises(TypeError):
+        TaskQueue()
+
+def test_open_task_queue_locations(tmp_path):
+    assert isinstance(open_task_queue(str(tmp_path / "a.sqlite")), SQLiteTaskQueue)
+    assert open_task_queue(f"sqlite://{tmp_path / 'b.sqlite'}").path == str(tmp_path / "b.sqlite")
+    with pytest.raises(ValueError):
+        open_task_queue("redis://localhost")
+
+def test_lease_follows_stage_order_and_hands_out_each_task_once(task_queue):
+    voice = task_queue.submit("voice", {"text": "hi"})
+    render = task_queue.submit("render", {"index": 0})
+    assert task_queue.lease("w1", ["render", "voice"])["id"] == render
+    task = task_queue.lease("w2", ["render", "voice"])
+    assert (task["id"], task["payload"], task["attempts"]) == (voice, {"text": "hi"}, 1)
+    assert task_queue.lease("w3", ["render", "voice"]) is None
+
+def test_expired_lease_is_delivered_again_and_fences_the_old_worker(task_queue):
+    task_id = task_queue.submit("render", {})
+    task_queue.lease("w1", ["render"], lease_seconds=-1)
+    task = task_queue.lease("w2", ["render"])
+    assert (task["id"], task["attempts"]) == (task_id, 2)
+
+    assert task_queue.heartbeat("w1", [task_id]) == []
+    assert not task_queue.complete(task_id, "w1", {"video": "stale"})
+    assert task_queue.complete(task_id, "w2", {"video": "fresh"})
+    assert task_queue.statuses([task_id])[task_id]["result"] == {"video": "fresh"}
+
+def test_heartbeat_keeps_the_lease(task_queue):
+    task_id = task_queue.submit("render", {})
+    task_queue.lease("w1", ["render"], lease_seconds=-1)
+    assert task_queue.heartbeat("w1", [task_id], lease_seconds=60) == [task_id]
+    assert task_queue.lease("w2", ["render"]) is None
+
+def test_task_fails_after_max_attempts(task_queue):
+    task_id = task_queue.submit("voice", {}, max_attempts=2)
+    for attempt in (1, 2):
+        task = task_queue.lease("w1", ["voice"])
+        assert task["attempts"] == attempt
+        assert task_queue.fail(task_id, "w1", RuntimeError("tts down"))
+    task = task_queue.statuses([task_id])[task_id]
+    assert (task["status"], task["error"]) == ("failed", "RuntimeError: tts down")
+    assert task_queue.lease("w1", ["voice"]) is None
+
+def test_expired_last_attempt_fails(task_queue):
+    task_id = task_queue.submit("render", {}, max_attempts=1)
+    task_queue.lease("w1", ["render"], lease_seconds=-1)
+    assert task_queue.lease("w2", ["render"]) is None
+    assert task_queue.statuses([task_id])[task_id]["status"] == "failed"
+
+def test_stage_limit_caps_leases_across_workers(task_queue):
+    for _ in range(3):
+        task_queue.submit("render", {})
+    task_queue.set_limit("render", 1)
+    first = task_queue.lease("w1", ["render"])
+    assert task_queue.lease("w2", ["render"]) is None
+    task_queue.complete(first["id"], "w1")
+    assert task_queue.lease("w2", ["render"]) is not None
+    task_queue.set_limit("render", None)
+    assert task_queue.lease("w3", ["render"]) is not None
+
+def test_cancel_withdraws_unfinished_tasks_only(task_queue):
+    done, leased, queued = (task_queue.submit("capture", {}) for _ in range(3))
+    task_queue.lease("w1", ["capture"])
+    task_queue.complete(done, "w1")
+    task_queue.lease("w1", ["capture"])
+    assert task_queue.cancel([done, leased, queued]) == 2
+    assert not task_queue.complete(leased, "w1")
+    assert {task_id: task["status"] for task_id, task in task_queue.statuses([done, leased, queued]).items()} == {
+        done: "done", leased: "cancelled", queued: "cancelled"}
+
+def test_wait_for_cancels_siblings_of_a_failed_task(task_queue):
+    failing, sibling = task_queue.submit("capture", {}, max_attempts=1), task_queue.submit("capture", {})
+    task_queue.lease("w1", ["capture"])
+    task_queue.fail(failing, "w1", "page did not load")
+    with pytest.raises(Exception, match="page did not load"):
+        farm.wait_for(task_queue, [failing, sibling], poll=0)
+    assert task_queue.statuses([sibling])[sibling]["status"] == "cancelled"
+
+def test_redelivered_assemble_resumes_the_same_upload(artifact_store, tmp_path, monkeypatch):
+    part = tmp_path / "part.mp4"
+    part.write_bytes(b"segment")
+    combined, uploads = [], []
+
+    def combine(parts, output, duration, workdir=None):
+        combined.append(output)
+        with open(output, "wb") as f:
+            f.write(f"final video {len(combined)}".encode())
+
+    def upload(video, language, since, publish_at=None, session_path=None):
+        with open(video, "rb") as f:
+            uploads.append((f.read(), session_path))
+        if len(uploads) == 1:
+            raise RuntimeError("worker died mid-upload")
+        return "video-1"
+
+    monkeypatch.setattr(farm, "combine_videos", combine)
+    monkeypatch.setattr(farm, "upload_video", upload)
+    payload = {"parts": [artifact_store.put(str(part))], "duration": 10, "language": "python", "since": "daily",
+               "upload": True, "publish_at": None}
+
+    def attempt(n):
+        workdir = tmp_path / f"attempt{n}"
+        workdir.mkdir()
+        return farm.assemble_task(payload, artifact_store, str(workdir), None)
+
+    with pytest.raises(RuntimeError):
+        attempt(0)
+    assert attempt(1)["video_id"] == "video-1"
+    assert attempt(2)["video_id"] == "video-1"
+    # The retry sent the bytes of the interrupted upload through the same session, and nothing after that
+    assert len(combined) == 1
+    assert uploads[0] == uploads[1] and uploads[0][1] is not None
+    assert len(uploads) == 2
@@ -0,0 +1,37 @@
+import asyncio
+import functools
+import inspect
+from tracing import get_tracer, traced
+
+@traced("test.sync")
+def add(a, b):
+    return a + b
+
+@traced("test.async")
+async def slow_add(a, b):
+    await asyncio.sleep(0)
+    return a + b
+
+async def _multiply(a, b):
+    return a * b
+
+def _span_names():
+    return [span["name"] for span in get_tracer().drain()]
+
+def test_sync_function_runs_in_a_span():
+    get_tracer().drain()
+    assert add(1, 2) == 3
+    assert _span_names() == ["test.sync"]
+
+def test_coroutine_function_is_awaited_inside_its_span():
+    get_tracer().drain()
+    assert inspect.iscoroutinefunction(slow_add)
+    assert asyncio.run(slow_add(1, 2)) == 3
+    assert _span_names() == ["test.async"]
+
+def test_partial_of_a_coroutine_function_stays_async():
+    get_tracer().drain()
+    double = traced("test.partial")(functools.partial(_multiply, 2))
+    assert inspect.iscoroutinefunction(double)
+    assert asyncio.run(double(5)) == 10
+    assert _span_names() == ["test.partial"]
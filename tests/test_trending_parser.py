@@ -0,0 +1,89 @@
+import pytest
+from utils import TrendingParser, _StopParsing, fetch_trending_page
+
+ROW = """
+<article class="Box-row">
+  <h2 class="h3 lh-condensed"><a href="/{name}"><span>{owner} /</span> {repo}</a></h2>
+  <p class="col-9 color-fg-muted my-1 pr-4">
+    A fast &amp; small <em>toolkit</em>.
+  </p>
+  <div class="f6 color-fg-muted mt-2">
+    <span class="d-inline-block ml-0 mr-3"><span itemprop="programmingLanguage">Python</span></span>
+    <a href="/{name}/stargazers" class="Link--muted"><svg></svg> {stars}</a>
+    <a href="/{name}/forks" class="Link--muted"><svg></svg> 56</a>
+    <span class="d-inline-block float-sm-right"><svg></svg> 89 stars today</span>
+  </div>
+</article>"""
+
+def page(*names):
+    rows = "".join(ROW.format(name=name, owner=name.split("/")[0], repo=name.split("/")[1], stars="1,234")
+                   for name in names)
+    return f'<html><body><div class="Box">{rows}</div></body></html>'
+
+def test_parses_every_field():
+    parser = TrendingParser()
+    parser.feed(page("octo/cat"))
+    parser.close()
+    assert parser.repos == [{"name": "octo/cat", "description": "A fast & small toolkit.", "language": "Python",
+                             "stars": 1234, "forks": 56, "stars_period": 89}]
+
+def test_chunk_boundaries_do_not_matter():
+    html = page("a/one", "b/two", "c/three")
+    whole = TrendingParser()
+    whole.feed(html)
+    chunked = TrendingParser()
+    for start in range(0, len(html), 7):
+        chunked.feed(html[start:start + 7])
+    assert chunked.repos == whole.repos
+    assert [repo["name"] for repo in chunked.repos] == ["a/one", "b/two", "c/three"]
+
+def test_stops_once_the_limit_is_reached():
+    parser = TrendingParser(limit=2)
+    with pytest.raises(_StopParsing):
+        parser.feed(page("a/one", "b/two", "c/three"))
+    assert [repo["name"] for repo in parser.repos] == ["a/one", "b/two"]
+
+def test_rows_without_a_name_are_skipped():
+    parser = TrendingParser()
+    parser.feed('<article class="Box-row"><p class="col-9">orphan</p></article>' + page("a/one"))
+    assert [repo["name"] for repo in parser.repos] == ["a/one"]
+
+class FakeResponse:
+    def __init__(self, status_code, text=""):
+        self.status_code = status_code
+        self.encoding = None
+        self.text = text
+        self.chunks_read = 0
+
+    def iter_content(self, chunk_size, decode_unicode):
+        for start in range(0, len(self.text), 100):
+            self.chunks_read += 1
+            yield self.text[start:start + 100]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+class FakeSession:
+    def __init__(self, response):
+        self.response = response
+        self.requests = []
+
+    def get(self, url, params=None, **kwargs):
+        self.requests.append((url, params))
+        return self.response
+
+def test_fetch_reads_only_as_far_as_needed():
+    html = page(*(f"owner/repo{n}" for n in range(25)))
+    response = FakeResponse(200, html)
+    session = FakeSession(response)
+    repos = fetch_trending_page("rust", "weekly", top_n=3, session=session, base_url="http://local")
+    assert session.requests == [("http://local/trending/rust", {"since": "weekly"})]
+    assert [repo["name"] for repo in repos] == ["owner/repo0", "owner/repo1", "owner/repo2"]
+    assert all(repo["since"] == "weekly" and repo["trending_language"] == "rust" for repo in repos)
+    assert response.chunks_read < len(html) / 100 / 2
+
+def test_fetch_returns_nothing_on_http_error():
+    assert fetch_trending_page("", "daily", session=FakeSession(FakeResponse(503))) == []
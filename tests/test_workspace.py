@@ -0,0 +1,59 @@
+import os
+import threading
+import time
+from workspace import Workspace
+
+def test_artifacts_lists_everything_written(tmp_path):
+    workspace = Workspace("run", root=str(tmp_path))
+    try:
+        with open(workspace.path("a.txt"), "w") as f:
+            f.write("abc")
+        os.makedirs(workspace.path("sub"))
+        with open(workspace.path(os.path.join("sub", "b.txt")), "w") as f:
+            f.write("de")
+        assert workspace.artifacts() == [workspace.path("a.txt"), workspace.path(os.path.join("sub", "b.txt"))]
+        assert workspace.size() == 5
+    finally:
+        workspace.release()
+
+def test_cleanup_counts_and_removes_files(tmp_path, capsys):
+    workspace = Workspace("run", root=str(tmp_path))
+    for name in ("a", "b", "c"):
+        open(workspace.path(name), "w").close()
+    workspace.cleanup()
+    assert f"Removed 3 artifacts from {workspace.dir}" in capsys.readouterr().out
+    assert os.listdir(tmp_path) == []
+
+def test_files_survive_a_failed_run(tmp_path):
+    try:
+        with Workspace("run", root=str(tmp_path)) as workspace:
+            open(workspace.path("part.mp4"), "w").close()
+            raise RuntimeError("render failed")
+    except RuntimeError:
+        pass
+    with Workspace("run", root=str(tmp_path)) as resumed:
+        assert resumed.artifacts() == [resumed.path("part.mp4")]
+
+def test_same_run_id_waits_for_the_first_run(tmp_path):
+    first = Workspace("run", root=str(tmp_path))
+    events = []
+
+    def second_run():
+        with Workspace("run", root=str(tmp_path)):
+            events.append("second")
+
+    thread = threading.Thread(target=second_run)
+    thread.start()
+    time.sleep(0.3)
+    events.append("first")
+    first.cleanup()
+    thread.join(5)
+    assert events == ["first", "second"]
+
+def test_other_run_ids_do_not_wait(tmp_path):
+    first = Workspace("python", root=str(tmp_path))
+    try:
+        with Workspace("rust", root=str(tmp_path)) as other:
+            assert other.dir != first.dir
+    finally:
+        first.release()
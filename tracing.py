@@ -0,0 +1,257 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Innermost open span of the current thread or asyncio task
+_current_span = contextvars.ContextVar("current_span", default=None)
+# Extra arguments attached to every span opened in the current context (e.g. language, since)
+_tags = contextvars.ContextVar("trace_tags", default={})
+
+def _peak_rss_mb():
+    """Peak resident set size of this process and its waited-for children, in MB."""
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _children_cpu():
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+class Span:
+    """
+    One timed section of the pipeline.
+
+    CPU time is the CPU of the calling thread plus that of child processes
+    (ffmpeg) reaped while the span was open. Bytes written are counted from
+    the outputs registered with ``add_output`` or added with ``add_bytes``.
+    ``process_peak_rss_mb`` is the high-water mark of the whole process (and
+    its reaped children) when the span ends, not memory used by the span.
+    """
+
+    def __init__(self, name, category, args, parent=None):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.parent = parent
+        self.pid = os.getpid()
+        self.tid = threading.get_ident()
+        self.retries = 0
+        self.bytes_written = 0
+        self.outputs = []
+        self.error = None
+        self.start = time.time()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+        self._children_start = _children_cpu()
+        self.wall = self.cpu = self.child_cpu = None
+        self.process_peak_rss_mb = None
+
+    def add_output(self, path):
+        """Count a file written by this span towards its bytes written."""
+        self.outputs.append(path)
+
+    def add_bytes(self, count):
+        self.bytes_written += count
+
+    def retry(self, count=1):
+        self.retries += count
+
+    def finish(self):
+        self.wall = time.perf_counter() - self._wall_start
+        self.cpu = time.thread_time() - self._cpu_start
+        self.child_cpu = _children_cpu() - self._children_start
+        self.process_peak_rss_mb = _peak_rss_mb()
+        for path in self.outputs:
+            if os.path.exists(path):
+                self.bytes_written += os.path.getsize(path)
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "category": self.category,
+            "parent": self.parent.name if self.parent else None,
+            "args": self.args,
+            "pid": self.pid,
+            "tid": self.tid,
+            "start": self.start,
+            "wall": self.wall,
+            "cpu": self.cpu,
+            "child_cpu": self.child_cpu,
+            "process_peak_rss_mb": self.process_peak_rss_mb,
+            "bytes_written": self.bytes_written,
+            "retries": self.retries,
+            "error": self.error,
+        }
+
+class Tracer:
+    """
+    Collects finished spans from every thread of a process.
+
+    Spans from worker processes are shipped back as dicts (see ``drain``)
+    and added with ``merge``.
+    """
+
+    def __init__(self):
+        self._spans = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, category="stage", **args):
+        """Time the body of a with-block as a span named ``name``."""
+        span = Span(name, category, {**_tags.get(), **args}, parent=_current_span.get())
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.finish()
+            with self._lock:
+                self._spans.append(span.as_dict())
+
+    def merge(self, spans):
+        with self._lock:
+            self._spans.extend(spans)
+
+    def drain(self):
+        """Return the finished spans and forget them."""
+        with self._lock:
+            spans, self._spans = self._spans, []
+        return spans
+
+    def spans(self):
+        with self._lock:
+            return list(self._spans)
+
+    def report(self):
+        """
+        Aggregate spans per stage name and per repository.
+
+        Returns:
+            dict: ``stages`` totals by span name, ``repos`` wall time per stage
+            for spans tagged with an ``index``, and the raw ``spans``
+        """
+        spans = self.spans()
+        stages = {}
+        repos = {}
+        for span in spans:
+            stage = stages.setdefault(span["name"], {"count": 0, "wall": 0.0, "cpu": 0.0, "child_cpu": 0.0,
+                                                     "bytes_written": 0, "retries": 0, "errors": 0,
+                                                     "process_peak_rss_mb": 0.0})
+            stage["count"] += 1
+            stage["wall"] += span["wall"]
+            stage["cpu"] += span["cpu"]
+            stage["child_cpu"] += span["child_cpu"]
+            stage["bytes_written"] += span["bytes_written"]
+            stage["retries"] += span["retries"]
+            stage["errors"] += span["error"] is not None
+            stage["process_peak_rss_mb"] = max(stage["process_peak_rss_mb"], span["process_peak_rss_mb"] or 0.0)
+            if "index" in span["args"]:
+                key = "/".join(str(span["args"][tag]) for tag in ("language", "since", "index")
+                               if tag in span["args"])
+                repo = repos.setdefault(key, {})
+                repo[span["name"]] = repo.get(span["name"], 0.0) + span["wall"]
+        return {"generated": time.time(), "stages": stages, "repos": repos, "spans": spans}
+
+    def write_report(self, path):
+        _write_json(path, self.report())
+        return path
+
+    def write_chrome_trace(self, path):
+        """Write the spans as Chrome trace events (open in chrome://tracing or Perfetto)."""
+        events = [{
+            "name": span["name"],
+            "cat": span["category"],
+            "ph": "X",
+            "ts": span["start"] * 1e6,
+            "dur": span["wall"] * 1e6,
+            "pid": span["pid"],
+            "tid": span["tid"],
+            "args": {**span["args"], "cpu": span["cpu"], "bytes_written": span["bytes_written"],
+                     "retries": span["retries"], "process_peak_rss_mb": span["process_peak_rss_mb"],
+                     "error": span["error"]},
+        } for span in self.spans()]
+        _write_json(path, {"traceEvents": events, "displayTimeUnit": "ms"})
+        return path
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1, default=str)
+    os.replace(tmp_path, path)
+
+_tracer = Tracer()
+
+def get_tracer():
+    """Return the process-wide Tracer."""
+    return _tracer
+
+def span(name, category="stage", **args):
+    """Open a span on the process-wide tracer; use as a context manager."""
+    return _tracer.span(name, category, **args)
+
+def current_span():
+    """The innermost open span, or None outside of any span."""
+    return _current_span.get()
+
+def record_retry(count=1):
+    """Count a retry against the innermost open span."""
+    span = _current_span.get()
+    if span is not None:
+        span.retry(count)
+
+def record_output(path):
+    """Count a written file against the innermost open span."""
+    span = _current_span.get()
+    if span is not None:
+        span.add_output(path)
+
+def current_tags():
+    """Tags attached by the enclosing ``tags`` blocks, e.g. to pass on to a worker process."""
+    return dict(_tags.get())
+
+@contextmanager
+def tags(**args):
+    """Attach ``args`` to every span opened inside the with-block in this context."""
+    token = _tags.set({**_tags.get(), **args})
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+def traced(name=None, category="stage"):
+    """Decorator running every call of a function (sync or async) inside a span."""
+    def decorator(fn):
+        span_name = name or fn.__name__
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with _tracer.span(span_name, category):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _tracer.span(span_name, category):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
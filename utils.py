@@ -1,292 +1,434 @@
-import requests
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+import json
 import time
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from sumy.parsers.plaintext import PlaintextParser
-from sumy.nlp.tokenizers import Tokenizer
-from sumy.summarizers.lsa import LsaSummarizer
-from sumy.nlp.stemmers import Stemmer
-from sumy.utils import get_stop_words
-import nltk
+from html.parser import HTMLParser
+from concurrent.futures import ThreadPoolExecutor
+from lazy import lazy_import
+from browser_pool import BrowserPool, wait_until_ready, wait_for_paint
+from readme_fetcher import ReadmeFetcher, markdown_to_text
+from http_client import get_session
+from summarizer import get_summarizer
+from youtube_uploader import get_uploader, UPLOAD_CHUNK_SIZE
+from tracing import span, record_output
+from scheduler import next_publish_time
+from screenshot_prep import readme_box_path
 import os
+from datetime import datetime
 
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from google.auth.transport.requests import Request
-from datetime import datetime, timedelta
-import pytz
-import os
+# Heavy third-party modules are only imported when first used
+By = lazy_import("selenium.webdriver.common.by", "By")
 
 os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = "1"
 
-# Download all required NLTK data
-nltk.download('punkt')
-nltk.download('punkt_tab')
-nltk.download('stopwords')
-
-def get_trending_repos():
-    url = "https://github.com/trending/python?since=daily"
-    headers = {"User-Agent": "Mozilla/5.0"}
-    response = requests.get(url, headers=headers)
-    if response.status_code == 200:
-        soup = BeautifulSoup(response.text, "html.parser")
-        repos = []
-        repo_details = []
-        
-        # Get repositories with their descriptions
-        for article in soup.find_all("article", class_="Box-row"):
-            repo_h2 = article.find("h2", class_="h3 lh-condensed")
-            if repo_h2:
-                repo_name = repo_h2.text.strip().replace("\n", "").replace(" ", "")
-                description = article.find("p", class_="col-9").text.strip() if article.find("p", class_="col-9") else ""
-                repos.append(repo_name)
-                repo_details.append({
-                    "name": repo_name,
-                    "description": description
-                })
-        return repo_details[:3]  # Return top 3 trending repos with descriptions
-    return []
+# Repositories shown per trending video unless a run asks for more
+DEFAULT_TOP_N = 3
+
+TIME_RANGES = ("daily", "weekly", "monthly")
+
+class _StopParsing(Exception):
+    pass
+
+class TrendingParser(HTMLParser):
+    """
+    Incremental parser for GitHub trending pages.
+
+    Fed the page chunk by chunk as it downloads; raises _StopParsing as soon
+    as ``limit`` repository rows are complete so the rest of the page is
+    never read or parsed.
+    """
+
+    def __init__(self, limit=None):
+        super().__init__(convert_charrefs=True)
+        self.limit = limit
+        self.repos = []
+        self._repo = None
+        self._in_title = False
+        self._field = None
+        self._field_tag = None
+        self._field_depth = 0
+        self._text = []
+
+    def _start_field(self, field, tag):
+        self._field, self._field_tag, self._field_depth = field, tag, 1
+        self._text = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = (attrs.get("class") or "").split()
+        if tag == "article" and "Box-row" in classes:
+            self._repo = {"name": "", "description": "", "language": "",
+                          "stars": 0, "forks": 0, "stars_period": 0}
+            return
+        if self._repo is None:
+            return
+        if self._field is not None:
+            if tag == self._field_tag:
+                self._field_depth += 1
+            return
+
+        href = attrs.get("href") or ""
+        if tag == "h2":
+            self._in_title = True
+        elif tag == "a" and self._in_title and not self._repo["name"]:
+            self._repo["name"] = href.strip("/")
+        elif tag == "p" and "col-9" in classes:
+            self._start_field("description", tag)
+        elif tag == "a" and href.endswith("/stargazers"):
+            self._start_field("stars", tag)
+        elif tag == "a" and href.endswith("/forks"):
+            self._start_field("forks", tag)
+        elif tag == "span" and attrs.get("itemprop") == "programmingLanguage":
+            self._start_field("language", tag)
+        elif tag == "span" and "float-sm-right" in classes:
+            self._start_field("stars_period", tag)
+
+    def handle_endtag(self, tag):
+        if self._repo is None:
+            return
+        if self._field is not None and tag == self._field_tag:
+            self._field_depth -= 1
+            if self._field_depth == 0:
+                text = " ".join("".join(self._text).split())
+                if self._field in ("stars", "forks", "stars_period"):
+                    digits = text.split(" ")[0].replace(",", "")
+                    self._repo[self._field] = int(digits) if digits.isdigit() else 0
+                else:
+                    self._repo[self._field] = text
+                self._field = None
+            return
+        if tag == "h2":
+            self._in_title = False
+        elif tag == "article":
+            if self._repo["name"]:
+                self.repos.append(self._repo)
+            self._repo = None
+            if self.limit is not None and len(self.repos) >= self.limit:
+                raise _StopParsing()
+
+    def handle_data(self, data):
+        if self._field is not None:
+            self._text.append(data)
+
+def fetch_trending_page(language="python", since="daily", top_n=DEFAULT_TOP_N, session=None,
+                        base_url="https://github.com"):
+    """
+    Stream one trending page and parse it until top_n repositories are found.
+
+    Returns:
+        List[dict]: Repositories with name, description, language, stars, forks
+        and stars_period (stars gained in the selected time range)
+    """
+    with span("trending", language=language, since=since):
+        session = session or get_session()
+        path = f"/trending/{language}" if language else "/trending"
+        parser = TrendingParser(limit=top_n)
+        with session.get(f"{base_url}{path}", params={"since": since}, stream=True, timeout=15) as response:
+            if response.status_code != 200:
+                print(f"Failed to fetch trending page {path}?since={since}: HTTP {response.status_code}")
+                return []
+            response.encoding = response.encoding or "utf-8"
+            try:
+                for chunk in response.iter_content(chunk_size=16 * 1024, decode_unicode=True):
+                    parser.feed(chunk)
+                parser.close()
+            except _StopParsing:
+                pass
+        for repo in parser.repos:
+            repo["since"] = since
+            repo["trending_language"] = language
+        return parser.repos
+
+def get_trending(languages=("python",), time_ranges=("daily",), top_n=DEFAULT_TOP_N, session=None,
+                 base_url="https://github.com"):
+    """
+    Fetch several trending pages concurrently over one shared session.
+
+    Args:
+        languages (Iterable[str]): Trending language slugs ("" for all languages)
+        time_ranges (Iterable[str]): Any of "daily", "weekly", "monthly"
+        top_n (int): Repositories to keep per page
+
+    Returns:
+        Dict[Tuple[str, str], List[dict]]: Repositories keyed by (language, since)
+    """
+    session = session or get_session()
+    jobs = [(language, since) for language in languages for since in time_ranges]
+    for _, since in jobs:
+        if since not in TIME_RANGES:
+            raise ValueError(f"Unknown trending time range: {since}")
+
+    def fetch(job):
+        try:
+            return fetch_trending_page(job[0], job[1], top_n, session, base_url)
+        except Exception as e:
+            print(f"Error fetching trending page for {job}: {e}")
+            return []
+
+    with ThreadPoolExecutor(max_workers=max(1, len(jobs))) as executor:
+        return dict(zip(jobs, executor.map(fetch, jobs)))
+
+def get_trending_repos(language="python", since="daily", top_n=DEFAULT_TOP_N):
+    """Return the top trending repositories for one language and time range."""
+    return get_trending((language,), (since,), top_n)[(language, since)]
 
 def summarize_readme(text, sentences_count=3):
     """Summarize README text using sumy."""
     try:
-        # Initialize the summarizer
-        parser = PlaintextParser.from_string(text, Tokenizer("english"))
-        stemmer = Stemmer("english")
-        summarizer = LsaSummarizer(stemmer)
-        summarizer.stop_words = get_stop_words("english")
-
-        # Summarize
-        summary = summarizer(parser.document, sentences_count)
-        return " ".join([str(sentence) for sentence in summary])
+        return get_summarizer().summarize(text, sentences_count)
     except Exception as e:
         print(f"Error summarizing text: {e}")
         return text[:200] + "..."  # Fallback to simple truncation
 
-def fetch_screenshot(repos):
-    """Fetch screenshots and README content for repositories with improved error handling"""
-    options = webdriver.ChromeOptions()
-    options.add_argument('--headless')
-    options.add_argument('--disable-gpu')
-    options.add_argument('--window-size=1920,1080')
-    options.add_argument('--force-device-scale-factor=0.85')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    
-    driver = None
-    try:
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=options)
-        
-        for i, repo in enumerate(repos):
-            print(f"Fetching screenshot for {repo['name']}...")
-            url = f"https://github.com/{repo['name']}"
-            
-            max_page_load_retries = 3
-            for load_attempt in range(max_page_load_retries):
-                try:
-                    driver.get(url)
-                    break
-                except Exception as e:
-                    if load_attempt == max_page_load_retries - 1:
-                        raise Exception(f"Failed to load page after {max_page_load_retries} attempts: {e}")
-                    time.sleep(2 ** load_attempt)
-            
-            # Wait for content with timeout
+# Number of headless browsers used to capture repositories in parallel
+SCREENSHOT_WORKERS = 3
+
+# Concurrent README downloads; these are cheap HTTP requests, not browser renders
+README_WORKERS = 8
+
+def write_readme(repo, text, index, workdir="."):
+    """Write the README highlights file consumed by the script generator"""
+    readme_path = os.path.join(workdir, f"readme_{index}.txt")
+    record_output(readme_path)
+    with open(readme_path, "w", encoding="utf-8") as f:
+        f.write(f"Repository: {repo['name']}\n")
+        f.write(f"Description: {repo['description']}\n\n")
+        f.write("README Highlights:\n")
+        f.write(text[:500])
+
+def fetch_readme(fetcher, repo, index, workdir="."):
+    """Download a README over HTTP and write its highlights; returns False if unavailable"""
+    with span("readme", index=index, repo=repo['name']):
+        try:
+            markdown = fetcher.fetch(repo['name'])
+        except Exception as e:
+            print(f"Warning: README download failed for {repo['name']}: {e}")
+            return False
+        if not markdown:
+            return False
+        write_readme(repo, markdown_to_text(markdown), index, workdir)
+        return True
+
+# Page box of the rendered README, in CSS pixels plus the device pixel ratio
+README_BOX_SCRIPT = """
+const el = document.querySelector("#readme article") || document.querySelector(".markdown-body");
+if (!el) return null;
+const r = el.getBoundingClientRect();
+return {left: r.left + window.scrollX, top: r.top + window.scrollY, right: r.right + window.scrollX,
+        bottom: r.bottom + window.scrollY, scale: window.devicePixelRatio || 1};
+"""
+
+def save_readme_box(driver, screenshot_path):
+    """Record where the README sits in a capture, in screenshot pixels, for screenshot_prep to crop to."""
+    path = readme_box_path(screenshot_path)
+    box = driver.execute_script(README_BOX_SCRIPT)
+    if not box:
+        if os.path.exists(path):
+            os.remove(path)
+        return None
+    scale = box.pop("scale")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({side: value * scale for side, value in box.items()}, f)
+    return path
+
+def capture_repo(driver, repo, index, base_url="https://github.com", readme_future=None, workdir="."):
+    """Capture the screenshot of one repository with a pooled driver
+
+    The README text is taken from ``readme_future`` (an HTTP download running
+    alongside the capture) and only scraped from the rendered page when that
+    download failed or was not requested. Files are written to ``workdir``.
+    """
+    with span("screenshot", index=index, repo=repo['name']) as capture_span:
+        print(f"Fetching screenshot for {repo['name']}...")
+        url = f"{base_url}/{repo['name']}"
+
+        max_page_load_retries = 3
+        for load_attempt in range(max_page_load_retries):
             try:
-                wait = WebDriverWait(driver, 20)
-                wait.until(EC.presence_of_element_located((By.CLASS_NAME, "markdown-body")))
+                driver.set_window_size(1920, 1080)
+                driver.get(url)
+                break
             except Exception as e:
-                print(f"Warning: Timeout waiting for content on {repo['name']}: {e}")
-            
-            # Ensure page is ready
-            time.sleep(2)
-            driver.execute_script("window.scrollTo(0, 0)")
-            
-            # Take screenshot with retries
-            max_retries = 5
-            for attempt in range(max_retries):
-                try:
-                    # Adjust viewport
-                    total_height = driver.execute_script("return Math.max(document.body.scrollHeight, document.body.offsetHeight, document.documentElement.clientHeight, document.documentElement.scrollHeight, document.documentElement.offsetHeight);")
-                    driver.set_window_size(1920, min(total_height, 8000))  # Cap maximum height
-                    time.sleep(1)
-                    
-                    # Take screenshot
-                    screenshot_path = f"screenshot_{i}.png"
-                    driver.save_screenshot(screenshot_path)
-                    
-                    if not os.path.exists(screenshot_path):
-                        raise Exception("Screenshot file was not created")
-                        
-                    print(f"Screenshot saved for {repo['name']}")
-                    
-                    # Get README content
+                if load_attempt == max_page_load_retries - 1:
+                    raise Exception(f"Failed to load page after {max_page_load_retries} attempts: {e}")
+                capture_span.retry()
+                time.sleep(0.5 * 2 ** load_attempt)
+
+        # Wait for the README and for network activity to settle instead of fixed sleeps
+        with span("screenshot.wait", index=index):
+            if not wait_until_ready(driver):
+                print(f"Warning: Timeout waiting for content on {repo['name']}")
+        driver.execute_script("window.scrollTo(0, 0)")
+
+        # Take screenshot with retries
+        max_retries = 3
+        for attempt in range(max_retries):
+            try:
+                # Adjust viewport
+                total_height = driver.execute_script("return Math.max(document.body.scrollHeight, document.body.offsetHeight, document.documentElement.clientHeight, document.documentElement.scrollHeight, document.documentElement.offsetHeight);")
+                driver.set_window_size(1920, min(total_height, 8000))  # Cap maximum height
+                wait_for_paint(driver)
+
+                # Take screenshot
+                screenshot_path = os.path.join(workdir, f"screenshot_{index}.png")
+                driver.save_screenshot(screenshot_path)
+
+                if not os.path.exists(screenshot_path):
+                    raise Exception("Screenshot file was not created")
+                capture_span.add_output(screenshot_path)
+                save_readme_box(driver, screenshot_path)
+
+                print(f"Screenshot saved for {repo['name']}")
+
+                # Fall back to the rendered README only if the HTTP fetch didn't deliver
+                if readme_future is None or not readme_future.result():
                     readme = driver.find_element(By.CLASS_NAME, "markdown-body")
-                    with open(f"readme_{i}.txt", "w", encoding="utf-8") as f:
-                        f.write(f"Repository: {repo['name']}\n")
-                        f.write(f"Description: {repo['description']}\n\n")
-                        f.write("README Highlights:\n")
-                        f.write(readme.text[:500])
-                    break
-                    
-                except Exception as e:
-                    wait_time = 2 ** attempt
-                    if attempt < max_retries - 1:
-                        print(f"Attempt {attempt + 1} failed for {repo['name']}: {e}")
-                        print(f"Retrying in {wait_time} seconds...")
-                        time.sleep(wait_time)
-                    else:
-                        print(f"Final attempt failed for {repo['name']}: {e}")
-                        raise
-                        
+                    write_readme(repo, readme.text, index, workdir)
+                return screenshot_path
+
+            except Exception as e:
+                wait_time = 0.5 * 2 ** attempt
+                if attempt < max_retries - 1:
+                    capture_span.retry()
+                    print(f"Attempt {attempt + 1} failed for {repo['name']}: {e}")
+                    print(f"Retrying in {wait_time} seconds...")
+                    time.sleep(wait_time)
+                else:
+                    print(f"Final attempt failed for {repo['name']}: {e}")
+                    raise
+
+def fetch_screenshot(repos, pool=None, workers=SCREENSHOT_WORKERS, base_url="https://github.com",
+                     readme_futures=None, indices=None, workdir="."):
+    """Fetch screenshots and README content for repositories with improved error handling
+
+    Repositories are captured in parallel on a BrowserPool. Pass an already
+    started ``pool`` to reuse warm browsers across calls, and ``base_url`` to
+    point the capture at a local server. ``readme_futures`` maps repo index to
+    a pending HTTP README download (see fetch_repo_content). ``indices`` gives
+    the file index of each repo when only part of a list is re-captured, and
+    ``workdir`` the directory the screenshots and READMEs are written to.
+    """
+    readme_futures = readme_futures or {}
+    indices = list(indices) if indices is not None else list(range(len(repos)))
+    own_pool = pool is None
+    try:
+        if own_pool:
+            pool = BrowserPool(size=max(1, min(workers, len(repos)))).start()
+        return pool.map(
+            lambda driver, item: capture_repo(driver, item[1], item[0], base_url, readme_futures.get(item[0]),
+                                              workdir),
+            list(zip(indices, repos))
+        )
+
     except Exception as e:
         print(f"Critical error in fetch_screenshot: {e}")
         raise
         
     finally:
-        if driver:
-            try:
-                driver.quit()
-            except:
-                pass
-
-def cleanup_files():
-    """Clean up generated files after video creation"""
-    files_to_remove = [
-        "output.mp3",
-        "output_0.mp3",
-        "output_1.mp3",
-        "output_2.mp3",
-        "repo_video_0.mp4",
-        "repo_video_1.mp4",
-        "repo_video_2.mp4",
-        "screenshot_0.png",
-        "screenshot_1.png", 
-        "screenshot_2.png",
-        "readme_0.txt",
-        "readme_1.txt",
-        "music.mp3",
-        "readme_2.txt",
-        "temp_video_no_audio.mp4",
-        "temp-audio.m4a.log",
-        "trending_repos_video.mp4.log"
-    ]
-    
-    # Add a small delay to ensure files are released
-    time.sleep(1)
-    
-    for file in files_to_remove:
-        print(f"Removing {file}...")
-        max_attempts = 3
-        attempt = 0
-        while attempt < max_attempts:
-            try:
-                if os.path.exists(file):
-                    os.remove(file)
-                break
-            except Exception as e:
-                attempt += 1
-                if attempt == max_attempts:
-                    print(f"Failed to remove {file} after {max_attempts} attempts: {e}")
-                time.sleep(1)  # Wait before retry
+        if own_pool and pool is not None:
+            pool.close()
 
+def fetch_repo_content(repos, pool=None, fetcher=None, base_url="https://github.com", indices=None,
+                       workdir="."):
+    """Fetch README text over HTTP and screenshots in the browser at the same time"""
+    fetcher = fetcher or ReadmeFetcher()
+    indices = list(indices) if indices is not None else list(range(len(repos)))
+    with ThreadPoolExecutor(max_workers=README_WORKERS) as executor:
+        readme_futures = {
+            i: executor.submit(fetch_readme, fetcher, repo, i, workdir)
+            for i, repo in zip(indices, repos)
+        }
+        return fetch_screenshot(repos, pool=pool, base_url=base_url, readme_futures=readme_futures,
+                                indices=indices, workdir=workdir)
 
+def language_label(language):
+    """Human readable name for a trending language slug ("" means all languages)"""
+    labels = {"": "Open Source", "c++": "C++", "c#": "C#", "javascript": "JavaScript",
+              "typescript": "TypeScript", "php": "PHP", "html": "HTML", "css": "CSS"}
+    return labels.get(language, language.replace("-", " ").title())
 
-def upload_to_youtube(video_path, title=None, description=None):
+def youtube_video_body(title=None, description=None, language="python", since="daily", publish_at=None):
     """
-    Upload video to YouTube and schedule for 6 PM IST daily
+    Build the videos.insert resource for a trending video
+
+    ``publish_at`` is an aware datetime; by default the video goes public at the
+    next slot of scheduler.PUBLISH_SCHEDULE (6 PM IST).
     
-    Args:
-        video_path (str): Path to the video file
-        title (str): Video title (optional)
-        description (str): Video description (optional)
+    Returns:
+        Tuple[dict, datetime]: The request body and the publish time
     """
-    # Get current date and next available 6 PM IST slot
-    ist_time = datetime.now().astimezone(pytz.timezone('Asia/Kolkata'))
-    target_time = ist_time.replace(hour=18, minute=0, second=0, microsecond=0)
-    
-    # If current time is past 6 PM, schedule for next day
-    if ist_time >= target_time:
-        target_time = target_time + timedelta(days=1)
+    target_time = publish_at or next_publish_time()
+    # Dates in the title are those of the publish timezone
+    local_time = datetime.now(target_time.tzinfo)
 
     # Format default title and description
+    label = language_label(language)
+    period, when = {"daily": ("Daily", "today"), "weekly": ("Weekly", "this week"),
+                    "monthly": ("Monthly", "this month")}[since]
     if not title:
-        title = f"🔥 Top Trending Python Projects on GitHub | {ist_time.strftime('%d %B %Y')}"
+        suffix = "" if since == "daily" else f" {when.title()}"
+        title = f"🔥 Top Trending {label} Projects on GitHub{suffix} | {local_time.strftime('%d %B %Y')}"
     
     if not description:
-        description = f"""🚀 Daily GitHub Trending Python Projects Update - {ist_time.strftime('%d %B %Y')}
+        description = f"""🚀 {period} GitHub Trending {label} Projects Update - {local_time.strftime('%d %B %Y')}
 
-🔍 Discover the most exciting Python projects trending on GitHub today!
-💡 Stay updated with the latest innovations in Python development
+🔍 Discover the most exciting {label} projects trending on GitHub {when}!
+💡 Stay updated with the latest innovations in {label} development
 🌟 Featured projects include cutting-edge tools, frameworks, and applications
 
-👉 Subscribe and hit the notification bell to stay updated with daily Python trends!
+👉 Subscribe and hit the notification bell to stay updated with {period.lower()} {label} trends!
 
-#GitHub #Python #Programming #TrendingProjects #CodingCommunity
+#GitHub #{label.replace(' ', '').replace('+', 'P').replace('#', 'Sharp')} #Programming #TrendingProjects #CodingCommunity
 """
 
-    SCOPES = ['https://www.googleapis.com/auth/youtube.upload']
-    TOKEN_FILE = 'token.json'
+    request_body = {
+        'snippet': {
+            'title': title,
+            'description': description,
+            'tags': ['GitHub', label, 'Programming', 'Trending', 'Coding'],
+            'categoryId': '28'  # Science & Technology category
+        },
+        'status': {
+            'privacyStatus': 'private',
+            'selfDeclaredMadeForKids': False,
+            'publishAt': target_time.isoformat()
+        }
+    }
+    return request_body, target_time
+
+def upload_to_youtube(video_path, title=None, description=None, language="python", since="daily",
+                      chunk_size=UPLOAD_CHUNK_SIZE, api_endpoint=None, uploader=None, publish_at=None,
+                      session_path=None):
+    """
+    Upload video to YouTube and schedule it for publishing (by default at the next 6 PM IST)
     
+    The upload is sent in chunks and resumes from a saved session if an
+    earlier attempt for the same file was interrupted. It goes through the
+    process-wide YouTubeUploader, so credentials and the API client are
+    set up once per process rather than per video.
+
+    Args:
+        video_path (str): Path to the video file
+        title (str): Video title (optional)
+        description (str): Video description (optional)
+        language (str): Trending language slug the video covers, used in the defaults
+        since (str): Trending time range the video covers, used in the defaults
+        chunk_size (int): Bytes sent per upload request
+        api_endpoint (str): Alternative API root, e.g. a local fake server for testing
+        uploader (YouTubeUploader): Client to use instead of the shared one
+        publish_at (datetime): When the video goes public (see youtube_video_body)
+        session_path (str): Where to keep the resumable session (see resumable_upload)
+    """
     try:
-        credentials = None
-        # Check if token file exists and load credentials
-        if os.path.exists(TOKEN_FILE):
-            credentials = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
-
-        # If no valid credentials available, get new ones
-        if not credentials or not credentials.valid:
-            if credentials and credentials.expired and credentials.refresh_token:
-                credentials.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    'client_secrets.json', SCOPES, redirect_uri='http://localhost:8080')
-                credentials = flow.run_local_server(port=8080)
-            
-            # Save credentials for future use
-            with open(TOKEN_FILE, 'w') as token:
-                token.write(credentials.to_json())
-        
-        youtube = build('youtube', 'v3', credentials=credentials)
+        request_body, target_time = youtube_video_body(title, description, language, since, publish_at)
+        uploader = uploader or get_uploader(api_endpoint)
         
-        request_body = {
-            'snippet': {
-                'title': title,
-                'description': description,
-                'tags': ['GitHub', 'Python', 'Programming', 'Trending', 'Coding'],
-                'categoryId': '28'  # Science & Technology category
-            },
-            'status': {
-                'privacyStatus': 'private',
-                'selfDeclaredMadeForKids': False,
-                'publishAt': target_time.isoformat()
-            }
-        }
-        
-        media = MediaFileUpload(
-            video_path, 
-            mimetype='video/mp4',
-            resumable=True
-        )
-        
-        print(f"Starting YouTube upload, scheduled for {target_time.strftime('%Y-%m-%d %H:%M:%S')} IST...")
-        upload_request = youtube.videos().insert(
-            part=','.join(request_body.keys()),
-            body=request_body,
-            media_body=media
-        )
+        print(f"Starting YouTube upload, scheduled for {target_time.strftime('%Y-%m-%d %H:%M:%S %Z')}...")
+        response, stats = uploader.upload(video_path, request_body, chunk_size=chunk_size,
+                                          session_path=session_path)
         
-        response = upload_request.execute()
         print(f"Upload successful! Video ID: {response['id']}")
-        print(f"Video will be published at {target_time.strftime('%Y-%m-%d %H:%M:%S')} IST")
+        print(f"Sent {stats.bytes_sent - stats.resumed_from} bytes in {stats.elapsed:.1f}s "
+              f"({stats.throughput / 1e6:.2f} MB/s, {stats.retries} retries)")
+        print(f"Video will be published at {target_time.strftime('%Y-%m-%d %H:%M:%S %Z')}")
         return response['id']
         
     except Exception as e:
@@ -1,20 +1,24 @@
-import requests
-import json
-import edge_tts
-import asyncio
-from moviepy.editor import (
-    VideoFileClip, ImageClip, concatenate_videoclips, 
-    AudioFileClip, TextClip, CompositeVideoClip
-)
-from moviepy.config import change_settings
-from moviepy.video.fx import all as vfx
-from PIL import Image
 import os
-from music_algo import create_random_clip, find_best_audio_clips, random_songs
+from lazy import lazy_import
+from music_algo import create_random_clip, find_best_audio_clips, random_songs, get_music_index, MUSIC_DIR
+from scroll_renderer import render_scroll
+from ffmpeg_tools import probe_media, run_ffmpeg, write_concat_list
+from encoder_profiles import select_profile
+from voice_generator import audio_duration
+from captions import load_word_timings
+from audio_mixer import mix_audio
+from tracing import span, traced, record_output
 
-change_settings({"IMAGEMAGICK_BINARY": r"C:\Program Files\WindowsApps\ImageMagick.Q16-HDRI_7.1.1.44_x64__b3hnabsze9y3j\magick.exe"})
-def create_scrolling_video(image_path, audio_file, output_video):
+# moviepy probes for ffmpeg on import, so it is only loaded by the moviepy paths
+VideoFileClip = lazy_import("moviepy.editor", "VideoFileClip")
+ImageClip = lazy_import("moviepy.editor", "ImageClip")
+concatenate_videoclips = lazy_import("moviepy.editor", "concatenate_videoclips")
+AudioFileClip = lazy_import("moviepy.editor", "AudioFileClip")
+vfx = lazy_import("moviepy.video.fx.all")
+
+def create_scrolling_video(image_path, audio_file, output_video, profile=None):
     """Creates a scrolling video from an image with audio."""
+    profile = profile or select_profile(allow_segments=False)
     try:
         audio = AudioFileClip(audio_file)
         image_clip = ImageClip(image_path).set_duration(audio.duration)
@@ -23,28 +27,79 @@ def create_scrolling_video(image_path, audio_file, output_video):
         scrolling_clip = image_clip.fx(vfx.scroll, h=720, y_speed=30)
 
         scrolling_clip = scrolling_clip.set_audio(audio)
-        scrolling_clip.write_videofile(output_video, fps=24)
+        scrolling_clip.write_videofile(output_video, fps=24, **profile.moviepy_kwargs())
     
     except Exception as e:
         print(f"Error creating scrolling video: {e}")
 
-def create_video(text, audio_file, output_video, index):
-    """Creates a video with images, text, and audio."""
+def create_video(text, audio_file, output_video, index, duration=None, renderer="ffmpeg", workdir=".",
+                 profile=None, scroll_fraction=0.4):
+    """Creates a scrolling screenshot video for one repository with its narration.
+
+    Frames are produced by scroll_renderer and piped straight into ffmpeg.
+    ``renderer="moviepy"`` selects the original ImageClip/vfx.scroll path.
+    The screenshot is read from ``workdir``. ``profile`` is the EncoderProfile
+    to encode with; by default one is picked for this host. ``scroll_fraction``
+    is the share of the screenshot scrolled through (0 holds the top still).
+    Word timings saved next to the narration by the voice stage are burned in
+    as captions; the moviepy renderer has no captions.
+    """
+    profile = profile or select_profile()
+    if renderer == "moviepy":
+        return create_video_moviepy(text, audio_file, output_video, index, duration, workdir, profile)
+    try:
+        # Verify audio file
+        audio_path = os.path.abspath(audio_file)
+        if not os.path.exists(audio_path):
+            raise FileNotFoundError(f"Audio file not found: {audio_path}")
+        if duration is None:
+            duration = audio_duration(audio_path)
+        print(f"Audio duration: {duration} seconds")
+
+        # Prefer the cropped, memory-mapped capture from screenshot_prep
+        screenshot = os.path.join(workdir, f"screenshot_{index}.npy")
+        if not os.path.exists(screenshot):
+            screenshot = os.path.join(workdir, f"screenshot_{index}.png")
+        if not os.path.exists(screenshot):
+            raise FileNotFoundError(f"Screenshot not found: {screenshot}")
+
+        render_scroll(screenshot, audio_path, output_video, duration, scroll_fraction=scroll_fraction,
+                      profile=profile, words=load_word_timings(audio_path))
+        record_output(output_video)
+        print(f"Video written to {output_video}")
+
+    except Exception as e:
+        print(f"Error creating video: {e}")
+        raise
+
+def create_video_moviepy(text, audio_file, output_video, index, duration=None, workdir=".", profile=None):
+    """Creates a video with images, text, and audio using moviepy.
+
+    When the narration duration is already known (e.g. from the TTS cache) it
+    can be passed as ``duration`` and the audio is muxed straight from the file
+    instead of being probed and decoded through an AudioFileClip.
+    """
+    profile = profile or select_profile(allow_segments=False)
     try:
         # Verify audio file
         audio_path = os.path.abspath(audio_file)
         if not os.path.exists(audio_path):
             raise FileNotFoundError(f"Audio file not found: {audio_path}")
         
-        audio = AudioFileClip(audio_path)
-        print(f"Audio duration: {audio.duration} seconds")
+        if duration is None:
+            audio = AudioFileClip(audio_path)
+            total_duration = audio.duration
+        else:
+            audio = None
+            total_duration = duration
+        print(f"Audio duration: {total_duration} seconds")
 
-        total_duration = audio.duration
-        repo_duration = total_duration / 3
+        # Each part covers a single repository, so it spans its whole narration
+        repo_duration = total_duration
         target_h, target_w = 720, 1280
 
         clips = []
-        screenshot = f"screenshot_{index}.png"
+        screenshot = os.path.join(workdir, f"screenshot_{index}.png")
         if not os.path.exists(screenshot):
             raise FileNotFoundError(f"Screenshot not found: {screenshot}")
 
@@ -70,17 +125,25 @@ def create_video(text, audio_file, output_video, index):
 
         final_clip = concatenate_videoclips(clips)
         print(f"Concatenated clip duration: {final_clip.duration} seconds")
-        final_clip = final_clip.set_audio(audio)
-        print(f"Audio duration set: {audio.duration} seconds")
+        if audio is not None:
+            final_clip = final_clip.set_audio(audio)
+            print(f"Audio duration set: {audio.duration} seconds")
+            # Named after the output so concurrent renders (two segments of one repository too) never share it
+            temp_audio = os.path.join(workdir, f"temp-audio-{os.path.splitext(os.path.basename(output_video))[0]}.m4a")
+            audio_kwargs = {"temp_audiofile": temp_audio, "remove_temp": True}
+            encoder_kwargs = profile.moviepy_kwargs()
+        else:
+            # Mux the narration file directly; ffmpeg trims it to the video length
+            audio_kwargs = {"audio": audio_path}
+            encoder_kwargs = profile.moviepy_kwargs(["-shortest"])
 
         final_clip.write_videofile(
             output_video,
             fps=30,
-            codec="libx264",
             audio_codec="aac",
-            temp_audiofile="temp-audio.m4a",
-            remove_temp=True,
-            verbose=True
+            verbose=True,
+            **audio_kwargs,
+            **encoder_kwargs
         )
         print(f"Video written to {output_video}")
 
@@ -90,50 +153,95 @@ def create_video(text, audio_file, output_video, index):
     finally:
         if "final_clip" in locals():
             final_clip.close()
-        if "audio" in locals():
+        if locals().get("audio") is not None:
             audio.close()
         if "clips" in locals():
             for clip in clips:
                 clip.close()
 
-def combine_videos(video_parts, output_video, total_duration):
-    """Combine multiple video parts into a single video with background music."""
+def prepare_background_music(total_duration, output_path="music.mp3", music_dir=MUSIC_DIR):
+    """Pick a song and cut its most energetic segment to the video length."""
+    music = random_songs(music_dir)
+    best_clips = find_best_audio_clips(music, total_duration, index=get_music_index(music_dir))
+    create_random_clip(music, best_clips, output_path)
+    return output_path
+
+def parts_match(video_parts):
+    """Check whether all parts share codec parameters, so they can be joined by stream copy."""
+    try:
+        signatures = {(info["video"], info["audio"]) for info in map(probe_media, video_parts)}
+    except Exception as e:
+        print(f"Could not probe video parts: {e}")
+        return False
+    return len(signatures) == 1 and None not in next(iter(signatures))
+
+@traced("combine.concat")
+def concat_with_audio(video_parts, audio_file, output_video, workdir="."):
+    """
+    Join parts with ffmpeg's concat demuxer and swap in the mixed soundtrack.
+
+    Both streams are copied untouched, so nothing is decoded or re-encoded.
+    """
+    list_file = write_concat_list(video_parts, os.path.join(workdir, "concat.txt"))
+    try:
+        run_ffmpeg([
+            "-f", "concat", "-safe", "0", "-i", list_file,
+            "-i", audio_file,
+            "-map", "0:v:0", "-map", "1:a:0",
+            "-c", "copy",
+            "-movflags", "+faststart",
+            output_video,
+        ])
+    finally:
+        if os.path.exists(list_file):
+            os.remove(list_file)
+
+def combine_videos(video_parts, output_video, total_duration, workdir=".", profile=None, music_dir=MUSIC_DIR):
+    """Combine multiple video parts into a single video with background music.
+
+    The soundtrack (narration over ducked background music) is mixed by
+    audio_mixer. Parts with identical encoding parameters are then
+    concatenated by stream copy; anything else goes through the moviepy
+    re-encode in combine_videos_moviepy. Intermediate files go to ``workdir``.
+    """
     try:
         # Generate and prepare background music
-        music = random_songs()
-        best_clips = find_best_audio_clips(music, total_duration)
-        create_random_clip(music, best_clips)
-        
-        # Load video clips and music
-        clips = [VideoFileClip(video_part) for video_part in video_parts]
-        background_music = AudioFileClip("music.mp3")
-        
-        # Set background music duration to match video
+        with span("combine.music"):
+            music_file = prepare_background_music(total_duration, os.path.join(workdir, "music.mp3"), music_dir)
+        audio_file = mix_audio(video_parts, music_file, os.path.join(workdir, "soundtrack.m4a"), total_duration)
+    except Exception as e:
+        print(f"Error combining videos: {e}")
+        raise
+
+    if parts_match(video_parts):
+        try:
+            concat_with_audio(video_parts, audio_file, output_video, workdir)
+            return
+        except Exception as e:
+            print(f"Stream-copy concatenation failed, re-encoding instead: {e}")
+    else:
+        print("Video parts use different encoding parameters, re-encoding instead")
+    combine_videos_moviepy(video_parts, output_video, audio_file, profile)
+
+@traced("combine.moviepy")
+def combine_videos_moviepy(video_parts, output_video, audio_file="soundtrack.m4a", profile=None):
+    """Combine video parts by re-encoding the video with moviepy, keeping the mixed soundtrack as is."""
+    profile = profile or select_profile(allow_segments=False)
+    clips = []
+    try:
+        clips = [VideoFileClip(video_part, audio=False) for video_part in video_parts]
         final_clip = concatenate_videoclips(clips)
-        bg_music = background_music.subclip(0, final_clip.duration)
-        
-        # Add fade in/out effects (2 seconds each)
-        bg_music = bg_music.audio_fadein(2).audio_fadeout(2)
-        
-        # Mix audio - background music at 5% volume (reduced from 10%)
-        final_audio = CompositeVideoClip([
-            final_clip.set_audio(final_clip.audio.volumex(1.0)),
-            final_clip.set_audio(bg_music.volumex(0.05))
-        ]).audio
-        # Set final audio to video
-        final_clip = final_clip.set_audio(final_audio)
-        
-        # Write final video
-        final_clip.write_videofile(output_video, codec="libx264", audio_codec="aac")
-        
+
+        # Mux the soundtrack file directly; ffmpeg trims it to the video length
+        final_clip.write_videofile(output_video, audio=audio_file,
+                                   **profile.moviepy_kwargs(["-shortest"]))
+
     except Exception as e:
         print(f"Error combining videos: {e}")
         raise
     finally:
         if "final_clip" in locals():
             final_clip.close()
-        if "background_music" in locals():
-            background_music.close()
         for clip in clips:
             clip.close()
 
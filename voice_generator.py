@@ -1,33 +1,268 @@
-import edge_tts
 import os
 import asyncio
+import random
+import shutil
+import threading
+import wave
+from cache import DiskCache, hash_key
+from captions import save_word_timings
+from lazy import lazy_import
+from tracing import span
 
-async def generate_voice(text, output_file):
+edge_tts = lazy_import("edge_tts")
+
+VOICE = "en-US-AndrewNeural"
+RATE = "+0%"  # Normal speed
+VOLUME = "+50%"  # Increased volume
+
+# Upper bound on synthesis jobs in flight on the shared loop
+MAX_CONCURRENT_SYNTHESIS = 4
+
+# Synthesized narration is cached here, keyed on text and voice parameters
+TTS_CACHE_DIR = os.path.join(".cache", "tts")
+TTS_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# edge-tts reports offsets and durations in 100 ns ticks
+TICKS_PER_SECOND = 10_000_000
+
+_MP3_BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_MP3_SAMPLE_RATES = {1: [44100, 48000, 32000], 2: [22050, 24000, 16000], 2.5: [11025, 12000, 8000]}
+
+_loop = None
+_loop_semaphore = None
+_loop_lock = threading.Lock()
+_tts_cache = None
+
+class EdgeTTSBackend:
+    """
+    Synthesizer backed by the edge-tts service.
+
+    A backend is any object with an async ``synthesize(text, output_file)``
+    method that writes the complete audio to ``output_file`` and fsyncs it
+    before returning, so the caller can verify the file right away. It may
+    return the spoken words as ``{"start", "end", "text"}`` dicts (seconds),
+    which are saved next to the audio for captions. Backends that also
+    define ``cache_key(text)`` get their output cached on disk.
+    """
+
+    def __init__(self, voice=VOICE, rate=RATE, volume=VOLUME):
+        self.voice = voice
+        self.rate = rate
+        self.volume = volume
+
+    def cache_key(self, text):
+        """Key identifying the audio this backend produces for text."""
+        # "words": entries cached before word timings were kept have none
+        return hash_key("edge-tts", text, self.voice, self.rate, self.volume, "words")
+
+    def _communicate(self, text):
+        try:
+            return edge_tts.Communicate(text, self.voice, rate=self.rate, volume=self.volume,
+                                        boundary="WordBoundary")
+        except TypeError:
+            # edge-tts before 7.0 has no boundary argument and always reports word boundaries
+            return edge_tts.Communicate(text, self.voice, rate=self.rate, volume=self.volume)
+
+    async def synthesize(self, text, output_file):
+        communicate = self._communicate(text)
+        words = []
+        with open(output_file, "wb") as f:
+            async for chunk in communicate.stream():
+                if chunk["type"] == "audio":
+                    f.write(chunk["data"])
+                elif chunk["type"] == "WordBoundary":
+                    start = chunk["offset"] / TICKS_PER_SECOND
+                    words.append({"start": round(start, 3),
+                                  "end": round(start + chunk["duration"] / TICKS_PER_SECOND, 3),
+                                  "text": chunk["text"]})
+            f.flush()
+            os.fsync(f.fileno())
+        return words
+
+def audio_duration(path):
+    """
+    Measure the duration of an MP3 or WAV file from its headers.
+
+    MP3 frames are walked without decoding, which is far cheaper than opening
+    the file through ffmpeg.
+
+    Returns:
+        float: Duration in seconds
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        with wave.open(path, "rb") as wav:
+            return wav.getnframes() / float(wav.getframerate())
+
+    pos = 0
+    if data[:3] == b"ID3":
+        # Skip the ID3v2 tag; its size is a 28-bit synchsafe integer
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        pos = 10 + size
+
+    duration = 0.0
+    while pos + 4 <= len(data):
+        header = int.from_bytes(data[pos:pos + 4], "big")
+        if (header >> 21) & 0x7FF != 0x7FF:
+            pos += 1
+            continue
+        version = {0: 2.5, 2: 2, 3: 1}.get((header >> 19) & 0x3)
+        layer = {1: 3, 2: 2, 3: 1}.get((header >> 17) & 0x3)
+        bitrate_index = (header >> 12) & 0xF
+        rate_index = (header >> 10) & 0x3
+        if version is None or layer is None or bitrate_index in (0, 15) or rate_index == 3:
+            pos += 1
+            continue
+
+        bitrate = _MP3_BITRATES[(1 if version == 1 else 2, layer)][bitrate_index] * 1000
+        sample_rate = _MP3_SAMPLE_RATES[version][rate_index]
+        padding = (header >> 9) & 0x1
+        if layer == 1:
+            samples = 384
+            frame_length = (12 * bitrate // sample_rate + padding) * 4
+        else:
+            samples = 1152 if (layer == 2 or version == 1) else 576
+            frame_length = samples // 8 * bitrate // sample_rate + padding
+
+        duration += samples / sample_rate
+        pos += frame_length
+
+    if duration == 0:
+        raise Exception(f"Could not determine audio duration for {path}")
+    return duration
+
+def get_tts_cache():
+    """Return the shared TTS cache, creating it on first use."""
+    global _tts_cache
+    with _loop_lock:
+        if _tts_cache is None:
+            _tts_cache = DiskCache(TTS_CACHE_DIR, TTS_CACHE_MAX_BYTES)
+        return _tts_cache
+
+def _load_cached(cache, key, output_file):
+    meta = cache.get(key)
+    if meta is None:
+        return None
+    shutil.copyfile(cache.path(key, "audio"), output_file)
+    save_word_timings(meta.get("words"), output_file)
+    return meta["duration"]
+
+def _store_cached(cache, key, output_file, words=None):
+    duration = audio_duration(output_file)
+    cache.put(key, {"audio": output_file}, {"duration": duration, "words": words or []})
+    return duration
+
+def get_event_loop():
+    """Return the shared voice event loop, starting it in a daemon thread on first use."""
+    global _loop, _loop_semaphore
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _loop_semaphore = asyncio.Semaphore(MAX_CONCURRENT_SYNTHESIS)
+            threading.Thread(target=_loop.run_forever, name="voice-loop", daemon=True).start()
+        return _loop
+
+async def _synthesize(backend, text, output_file, semaphore=None, retries=3, backoff=1.0, cache=None):
+    """
+    Run one synthesis job with retry and exponential backoff, then verify the output.
+
+    Word timings returned by the backend are written next to the output (see
+    captions.word_timings_path) and cached with the audio.
+
+    Returns:
+        Tuple[str, float]: The output path and the audio duration in seconds
+    """
+    with span("voice", output=os.path.basename(output_file)) as voice_span:
+        voice_span.add_output(output_file)
+        key = backend.cache_key(text) if cache is not None and hasattr(backend, "cache_key") else None
+        if key is not None:
+            duration = await asyncio.to_thread(_load_cached, cache, key, output_file)
+            voice_span.args["cached"] = duration is not None
+            if duration is not None:
+                return output_file, duration
+
+        for attempt in range(retries):
+            try:
+                if semaphore is not None:
+                    async with semaphore:
+                        words = await backend.synthesize(text, output_file)
+                else:
+                    words = await backend.synthesize(text, output_file)
+
+                # Verify the file was created and has content
+                if not os.path.exists(output_file) or os.path.getsize(output_file) == 0:
+                    raise Exception("Voice generation failed or produced empty file")
+                break
+            except Exception as e:
+                if attempt == retries - 1:
+                    raise
+                voice_span.retry()
+                wait_time = backoff * 2 ** attempt + random.uniform(0, backoff)
+                print(f"Voice attempt {attempt + 1} for {output_file} failed: {e}. Retrying in {wait_time:.1f} seconds...")
+                await asyncio.sleep(wait_time)
+
+        save_word_timings(words, output_file)
+        if key is not None:
+            return output_file, await asyncio.to_thread(_store_cached, cache, key, output_file, words)
+        return output_file, await asyncio.to_thread(audio_duration, output_file)
+
+async def generate_voice(text, output_file, backend=None):
     """Generate voice narration with error handling and verification"""
     try:
         # Ensure any existing audio file is removed
         if os.path.exists(output_file):
             os.remove(output_file)
-            await asyncio.sleep(1)  # Increased wait time
-            
-        # Configure voice settings
-        communicate = edge_tts.Communicate(
-            text, 
-            "en-US-AndrewNeural",
-            rate="+0%",  # Normal speed
-            volume="+50%"  # Increased volume
-        )
-        
-        # Save audio file
-        await communicate.save(output_file)
-        await asyncio.sleep(1)  # Wait for file to be fully written
-        
-        # Verify the file was created and has content
-        if not os.path.exists(output_file) or os.path.getsize(output_file) == 0:
-            raise Exception("Voice generation failed or produced empty file")
-            
+
+        await _synthesize(backend or EdgeTTSBackend(), text, output_file, cache=get_tts_cache())
         return True
-            
+
     except Exception as e:
         print(f"Error generating voice: {e}")
-        raise
\ No newline at end of file
+        raise
+
+def submit_voice(text, output_file, backend=None, retries=3):
+    """
+    Schedule one narration on the shared event loop without blocking.
+
+    Returns:
+        concurrent.futures.Future: Resolves to (output_file, duration_seconds) once
+        the file is written and verified, straight from the TTS cache on a hit
+    """
+    loop = get_event_loop()
+    coro = _synthesize(backend or EdgeTTSBackend(), text, output_file, _loop_semaphore, retries,
+                       cache=get_tts_cache())
+    return asyncio.run_coroutine_threadsafe(coro, loop)
+
+def generate_voices(scripts, output_files=None, backend=None, retries=3):
+    """
+    Synthesize several narrations concurrently on the shared event loop.
+
+    Args:
+        scripts (List[str]): Narration texts
+        output_files (List[str]): Target paths (defaults to output_<i>.mp3)
+        backend: Synthesizer backend (defaults to EdgeTTSBackend)
+        retries (int): Attempts per file before giving up
+
+    Returns:
+        List[str]: Paths of the generated audio files, in the order of scripts
+    """
+    if output_files is None:
+        output_files = [f"output_{i}.mp3" for i in range(len(scripts))]
+    if len(output_files) != len(scripts):
+        raise ValueError("scripts and output_files must have the same length")
+
+    backend = backend or EdgeTTSBackend()
+    futures = [
+        submit_voice(text, output_file, backend, retries)
+        for text, output_file in zip(scripts, output_files)
+    ]
+    return [future.result()[0] for future in futures]
@@ -0,0 +1,141 @@
+import os
+import shutil
+import tempfile
+import time
+
+# Shared-memory filesystem used for intermediate files when tmpfs is requested
+TMPFS_ROOT = "/dev/shm"
+WORKSPACE_DIR_NAME = "github-trending-video"
+
+def default_root(tmpfs=False):
+    """Parent directory of run workspaces: tmpfs when asked for and available, else the temp dir"""
+    base = TMPFS_ROOT if tmpfs and os.path.isdir(TMPFS_ROOT) else tempfile.gettempdir()
+    return os.path.join(base, WORKSPACE_DIR_NAME)
+
+def _lock(f, blocking):
+    """Take an exclusive lock on an open file; the OS drops it if the process dies."""
+    if os.name == "nt":
+        import msvcrt
+        while True:
+            try:
+                # LK_LOCK gives up after about 10 seconds, so keep asking while blocking
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+                return
+            except OSError:
+                if not blocking:
+                    raise
+    else:
+        import fcntl
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+
+def _unlock(f):
+    if os.name == "nt":
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+class Workspace:
+    """
+    Private directory for the intermediate files of one run.
+
+    The directory is derived from the run id so an interrupted run picks its
+    files up again, while runs for other languages or time ranges never share
+    a path. Two runs with the same id would overwrite each other's files, so
+    a workspace holds an exclusive lock (``<run_id>.lock`` next to the
+    directory) from creation until ``release``; a second run for the same id
+    waits for the first to finish. ``cleanup`` removes the directory with
+    whatever was written into it and releases the lock.
+    """
+
+    def __init__(self, run_id, root=None, tmpfs=False):
+        self.run_id = run_id
+        root = os.path.abspath(root or default_root(tmpfs))
+        self.dir = os.path.join(root, run_id)
+        self._lock_path = os.path.join(root, f"{run_id}.lock")
+        os.makedirs(root, exist_ok=True)
+        self._lock_file = self._acquire()
+        os.makedirs(self.dir, exist_ok=True)
+
+    def _acquire(self):
+        waiting = False
+        while True:
+            f = open(self._lock_path, "a+")
+            try:
+                try:
+                    _lock(f, blocking=False)
+                except OSError:
+                    if not waiting:
+                        print(f"Waiting for another run to release {self.dir}")
+                        waiting = True
+                    _lock(f, blocking=True)
+            except BaseException:
+                f.close()
+                raise
+            # cleanup removes the lock file, so the one we waited on may no longer be the current one
+            try:
+                if os.path.samestat(os.fstat(f.fileno()), os.stat(self._lock_path)):
+                    return f
+            except OSError:
+                pass
+            f.close()
+
+    def path(self, name):
+        """Absolute path of a named file inside the workspace."""
+        return os.path.join(self.dir, name)
+
+    def artifacts(self):
+        """Files currently in the workspace."""
+        found = []
+        for parent, _, names in os.walk(self.dir):
+            found.extend(os.path.join(parent, name) for name in names)
+        return sorted(found)
+
+    def size(self):
+        total = 0
+        for path in self.artifacts():
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                continue
+        return total
+
+    def release(self):
+        """Let other runs with this run id use the workspace; the files are left in place."""
+        if self._lock_file is not None:
+            _unlock(self._lock_file)
+            self._lock_file.close()
+            self._lock_file = None
+
+    def cleanup(self, retries=3):
+        """Remove the workspace directory and release it."""
+        removed = len(self.artifacts())
+        for attempt in range(retries):
+            failures = []
+            if os.path.isdir(self.dir):
+                shutil.rmtree(self.dir, onerror=lambda func, path, exc: failures.append(path))
+            if not failures:
+                break
+            # Some platforms keep a file locked until the encoder that wrote it lets go
+            if attempt == retries - 1:
+                print(f"Failed to remove {len(failures)} files from {self.dir}")
+            else:
+                time.sleep(1)
+        try:
+            os.remove(self._lock_path)
+        except OSError:
+            pass
+        self.release()
+        print(f"Removed {removed} artifacts from {self.dir}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        # Files are kept on failure so the run can be resumed
+        if exc[0] is None:
+            self.cleanup()
+        else:
+            self.release()
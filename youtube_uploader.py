@@ -0,0 +1,366 @@
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from cache import hash_key
+from lazy import lazy_import
+from tracing import span, record_retry
+
+MediaFileUpload = lazy_import("googleapiclient.http", "MediaFileUpload")
+HttpError = lazy_import("googleapiclient.errors", "HttpError")
+build = lazy_import("googleapiclient.discovery", "build")
+Credentials = lazy_import("google.oauth2.credentials", "Credentials")
+InstalledAppFlow = lazy_import("google_auth_oauthlib.flow", "InstalledAppFlow")
+Request = lazy_import("google.auth.transport.requests", "Request")
+AuthorizedHttp = lazy_import("google_auth_httplib2", "AuthorizedHttp")
+httplib2 = lazy_import("httplib2")
+
+YOUTUBE_SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
+TOKEN_FILE = "token.json"
+CLIENT_SECRETS_FILE = "client_secrets.json"
+
+# Access tokens are refreshed this many seconds before they expire
+TOKEN_REFRESH_MARGIN = 300
+
+# Shortest wait between two background refreshes, in case the server hands out short-lived tokens
+MIN_REFRESH_INTERVAL = 30
+
+# Bytes sent per next_chunk() request; the API wants a multiple of 256 KiB
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Resumable session URIs, one JSON file per video being uploaded
+UPLOAD_SESSION_DIR = os.path.join(".cache", "uploads")
+
+# Server errors worth retrying; the session stays valid across them
+RETRIABLE_STATUS_CODES = (500, 502, 503, 504)
+
+# Statuses meaning the session URI is gone and the upload must start over
+EXPIRED_STATUS_CODES = (404, 410)
+
+MAX_UPLOAD_RETRIES = 8
+
+class UploadStats:
+    """Progress counters of one upload."""
+
+    def __init__(self, total_bytes):
+        self.total_bytes = total_bytes
+        self.bytes_sent = 0
+        self.resumed_from = 0
+        self.chunks = 0
+        self.retries = 0
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    @property
+    def throughput(self):
+        """Bytes per second sent by this process (excluding bytes sent before a resume)."""
+        sent = self.bytes_sent - self.resumed_from
+        return sent / self.elapsed if self.elapsed > 0 else 0.0
+
+    def as_dict(self):
+        return {
+            "total_bytes": self.total_bytes,
+            "bytes_sent": self.bytes_sent,
+            "resumed_from": self.resumed_from,
+            "chunks": self.chunks,
+            "retries": self.retries,
+            "elapsed": round(self.elapsed, 3),
+            "bytes_per_second": round(self.throughput, 1),
+        }
+
+def _http_status(error):
+    """HTTP status of a googleapiclient HttpError, or None for other errors."""
+    return getattr(getattr(error, "resp", None), "status", None)
+
+def session_file(video_path, body, session_dir=UPLOAD_SESSION_DIR):
+    """Path of the saved session for a video; changes when the file or its metadata changes."""
+    stat = os.stat(video_path)
+    key = hash_key(os.path.abspath(video_path), stat.st_size, stat.st_mtime_ns, json.dumps(body, sort_keys=True))
+    return os.path.join(session_dir, f"{key}.json")
+
+def _load_session(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)["uri"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+def _save_session(path, uri):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"uri": uri, "saved": time.time()}, f)
+    os.replace(tmp_path, path)
+
+def _drop_session(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+def query_upload_progress(http, uri, total_bytes):
+    """
+    Ask the server how much of a resumable upload session it has committed.
+
+    Returns:
+        Tuple[int, dict]: Bytes the server holds, and the inserted video
+        resource if the upload had already completed (None otherwise)
+    """
+    resp, content = http.request(uri, "PUT", headers={"Content-Range": f"bytes */{total_bytes}",
+                                                       "Content-Length": "0"})
+    if resp.status in (200, 201):
+        return total_bytes, json.loads(content)
+    if resp.status == 308:
+        # "bytes=0-N" lists the committed range; no Range header means nothing was committed
+        committed = resp.get("range")
+        return (int(committed.rsplit("-", 1)[1]) + 1 if committed else 0), None
+    raise HttpError(resp, content, uri=uri)
+
+def resumable_upload(youtube, video_path, body, chunk_size=UPLOAD_CHUNK_SIZE, session_dir=UPLOAD_SESSION_DIR,
+                     max_retries=MAX_UPLOAD_RETRIES, backoff=1.0, mimetype="video/mp4", session_path=None):
+    """
+    Upload a video in chunks, continuing a previous session for the same file if one was saved.
+
+    The resumable session URI is written to ``session_dir`` after the first
+    chunk, so a restarted process asks the server how much it already has and
+    sends only the rest. Server errors are retried with exponential backoff;
+    after one, the committed range is queried again and a new request picks
+    up from there.
+
+    Args:
+        youtube: Built YouTube API service (point it at a fake endpoint in tests)
+        video_path (str): File to upload
+        body (dict): videos.insert resource with snippet and status
+        chunk_size (int): Bytes per request
+        session_dir (str): Where session URIs are persisted
+        max_retries (int): Consecutive failed chunks before giving up
+        backoff (float): Base delay in seconds between retries
+        session_path (str): Session file to use instead of one derived from the file in ``session_dir``.
+            It is kept after the upload completes, so a caller that dies before recording the result
+            gets the finished video back from the session instead of uploading it again; the caller
+            removes it once the result is safe
+
+    Returns:
+        Tuple[dict, UploadStats]: The inserted video resource and the upload counters
+    """
+    def new_request(uri=None, progress=0):
+        media = MediaFileUpload(video_path, mimetype=mimetype, chunksize=chunk_size, resumable=True)
+        request = youtube.videos().insert(part=",".join(body.keys()), body=body, media_body=media)
+        request.resumable_uri = uri
+        request.resumable_progress = progress
+        return request
+
+    request = new_request()
+    stats = UploadStats(os.path.getsize(video_path))
+
+    keep_session = session_path is not None
+    session_path = session_path or session_file(video_path, body, session_dir)
+    saved_uri = _load_session(session_path)
+    resuming = saved_uri is not None
+    resync_uri = saved_uri
+    if resuming:
+        print(f"Resuming upload of {video_path} from saved session")
+
+    response = None
+    failures = 0
+    while response is None:
+        try:
+            if resync_uri is not None:
+                committed, response = query_upload_progress(request.http, resync_uri, stats.total_bytes)
+                if resuming:
+                    stats.resumed_from = committed
+                    resuming = False
+                stats.bytes_sent = committed
+                request = new_request(resync_uri, committed)
+                resync_uri = None
+                if response is not None:
+                    break
+            status, response = request.next_chunk()
+        except Exception as e:
+            code = _http_status(e)
+            if code in EXPIRED_STATUS_CODES:
+                _drop_session(session_path)
+                raise Exception(f"Upload session expired (HTTP {code}); the next attempt starts over") from e
+            if code is not None and code not in RETRIABLE_STATUS_CODES:
+                raise
+            failures += 1
+            stats.retries += 1
+            record_retry()
+            if failures > max_retries:
+                raise
+            wait_time = backoff * 2 ** (failures - 1) + random.uniform(0, backoff)
+            print(f"Upload chunk failed ({code or e}), retrying in {wait_time:.1f} seconds...")
+            # Without a session URI the upload had not started yet and the same request starts it again
+            resync_uri = request.resumable_uri or resync_uri
+            time.sleep(wait_time)
+            continue
+
+        failures = 0
+        stats.chunks += 1
+        if request.resumable_uri and request.resumable_uri != saved_uri:
+            saved_uri = request.resumable_uri
+            _save_session(session_path, saved_uri)
+        if status is not None:
+            stats.bytes_sent = status.resumable_progress
+            stats.elapsed = time.monotonic() - stats.started
+            print(f"Uploaded {status.progress():.0%} ({stats.throughput / 1e6:.2f} MB/s)")
+
+    stats.bytes_sent = stats.total_bytes
+    stats.elapsed = time.monotonic() - stats.started
+    if not keep_session:
+        _drop_session(session_path)
+    return response, stats
+
+class YouTubeUploader:
+    """
+    Long-lived YouTube client shared by every upload of a process.
+
+    Credentials are loaded once and refreshed by a background thread ahead of
+    their expiry, and the API service is built once from the discovery
+    document bundled with googleapiclient, so an upload starts without reading
+    token.json, refreshing or fetching discovery. All uploads go over one
+    authorized HTTP connection and are serialized on it.
+
+    ``credentials`` and ``api_endpoint`` can be injected, e.g. to run against
+    a local fake server.
+    """
+
+    def __init__(self, token_file=TOKEN_FILE, client_secrets_file=CLIENT_SECRETS_FILE, scopes=YOUTUBE_SCOPES,
+                 credentials=None, api_endpoint=None, refresh_margin=TOKEN_REFRESH_MARGIN):
+        self.token_file = token_file
+        self.client_secrets_file = client_secrets_file
+        self.scopes = scopes
+        self.api_endpoint = api_endpoint
+        self.refresh_margin = refresh_margin
+        self._credentials = credentials
+        # Injected credentials are not written back to the token file
+        self._persist = credentials is None
+        self._service = None
+        self._lock = threading.RLock()
+        self._upload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresher = None
+
+    def _load_credentials(self):
+        credentials = None
+        if os.path.exists(self.token_file):
+            credentials = Credentials.from_authorized_user_file(self.token_file, self.scopes)
+        if credentials and credentials.valid:
+            return credentials
+        if credentials and credentials.expired and credentials.refresh_token:
+            credentials.refresh(Request())
+        else:
+            flow = InstalledAppFlow.from_client_secrets_file(
+                self.client_secrets_file, self.scopes, redirect_uri="http://localhost:8080")
+            credentials = flow.run_local_server(port=8080)
+        self._save_credentials(credentials)
+        return credentials
+
+    def _save_credentials(self, credentials):
+        if not self._persist:
+            return
+        tmp_file = f"{self.token_file}.tmp"
+        with open(tmp_file, "w") as token:
+            token.write(credentials.to_json())
+        os.replace(tmp_file, self.token_file)
+
+    @property
+    def credentials(self):
+        with self._lock:
+            if self._credentials is None:
+                self._credentials = self._load_credentials()
+            return self._credentials
+
+    def refresh(self):
+        """Refresh the access token now and store it."""
+        with self._lock:
+            credentials = self.credentials
+            if not credentials.refresh_token:
+                return
+            credentials.refresh(Request())
+            self._save_credentials(credentials)
+
+    def _seconds_until_refresh(self):
+        expiry = self.credentials.expiry
+        if expiry is None:
+            return None
+        # google-auth keeps expiry as a naive UTC datetime
+        if expiry.tzinfo is None:
+            expiry = expiry.replace(tzinfo=timezone.utc)
+        return (expiry - datetime.now(timezone.utc)).total_seconds() - self.refresh_margin
+
+    def _refresh_loop(self):
+        min_wait = 0
+        while not self._stop.is_set():
+            if not self.credentials.refresh_token:
+                print("No refresh token; the access token is used until it expires")
+                return
+            delay = self._seconds_until_refresh()
+            if delay is None:
+                return
+            if self._stop.wait(max(min_wait, delay)):
+                return
+            min_wait = MIN_REFRESH_INTERVAL
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Background token refresh failed: {e}")
+                self._stop.wait(60)
+
+    def start(self):
+        """Load credentials, build the service and start refreshing in the background."""
+        self.service
+        with self._lock:
+            if self._refresher is None:
+                self._stop.clear()
+                self._refresher = threading.Thread(target=self._refresh_loop, name="youtube-token-refresh",
+                                                   daemon=True)
+                self._refresher.start()
+        return self
+
+    @property
+    def service(self):
+        """The built YouTube API service, created on first use."""
+        with self._lock:
+            if self._service is None:
+                http = AuthorizedHttp(self.credentials, http=httplib2.Http())
+                client_options = {"api_endpoint": self.api_endpoint} if self.api_endpoint else None
+                self._service = build("youtube", "v3", http=http, static_discovery=True,
+                                      cache_discovery=False, client_options=client_options)
+            return self._service
+
+    def upload(self, video_path, body, chunk_size=UPLOAD_CHUNK_SIZE, **kwargs):
+        """
+        Upload one video with resumable_upload over the shared connection.
+
+        Returns:
+            Tuple[dict, UploadStats]: The inserted video resource and the upload counters
+        """
+        self.start()
+        with self._upload_lock, span("upload", video=os.path.basename(video_path)) as upload_span:
+            response, stats = resumable_upload(self.service, video_path, body, chunk_size=chunk_size, **kwargs)
+            upload_span.add_bytes(stats.bytes_sent - stats.resumed_from)
+            upload_span.args.update(stats.as_dict())
+            return response, stats
+
+    def close(self):
+        self._stop.set()
+        if self._refresher is not None:
+            self._refresher.join(timeout=1)
+            self._refresher = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+_uploaders = {}
+_uploaders_lock = threading.Lock()
+
+def get_uploader(api_endpoint=None):
+    """Return the process-wide YouTubeUploader for an API endpoint, creating it on first use."""
+    with _uploaders_lock:
+        if api_endpoint not in _uploaders:
+            _uploaders[api_endpoint] = YouTubeUploader(api_endpoint=api_endpoint)
+        return _uploaders[api_endpoint]